@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# bench_default_reductions.py
+#
+# Compare the parsing tables of the toy language built with and without Bison
+# style default reductions (yacc(default_reductions=True)).  For both tables
+# this reports the number of explicit action entries, the number of states in
+# which the parser reduces without reading a lookahead, the size of the table
+# cache file, and the parsing throughput on the corpus used by bench_parse.py.
+#
+#     python benchmarks/bench_default_reductions.py [nstmts] [repeat]
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+import tempfile
+
+import toylang
+from bench_parse import TokenFeed, lex_all, best_time
+
+def main():
+    nstmts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    tmpdir = tempfile.mkdtemp()
+    configs = []
+    for name, default_reductions in [('lookahead', False), ('default', True)]:
+        cachefile = os.path.join(tmpdir, name + '.cache')
+        lexer, parser = toylang.build(cachefile=cachefile, default_reductions=default_reductions)
+        configs.append((name, parser, os.path.getsize(cachefile)))
+        os.remove(cachefile)
+    os.rmdir(tmpdir)
+
+    print('%-10s %8s %10s %10s %12s' % ('tables', 'states', 'entries', 'no-lookahd', 'cache bytes'))
+    for name, parser, cachesize in configs:
+        entries = sum(len(st_action) for st_action in parser.action.values())
+        nodefault = sum(1 for t in parser.tables.defaulted if t)
+        print('%-10s %8d %10d %10d %12d' % (name, len(parser.action), entries, nodefault, cachesize))
+    print()
+
+    data = toylang.generate(nstmts)
+    tokens = lex_all(lexer, data)
+    ntokens = len(tokens)
+    feed = TokenFeed(tokens)
+
+    print('corpus: %d statements, %d bytes, %d tokens' % (nstmts, len(data), ntokens))
+    print('%-10s %-10s %10s %14s' % ('tables', 'engine', 'seconds', 'tokens/sec'))
+    for engine, kwargs in [('plain', {}), ('tracking', {'tracking': True})]:
+        for name, parser, cachesize in configs:
+            elapsed = best_time(lambda: parser.parse(data, lexer=feed, **kwargs), repeat)
+            print('%-10s %-10s %10.4f %14.0f' % (name, engine, elapsed, ntokens / elapsed))
+
+if __name__ == '__main__':
+    main()
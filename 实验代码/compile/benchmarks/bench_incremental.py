@@ -0,0 +1,70 @@
+# -----------------------------------------------------------------------------
+# bench_incremental.py
+#
+# Compare reparsing a program of the toy language from scratch with the
+# incremental reparse of LRParser.incremental() after small edits at the
+# start, in the middle and at the end of the program.  For every edit this
+# reports the time of a full lex and parse of the edited text, the time of
+# the incremental reparse (relex() included), and the number of tokens
+# covered by reused symbols.  Every incremental result is checked against
+# the full parse.
+#
+# The statement list of the toy language is built with p[1].append(), so
+# 'stmts' is excluded from reuse and every top level statement is still
+# shifted (as one reused symbol) on every reparse.  This grows with the size
+# of the program, but is much cheaper than lexing and parsing it again.
+#
+#     python benchmarks/bench_incremental.py [nstmts] [repeat]
+# -----------------------------------------------------------------------------
+
+import sys
+import time
+
+import toylang
+
+def main():
+    nstmts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    lexer, parser = toylang.build()
+    data = toylang.generate(nstmts)
+    lexer.input(data)
+    ntokens = sum(1 for tok in lexer)
+
+    # (name, offset, deleted, inserted).  Every edit is made to the original program
+    middle = data.index('= ', len(data) // 2) + 2
+    edits = [('start', data.index('= ') + 2, 0, '7 + '),
+             ('middle', middle, 0, '7 + '),
+             ('end', len(data), 0, 'x = 1;\n'),
+             ('new block', middle - 4, 0, 'begin y = 2; end\n')]
+
+    print('corpus: %d statements, %d bytes, %d tokens' % (nstmts, len(data), ntokens))
+    print('%-10s %10s %12s %8s %10s' % ('edit', 'full', 'incremental', 'speedup', 'reused'))
+    for name, offset, deleted, inserted in edits:
+        edited = data[:offset] + inserted + data[offset+deleted:]
+        expected = None
+        best_full = best_inc = None
+        for _ in range(repeat):
+            full = lexer.clone()
+            full.lineno = 1
+            start = time.perf_counter()
+            expected = parser.parse(edited, lexer=full)
+            elapsed = time.perf_counter() - start
+            if best_full is None or elapsed < best_full:
+                best_full = elapsed
+
+            inclexer = lexer.clone()
+            inclexer.lineno = 1
+            inc = parser.incremental(inclexer, exclude=['stmts'])
+            inc.parse(data)
+            start = time.perf_counter()
+            result = inc.edit(offset, deleted, inserted)
+            elapsed = time.perf_counter() - start
+            if best_inc is None or elapsed < best_inc:
+                best_inc = elapsed
+            if result != expected:
+                raise RuntimeError('incremental parse differs from full parse after edit %r' % name)
+        print('%-10s %10.4f %12.4f %7.1fx %10d' % (name, best_full, best_inc, best_full / best_inc, inc.reused))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# -----------------------------------------------------------------------------
+# bench_lalr.py
+#
+# Measure the time taken by LRTable.add_lalr_lookaheads() on synthetic
+# grammars with thousands of productions.  The grammars are built directly
+# through the Grammar class so that no Python source has to be generated.
+# Each one is shaped like a real language: a family of statement forms with
+# optional (nullable) parts, comma separated lists, and a tower of binary
+# operator levels whose chain rules produce long INCLUDES cycles.
+#
+#     python benchmarks/bench_lalr.py [sizes] [repeat]
+#
+# sizes is a comma separated list of statement family counts.
+# -----------------------------------------------------------------------------
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ply import yacc
+
+# -----------------------------------------------------------------------------
+# synthetic_grammar()
+#
+# Build a Grammar with nfamilies statement families and nlevels operator
+# levels.  Every family contributes about ten productions.  The output is
+# deterministic for a given seed.
+# -----------------------------------------------------------------------------
+
+def synthetic_grammar(nfamilies, nlevels=12, seed=1):
+    rnd = random.Random(seed)
+    terms = ['ID', 'NUMBER', 'LPAREN', 'RPAREN', 'COMMA', 'SEMI', 'LBRACE', 'RBRACE']
+    terms += ['OP%d' % i for i in range(nlevels)]
+    terms += ['KW%d' % i for i in range(nfamilies)]
+    terms += ['MOD%d' % i for i in range(nfamilies)]
+    g = yacc.Grammar(terms)
+
+    g.add_production('program', ['stmts'])
+    g.add_production('stmts', ['stmts', 'stmt'])
+    g.add_production('stmts', [])
+    g.add_production('block', ['LBRACE', 'stmts', 'RBRACE'])
+
+    # Operator levels: e0 : e0 OP0 e1 | e1 ... with a primary at the bottom
+    for i in range(nlevels):
+        g.add_production('e%d' % i, ['e%d' % i, 'OP%d' % i, 'e%d' % (i + 1)])
+        g.add_production('e%d' % i, ['e%d' % (i + 1)])
+    top = 'e%d' % nlevels
+    g.add_production(top, ['ID'])
+    g.add_production(top, ['NUMBER'])
+    g.add_production(top, ['LPAREN', 'e0', 'RPAREN'])
+    g.add_production(top, ['ID', 'LPAREN', 'args', 'RPAREN'])
+    g.add_production('args', ['arglist'])
+    g.add_production('args', [])
+    g.add_production('arglist', ['arglist', 'COMMA', 'e0'])
+    g.add_production('arglist', ['e0'])
+
+    for i in range(nfamilies):
+        kw, mod = 'KW%d' % i, 'MOD%d' % i
+        stmt, opt, lst, item = 's%d' % i, 'opt%d' % i, 'list%d' % i, 'item%d' % i
+        tail = 'tail%d' % i
+        g.add_production('stmt', [stmt])
+        g.add_production(stmt, [kw, opt, lst, tail])
+        g.add_production(stmt, [kw, opt, 'block'])
+        g.add_production(opt, [mod])
+        g.add_production(opt, [])
+        g.add_production(lst, [lst, 'COMMA', item])
+        g.add_production(lst, [item])
+        g.add_production(item, ['ID'])
+        g.add_production(item, ['e%d' % rnd.randrange(nlevels)])
+        g.add_production(tail, ['SEMI'])
+        g.add_production(tail, [])
+
+    g.set_start('program')
+    return g
+
+# -----------------------------------------------------------------------------
+# lalr_timing()
+#
+# Build the LR(0) machine for grammar and time add_lalr_lookaheads() on it.
+# Returns (nstates, best time).  Lookaheads are cleared between runs so that
+# every run does the same amount of work.
+# -----------------------------------------------------------------------------
+
+def lalr_timing(grammar, repeat):
+    grammar.build_lritems()
+    table = yacc.LRTable.__new__(yacc.LRTable)
+    table.grammar = grammar
+    table.log = yacc.NullLogger()
+    table.lr0_closures = {}
+    C = table.lr0_items()
+
+    best = None
+    for _ in range(repeat):
+        for state in C:
+            for p in state:
+                p.lookaheads = {}
+        start = time.perf_counter()
+        table.add_lalr_lookaheads(C)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(C), best
+
+def main():
+    sizes = sys.argv[1] if len(sys.argv) > 1 else '100,300,1000'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print('%8s %12s %8s %10s' % ('families', 'productions', 'states', 'seconds'))
+    for n in [int(s) for s in sizes.split(',')]:
+        grammar = synthetic_grammar(n)
+        nstates, elapsed = lalr_timing(grammar, repeat)
+        print('%8d %12d %8d %10.4f' % (n, len(grammar.Productions), nstates, elapsed))
+
+if __name__ == '__main__':
+    main()
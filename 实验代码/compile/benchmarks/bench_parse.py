@@ -0,0 +1,132 @@
+# -----------------------------------------------------------------------------
+# bench_parse.py
+#
+# Measure parsing throughput (tokens/sec) of LRParser.parse() on a generated
+# corpus of the toy language used in tests/.  The corpus is lexed once up
+# front and replayed to the parser from a list so that the numbers reflect the
+# parsing engine rather than the lexer.  The plain engine and the position
+# tracking engine are timed separately.  For comparison, parse_dict() runs the
+# same parse with a plain loop over the dictionary tables, without the dense
+# tables and the other specializations of the engines.
+#
+#     python benchmarks/bench_parse.py [nstmts] [repeat]
+# -----------------------------------------------------------------------------
+
+import functools
+import sys
+import time
+
+import toylang
+from ply import yacc
+
+# Stand-in for a lexer that hands out previously collected tokens
+class TokenFeed:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.lineno = 1
+        self.lexpos = 0
+
+    def input(self, data):
+        self.token = functools.partial(next, iter(self.tokens), None)
+
+    def token(self):
+        return None
+
+def lex_all(lexer, data):
+    lexer.input(data)
+    lexer.lineno = 1
+    return list(lexer)
+
+# Parse the tokens of lexer with the dictionary tables of parser (parser.action
+# and parser.goto), calling every rule.  There is no error recovery, so this is
+# only for valid input.
+def parse_dict(parser, lexer):
+    actions = parser.action
+    goto = parser.goto
+    prod = parser.productions
+    pslice = yacc.YaccProduction(None)
+    pslice.lexer = lexer
+    pslice.parser = parser
+    end = yacc.YaccSymbol()
+    end.type = '$end'
+    statestack = [0]
+    symstack = [end]
+    pslice.stack = symstack
+    state = 0
+    lookahead = None
+    while True:
+        if lookahead is None:
+            lookahead = lexer.token() or end
+        t = actions[state].get(lookahead.type)
+        if t is None:
+            raise SyntaxError('syntax error at %r' % lookahead)
+        if t > 0:
+            statestack.append(t)
+            state = t
+            symstack.append(lookahead)
+            lookahead = None
+        elif t < 0:
+            p = prod[-t]
+            sym = yacc.YaccSymbol()
+            sym.type = p.name
+            sym.value = None
+            if p.len:
+                targ = symstack[-p.len-1:]
+                targ[0] = sym
+                del symstack[-p.len:]
+                del statestack[-p.len:]
+            else:
+                targ = [sym]
+            pslice.slice = targ
+            if p.positional:
+                sym.value = p.callable(*[s.value for s in targ[1:]])
+            else:
+                p.callable(pslice)
+            symstack.append(sym)
+            state = goto[statestack[-1]][p.name]
+            statestack.append(state)
+        else:
+            return symstack[-1].value
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    nstmts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    lexer, parser = toylang.build()
+    data = toylang.generate(nstmts)
+    tokens = lex_all(lexer, data)
+    ntokens = len(tokens)
+    feed = TokenFeed(tokens)
+
+    print('corpus: %d statements, %d bytes, %d tokens' % (nstmts, len(data), ntokens))
+    print('%-10s %10s %14s' % ('engine', 'seconds', 'tokens/sec'))
+
+    elapsed = best_time(lambda: lex_all(lexer, data), repeat)
+    print('%-10s %10.4f %14.0f' % ('lex only', elapsed, ntokens / elapsed))
+
+    for name, kwargs in [('plain', {}), ('tracking', {'tracking': True})]:
+        elapsed = best_time(lambda: parser.parse(data, lexer=feed, **kwargs), repeat)
+        print('%-10s %10.4f %14.0f' % (name, elapsed, ntokens / elapsed))
+
+    feed.input(data)
+    assert parse_dict(parser, feed) == parser.parse(data, lexer=feed)
+
+    def run_dict():
+        feed.input(data)
+        parse_dict(parser, feed)
+
+    elapsed = best_time(run_dict, repeat)
+    print('%-10s %10.4f %14.0f' % ('dict loop', elapsed, ntokens / elapsed))
+
+if __name__ == '__main__':
+    main()
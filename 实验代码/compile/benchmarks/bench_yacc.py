@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# bench_yacc.py
+#
+# Measure how the time and peak memory of yacc() scale with the size of the
+# grammar.  The grammars are the synthetic ones of bench_lalr.py, written out
+# as a module of p_ functions so that yacc() goes through every phase, from
+# reflection to the dense tables.  A tower of binary operators resolved by a
+# precedence table is added on top.  Its height is the number of precedence
+# levels.
+#
+# Every grammar is built twice: once for the timing of each phase (see
+# yacc.BuildStats) and once under tracemalloc for the peak memory.
+#
+#     python benchmarks/bench_yacc.py [families] [precedence levels]
+#
+# Both arguments are comma separated lists.  Every combination is measured.
+# -----------------------------------------------------------------------------
+
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from bench_lalr import synthetic_grammar
+from ply import yacc
+
+# -----------------------------------------------------------------------------
+# grammar_source()
+#
+# Return the source of a parser module for synthetic_grammar(nfamilies) plus
+# nprec precedence levels.
+# -----------------------------------------------------------------------------
+
+def grammar_source(nfamilies, nprec):
+    g = synthetic_grammar(nfamilies)
+    rules = {}
+    for p in g.Productions[1:]:
+        rules.setdefault(p.name, []).append(list(p.prod))
+
+    ops = ['P%d' % i for i in range(nprec)]
+    rules['stmt'].append(['PRINT', 'pexpr', 'SEMI'])
+    rules['pexpr'] = [['pexpr', op, 'pexpr'] for op in ops] + [['ID'], ['LPAREN', 'pexpr', 'RPAREN']]
+    tokens = sorted(t for t in g.Terminals if t != 'error') + ['PRINT'] + ops
+
+    lines = ['tokens = %r' % (tokens,),
+             'precedence = %r' % (tuple(('left', op) for op in ops),),
+             '',
+             'def p_error(t):',
+             '    pass',
+             '']
+    for name, prods in rules.items():
+        lines.append('def p_%s(p):' % name)
+        lines.append("    '''%s : %s" % (name, ' '.join(prods[0])))
+        for syms in prods[1:]:
+            lines.append('%s| %s' % (' ' * (len(name) + 5), ' '.join(syms)))
+        lines[-1] += "'''"
+        lines.append('    p[0] = p[1] if len(p) > 1 else None')
+        lines.append('')
+    return '\n'.join(lines)
+
+def load_module(dirname, name, source):
+    filename = os.path.join(dirname, name + '.py')
+    with open(filename, 'w') as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def build(module, stats=None):
+    return yacc.yacc(module=module, debug=False, errorlog=yacc.NullLogger(), stats=stats)
+
+def main():
+    families = sys.argv[1] if len(sys.argv) > 1 else '25,50,100,200'
+    precs = sys.argv[2] if len(sys.argv) > 2 else '4,32'
+
+    phases = ['lr0_items', 'add_lalr_lookaheads', 'lr_parse_table', 'LRParser']
+    print('%8s %5s %6s %6s %6s %8s' % ('families', 'prec', 'prods', 'syms', 'states', 'seconds'), end='')
+    print(''.join(' %10s' % name[:10] for name in phases), '%9s' % 'peak MB')
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for nfamilies in [int(n) for n in families.split(',')]:
+            for nprec in [int(n) for n in precs.split(',')]:
+                module = load_module(tmpdir, 'synth_%d_%d' % (nfamilies, nprec), grammar_source(nfamilies, nprec))
+
+                stats = yacc.BuildStats()
+                parser = build(module, stats)
+                seconds = {name: t for name, t, counts in stats.phases}
+                grammar = {name: counts for name, t, counts in stats.phases}['grammar']
+
+                tracemalloc.start()
+                build(module)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print('%8d %5d %6d %6d %6d %8.3f' % (nfamilies, nprec, len(parser.productions),
+                                                     grammar.get('terminals', 0) + grammar.get('nonterminals', 0),
+                                                     parser.tables.nstates, stats.total), end='')
+                print(''.join(' %10.3f' % seconds.get(name, 0.0) for name in phases), '%9.1f' % (peak / 2**20))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
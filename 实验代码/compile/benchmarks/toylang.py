@@ -0,0 +1,250 @@
+# -----------------------------------------------------------------------------
+# toylang.py
+#
+# Lexer and grammar for the toy language used by the inputs in tests/, plus a
+# generator for synthetic source code in the same dialect.  This module is
+# shared by the benchmark scripts in this directory.  Run as a script, it parses
+# the files given on the command line.
+#
+# The dialect mixes Pascal-like statements (while ... do, if ... then ... else,
+# begin ... end) with C-like ones (declarations, casts, braces and break).
+# Semicolons after simple statements are optional.
+# -----------------------------------------------------------------------------
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ply import lex, yacc
+
+reserved = {
+    'if'    : 'IF',
+    'then'  : 'THEN',
+    'else'  : 'ELSE',
+    'while' : 'WHILE',
+    'do'    : 'DO',
+    'begin' : 'BEGIN',
+    'end'   : 'END',
+    'int'   : 'INT',
+    'float' : 'FLOAT',
+    'break' : 'BREAK',
+}
+
+tokens = [
+    'ID', 'NUMBER', 'REAL', 'HEX', 'OCT',
+    'PLUS', 'MINUS', 'TIMES', 'DIVIDE', 'ASSIGN',
+    'EQ', 'NE', 'LT', 'GT', 'LE', 'GE',
+    'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE', 'SEMI',
+] + list(reserved.values())
+
+# Tokens
+
+t_PLUS    = r'\+'
+t_MINUS   = r'-'
+t_TIMES   = r'\*'
+t_DIVIDE  = r'/'
+t_EQ      = r'=='
+t_NE      = r'!='
+t_LE      = r'<='
+t_GE      = r'>='
+t_LT      = r'<'
+t_GT      = r'>'
+t_ASSIGN  = r'='
+t_LPAREN  = r'\('
+t_RPAREN  = r'\)'
+t_LBRACE  = r'\{'
+t_RBRACE  = r'\}'
+t_SEMI    = r';'
+
+t_ignore = ' \t\r'
+
+def t_REAL(t):
+    r'\d+\.\d+'
+    t.value = float(t.value)
+    return t
+
+def t_HEX(t):
+    r'0[xX][0-9a-fA-F]+'
+    t.value = int(t.value, 16)
+    return t
+
+def t_OCT(t):
+    r'0[0-7]+'
+    t.value = int(t.value, 8)
+    return t
+
+def t_NUMBER(t):
+    r'\d+'
+    t.value = int(t.value)
+    return t
+
+def t_ID(t):
+    r'[A-Za-z_][A-Za-z0-9_]*'
+    t.type = reserved.get(t.value, 'ID')
+    return t
+
+def t_newline(t):
+    r'\n+'
+    t.lexer.lineno += len(t.value)
+
+def t_error(t):
+    t.lexer.skip(1)
+
+# Parsing rules
+
+precedence = (
+    ('nonassoc', 'EQ', 'NE', 'LT', 'GT', 'LE', 'GE'),
+    ('left', 'PLUS', 'MINUS'),
+    ('left', 'TIMES', 'DIVIDE'),
+)
+
+def p_program(p):
+    'program : stmts'
+    p[0] = ('program', p[1])
+
+def p_stmts_many(p):
+    'stmts : stmts stmt'
+    p[1].append(p[2])
+    p[0] = p[1]
+
+def p_stmts_one(p):
+    'stmts : stmt'
+    p[0] = [p[1]]
+
+def p_stmt_simple(p):
+    '''stmt : simple SEMI
+            | simple'''
+    p[0] = p[1]
+
+def p_stmt_block(p):
+    '''stmt : BEGIN stmts END SEMI
+            | BEGIN stmts END
+            | LBRACE stmts RBRACE'''
+    p[0] = ('block', p[2])
+
+def p_simple_assign(p):
+    'simple : ID ASSIGN expr'
+    p[0] = ('assign', p[1], p[3])
+
+def p_simple_decl(p):
+    '''simple : INT ID
+              | FLOAT ID'''
+    p[0] = ('decl', p[1], p[2])
+
+def p_simple_break(p):
+    'simple : BREAK'
+    p[0] = ('break',)
+
+def p_stmt_if(p):
+    '''stmt : IF expr THEN stmt
+            | IF expr stmt'''
+    p[0] = ('if', p[2], p[len(p) - 1], None)
+
+def p_stmt_ifelse(p):
+    '''stmt : IF expr THEN stmt ELSE stmt
+            | IF expr stmt ELSE stmt'''
+    p[0] = ('if', p[2], p[len(p) - 3], p[len(p) - 1])
+
+def p_stmt_while(p):
+    '''stmt : WHILE expr DO stmt
+            | WHILE expr stmt'''
+    p[0] = ('while', p[2], p[len(p) - 1])
+
+def p_expr_binop(p):
+    '''expr : expr PLUS expr
+            | expr MINUS expr
+            | expr TIMES expr
+            | expr DIVIDE expr
+            | expr EQ expr
+            | expr NE expr
+            | expr LT expr
+            | expr GT expr
+            | expr LE expr
+            | expr GE expr'''
+    p[0] = (p[2], p[1], p[3])
+
+def p_expr_group(p):
+    'expr : LPAREN expr RPAREN'
+    p[0] = p[2]
+
+def p_expr_cast(p):
+    '''expr : LPAREN INT RPAREN factor
+            | LPAREN FLOAT RPAREN factor'''
+    p[0] = ('cast', p[2], p[4])
+
+def p_expr_factor(p):
+    'expr : factor'
+    p[0] = p[1]
+
+def p_factor_number(p):
+    '''factor : NUMBER
+              | REAL
+              | HEX
+              | OCT'''
+    p[0] = p[1]
+
+def p_factor_id(p):
+    'factor : ID'
+    p[0] = ('id', p[1])
+
+def p_error(t):
+    pass
+
+# -----------------------------------------------------------------------------
+# build()
+#
+# Build a lexer and a parser for the toy language.  Keyword arguments are
+# passed on to yacc().
+# -----------------------------------------------------------------------------
+
+def build(**kwargs):
+    module = sys.modules[__name__]
+    lexer = lex.lex(module=module)
+    kwargs.setdefault('debug', False)
+    kwargs.setdefault('errorlog', yacc.NullLogger())
+    parser = yacc.yacc(module=module, **kwargs)
+    return lexer, parser
+
+# -----------------------------------------------------------------------------
+# generate()
+#
+# Generate a synthetic program of nstmts top level statements.  The output is
+# deterministic for a given seed.
+# -----------------------------------------------------------------------------
+
+def generate(nstmts, seed=1):
+    rnd = random.Random(seed)
+
+    def expr(depth=0):
+        r = rnd.random()
+        if depth > 3 or r < 0.3:
+            return rnd.choice(['x', 'y2', 'abc', '12', '0x1f', '07', '3.14', 'cnt'])
+        if r < 0.45:
+            return '(' + expr(depth + 1) + ')'
+        return expr(depth + 1) + ' ' + rnd.choice('+-*/') + ' ' + expr(depth + 1)
+
+    def cond():
+        return expr(2) + ' ' + rnd.choice(['<', '>', '==', '<=', '!=']) + ' ' + expr(2)
+
+    def stmt(depth=0):
+        r = rnd.random()
+        if depth > 2 or r < 0.5:
+            return rnd.choice(['x', 'y', 'z', 'cnt']) + ' = ' + expr() + ';\n'
+        if r < 0.65:
+            return 'while ' + cond() + ' do\n' + stmt(depth + 1)
+        if r < 0.8:
+            return 'if ' + cond() + ' then\n' + stmt(depth + 1) + 'else\n' + stmt(depth + 1)
+        return 'begin\n' + ''.join(stmt(depth + 1) for _ in range(3)) + 'end;\n'
+
+    return ''.join(stmt() for _ in range(nstmts))
+
+# Parse the files given on the command line (see yacc.runmain()).  For example,
+# to check the inputs in tests/, which have no extension (the pattern leaves out
+# the .py files next to them):
+#
+#     python benchmarks/toylang.py -j 4 --pattern '*[!y]' tests
+if __name__ == '__main__':
+    lexer, parser = build()
+    sys.exit(1 if yacc.runmain(parser, lexer) else 0)
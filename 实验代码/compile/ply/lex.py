@@ -39,6 +39,21 @@ import types
 import copy
 import os
 import inspect
+import time
+import importlib
+import codecs
+import linecache
+import textwrap
+from array import array
+from bisect import bisect_left, bisect_right
+
+from . import __version__
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -58,6 +73,168 @@ class LexToken(object):
     def __repr__(self):
         return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
 
+    # Tokens produced by a lexer with a line index don't have a lineno
+    # attribute.  Instead, they carry the index (lexlines) and look up
+    # their line and column from it when asked
+    def __getattr__(self, name):
+        if name == 'lineno':
+            return bisect_left(self.lexlines, self.lexpos) + 1
+        elif name == 'column':
+            return _find_column(self.lexlines, self.lexpos)
+        raise AttributeError(name)
+
+# Compact token class.  This has the same interface as LexToken, but uses
+# __slots__ so that tokens carry no per-instance dictionary.  Token rules
+# can't attach additional attributes to these tokens.  Selected by passing
+# compact=True to lex().
+class CompactLexToken(object):
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer', 'lexlines')
+
+    __repr__ = LexToken.__repr__
+    __getattr__ = LexToken.__getattr__
+
+# Return the column (starting at 1) of position lexpos given the positions
+# of all newlines in the input
+def _find_column(lexlines, lexpos):
+    i = bisect_left(lexlines, lexpos)
+    return lexpos - lexlines[i-1] if i else lexpos + 1
+
+# Token arrays.  This class holds the output of Lexer.tokenize_all() in
+# struct-of-arrays form.  For token i:
+#
+#    types[i]     - Type code.  typenames[types[i]] is the token type
+#    lexpos[i]    - Starting position in the input string
+#    endpos[i]    - Ending position in the input string
+#    lineno[i]    - Line number
+#
+# Token values are only materialized when requested.  By default the value
+# of a token is the slice data[lexpos[i]:endpos[i]] of the input.  Tokens
+# produced by function rules may have changed their value, so those values
+# are kept in the values dictionary (keyed by token index).
+class TokenArrays(object):
+    def __init__(self, data, typenames):
+        self.data = data
+        self.typenames = typenames
+        self.types = array('H')
+        self.lexpos = array('i')
+        self.endpos = array('i')
+        self.lineno = array('i')
+        self.values = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    # Return the type name of token i
+    def type(self, i):
+        return self.typenames[self.types[i]]
+
+    # Return the value of token i
+    def value(self, i):
+        try:
+            return self.values[i]
+        except KeyError:
+            return self.data[self.lexpos[i]:self.endpos[i]]
+
+    # Return token i as a LexToken
+    def token(self, i):
+        tok = LexToken()
+        tok.type = self.typenames[self.types[i]]
+        tok.value = self.value(i)
+        tok.lineno = self.lineno[i]
+        tok.lexpos = self.lexpos[i]
+        return tok
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self.token(i)
+
+# Token list.  This class holds the tokens returned by Lexer.relex().  It is a
+# read-only sequence made of runs of other token lists, each with the amounts by
+# which the lexpos and lineno of its tokens are shifted (and the line index they
+# use, if any).  A shifted token is copied the first time it is read, so the
+# tokens of the lists it was made from are never changed, and making the list
+# costs time in the number of runs rather than in the number of tokens.
+#
+#    prefix   - Number of tokens at the start that are unchanged by the edit
+#    suffix   - Number of tokens at the end that are unchanged by the edit (but
+#               may have moved)
+class TokenList(object):
+    maxruns = 256                   # Runs kept before the tokens are copied into one
+
+    def __init__(self, runs, prefix=0, suffix=0):
+        self.runs = runs            # (tokens, start, stop, dpos, dline, lexlines) tuples
+        self.starts = []            # Index of the first token of each run
+        n = 0
+        for run in runs:
+            self.starts.append(n)
+            n += run[2] - run[1]
+        self.length = n
+        self.copies = {}            # Shifted copies made so far, by index
+        self.prefix = prefix
+        self.suffix = suffix
+        if len(runs) > self.maxruns:
+            self.runs = [(list(self), 0, n, 0, 0, None)]
+            self.starts = [0]
+            self.copies = {}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError('token index out of range')
+        tok = self.copies.get(i)
+        if tok is None:
+            r = bisect_right(self.starts, i) - 1
+            tokens, start, stop, dpos, dline, lexlines = self.runs[r]
+            tok = tokens[start + i - self.starts[r]]
+            if dpos or dline or lexlines is not None:
+                tok = self.copies[i] = _shift_token(tok, dpos, dline, lexlines)
+        return tok
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    # Return the runs holding tokens start to stop, shifted by dpos and dline
+    # (with the line index lexlines)
+    def slice_runs(self, start, stop, dpos=0, dline=0, lexlines=None):
+        runs = []
+        r = max(bisect_right(self.starts, start) - 1, 0)
+        while r < len(self.runs) and self.starts[r] < stop:
+            tokens, rstart, rstop, rdpos, rdline, rlexlines = self.runs[r]
+            first = self.starts[r]
+            lo = rstart + max(start - first, 0)
+            hi = rstop - max(first + rstop - rstart - stop, 0)
+            if lo < hi:
+                runs.append((tokens, lo, hi, rdpos + dpos, rdline + dline,
+                             lexlines if lexlines is not None else rlexlines))
+            r += 1
+        return runs
+
+# Return a copy of tok moved by dpos characters and dline lines.  Slots are
+# read directly, so that an unset lineno isn't looked up in the old line index
+def _shift_token(tok, dpos, dline, lexlines):
+    cls = type(tok)
+    new = cls.__new__(cls)
+    for name in getattr(cls, '__slots__', ()):
+        try:
+            setattr(new, name, object.__getattribute__(tok, name))
+        except AttributeError:
+            pass
+    if hasattr(tok, '__dict__'):
+        new.__dict__.update(tok.__dict__)
+    new.lexpos += dpos
+    if lexlines is not None:
+        new.lexlines = lexlines
+    else:
+        new.lineno += dline
+    return new
+
 # This object is a stand-in for a logging object created by the
 # logging module.
 
@@ -77,6 +254,249 @@ class PlyLogger(object):
     info = critical
     debug = critical
 
+# -----------------------------------------------------------------------------
+#                        === Token Loop ===
+#
+# All of the lexers share one implementation of the main loop of token().
+# _token_source() writes the source of the method and _make_token() compiles
+# it.  The variants are:
+#
+#    _token_source()               -  Lexer.token()
+#    _token_source(profile=True)   -  ProfileLexer.token(), which is Lexer.token()
+#                                     with the statistics of LexProfile added
+#    _token_source(lexobj)         -  The token() method written by
+#                                     write_module() for lexobj
+#
+# In the last one, the rule lookup is done through the first character table
+# of PrebuiltLexer, and the code for features the lexer doesn't use is left
+# out.  Streams are handed over to Lexer.token().
+#
+# Note: The generated loop has been carefully written to be as fast as
+# possible.  Don't make changes unless you really know what you are doing
+# -----------------------------------------------------------------------------
+
+def _token_source(lexobj=None, profile=False):
+    general = lexobj is None
+    if general:
+        onestate = False
+        anyignore = literals = errorf = eoff = True
+        lexliterals = 'self.lexliterals'
+        tokclass = 'tokclass'
+        offset = ' + lexoffset'
+        setlineno = ['if lexlines is None:',
+                     '    tok.lineno = self.lineno',
+                     'else:',
+                     '    tok.lexlines = lexlines']
+    else:
+        onestate = len(lexobj.lexstateinfo) == 1
+        anyignore = any(lexobj.lexstateignore.values())
+        literals = bool(lexobj.lexliterals)
+        errorf = any(lexobj.lexstateerrorf.values())
+        eoff = any(lexobj.lexstateeoff.values())
+        lexliterals = repr(lexobj.lexliterals)
+        tokclass = lexobj.lextokenclass.__name__
+        offset = ''
+        setlineno = ['tok.lexlines = lexlines' if lexobj.lexlineindex else 'tok.lineno = self.lineno']
+
+    lines = []
+
+    def emit(indent, *code):
+        for line in code:
+            lines.append(' ' * indent + line if line else '')
+
+    # Create a token of the given type at lexpos
+    def newtoken(indent, toktype, value):
+        emit(indent, f'tok = {tokclass}()',
+                     f'tok.type = {toktype}',
+                     f'tok.value = {value}')
+        emit(indent, *setlineno)
+        emit(indent, f'tok.lexpos = lexpos{offset}')
+
+    # Pick up the attributes a rule may have changed
+    def reload(indent):
+        emit(indent, 'lexpos = self.lexpos')
+        if not onestate:
+            if not general:
+                emit(indent, 'lexdispatch = self._lexdispatch')
+            if anyignore:
+                emit(indent, 'lexignore = self.lexignore')
+
+    # Pick up the new window of a stream after _fill()
+    def window(indent):
+        emit(indent, 'lexpos    = self.lexpos',
+                     'lexlen    = self.lexlen',
+                     'lexdata   = self.lexdata',
+                     'lexoffset = self.lexoffset')
+
+    emit(0, 'def token(self):')
+    if not general:
+        emit(4, 'if self.lexstream is not None:',
+                '    return PrebuiltLexer.token(self)',
+                '')
+    emit(4, '# Make local copies of frequently referenced attributes',
+            'lexpos      = self.lexpos',
+            'lexlen      = self.lexlen',
+            'lexdata     = self.lexdata')
+    if general:
+        emit(4, 'lexoffset   = self.lexoffset',
+                'lexlines    = self.lexlines',
+                'tokclass    = self.lextokenclass')
+    else:
+        emit(4, 'lexdispatch = self._lexdispatch')
+        if lexobj.lexlineindex:
+            emit(4, 'lexlines    = self.lexlines')
+    if anyignore and not onestate:
+        emit(4, 'lexignore   = self.lexignore')
+    if profile:
+        emit(4, 'profile     = self.lexprofile',
+                'perf_counter = time.perf_counter')
+    emit(0, '')
+
+    # The loop over the buffered input.  In the general method it is run
+    # again each time the window of a stream is refilled
+    if general:
+        emit(4, 'while True:')
+    ind = 12 if general else 8
+    emit(ind - 4, 'while lexpos < lexlen:')
+    emit(ind, '# This code provides some short-circuit code for whitespace, tabs, and other ignored characters',
+              'c = lexdata[lexpos]')
+    if anyignore:
+        ignore = repr(lexobj.lexstateignore.get('INITIAL', '')) if onestate else 'lexignore'
+        emit(ind, f'if c in {ignore}:',
+                  '    lexpos += 1')
+        if profile:
+            emit(ind, '    profile.ignored += 1')
+        emit(ind, '    continue')
+    emit(ind, '',
+              '# Look for a regular expression match.  Only the rules that can',
+              '# start with the current character are tried')
+    if general:
+        emit(ind, 'for lexre, lexindexfunc in self.lexdispatch.get(c, self.lexre):',
+                  '    m = lexre.match(lexdata, lexpos)',
+                  '    if m:',
+                  '        break',
+                  'else:',
+                  '    m = None')
+    else:
+        emit(ind, 'try:',
+                  '    lexre, lexindexfunc = lexdispatch[c]',
+                  'except KeyError:',
+                  '    lexre, lexindexfunc = self._load(c)',
+                  'm = lexre.match(lexdata, lexpos) if lexre else None')
+    emit(ind, 'if m:',
+              '    end = m.end()')
+    if general:
+        emit(ind, '    if end > lexlen:',
+                  '        # The match ends less than chunksize characters before the end of the',
+                  '        # text read from a stream, so it may be cut short.  Read more of the',
+                  '        # stream and match again',
+                  '        self._fill(lexpos, end - lexpos + self.lexchunksize)')
+        window(ind + 8)
+        emit(ind, '        continue')
+    emit(ind, '    func, toktype = lexindexfunc[m.lastindex]')
+    if profile:
+        emit(ind, '    stats = profile.rule(m.lastgroup)',
+                  '    stats.matches += 1',
+                  '    stats.chars += end - lexpos')
+    emit(ind, '    if not func:',
+              "        # If no token type was set, it's an ignored token",
+              '        if not toktype:',
+              '            lexpos = end',
+              '            continue')
+    newtoken(ind + 8, 'toktype', 'm.group()')
+    emit(ind, '        self.lexpos = end',
+              '        return tok',
+              '',
+              '    # If token is processed by a function, call it')
+    newtoken(ind + 4, 'toktype', 'm.group()')
+    emit(ind, '    tok.lexer = self      # Set additional attributes useful in token rules',
+              '    self.lexmatch = m',
+              '    self.lexpos = end')
+    if profile:
+        emit(ind, '    start = perf_counter()',
+                  '    newtok = func(tok)',
+                  '    stats.time += perf_counter() - start')
+    else:
+        emit(ind, '    newtok = func(tok)')
+    emit(ind, '    del tok.lexer',
+              '    del self.lexmatch',
+              '',
+              '    # Every function must return a token, if nothing, we just move to next token',
+              '    if newtok:',
+              '        return newtok')
+    reload(ind + 4)
+    emit(ind, '    continue',
+              '')
+
+    if literals:
+        emit(ind, '# No match, see if in literals',
+                  f'if c in {lexliterals}:')
+        if profile:
+            emit(ind, '    profile.literals[c] = profile.literals.get(c, 0) + 1')
+        newtoken(ind + 4, 'c', 'c')
+        emit(ind, '    self.lexpos = lexpos + 1',
+                  '    return tok',
+                  '')
+
+    if errorf:
+        emit(ind, '# No match. Call t_error() if defined.',
+                  'if self.lexerrorf:')
+        newtoken(ind + 4, "'error'", 'lexdata[lexpos:]')
+        emit(ind, '    tok.lexer = self',
+                  '    self.lexpos = lexpos')
+        if profile:
+            emit(ind, '    start = perf_counter()',
+                      '    newtok = self.lexerrorf(tok)',
+                      '    profile.errortime += perf_counter() - start',
+                      '    profile.errors += 1')
+        else:
+            emit(ind, '    newtok = self.lexerrorf(tok)')
+        emit(ind, '    if lexpos == self.lexpos:',
+                  "        # Error method didn't change text position at all. This is an error.",
+                  '        raise LexError(f"Scanning error. Illegal character {c!r}", lexdata[lexpos:])')
+        if profile:
+            emit(ind, '    profile.errorchars += self.lexpos - lexpos')
+        emit(ind, '    if newtok:',
+                  '        return newtok')
+        reload(ind + 4)
+        emit(ind, '    continue',
+                  '')
+
+    emit(ind, 'self.lexpos = lexpos',
+              f'raise LexError(f"Illegal character {{c!r}} at index {{lexpos{offset}}}", lexdata[lexpos:])')
+    emit(0, '')
+
+    if general:
+        emit(8, '# Out of buffered input.  If reading from a stream, get more of it',
+                'if self.lexstream is None or not self._fill(lexpos):',
+                '    break')
+        window(8)
+        emit(0, '')
+
+    if eoff:
+        emit(4, 'if self.lexeoff:')
+        newtoken(8, "'eof'", "''")
+        emit(4, '    tok.lexer = self',
+                '    self.lexpos = lexpos',
+                '    return self.lexeoff(tok)',
+                '')
+    emit(4, 'self.lexpos = lexpos + 1',
+            'if self.lexdata is None:',
+            "    raise RuntimeError('No input string given with input()')",
+            'return None')
+    return ''.join(line + '\n' for line in lines)
+
+# Compile the source of a token() method written by _token_source().  The
+# source is entered in linecache so that tracebacks through it show the code
+def _make_token(source, qualname):
+    filename = f'<ply.lex {qualname}>'
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {}
+    exec(compile(source, filename, 'exec'), globals(), namespace)
+    token = namespace['token']
+    token.__qualname__ = qualname
+    return token
+
 # -----------------------------------------------------------------------------
 #                        === Lexing Engine ===
 #
@@ -84,8 +504,14 @@ class PlyLogger(object):
 # a few public methods and attributes:
 #
 #    input()          -  Store a new string in the lexer
+#    input_stream()   -  Lex the text read from a file object or mmap
 #    token()          -  Get the next token
+#    tokenize_all()   -  Get all remaining tokens as a TokenArrays object
+#    relex()          -  Update a list of tokens after an edit to the input
+#    find_lineno()    -  Line number of a position in the input
+#    find_column()    -  Column number of a position in the input
 #    clone()          -  Clone the lexer
+#    write_module()   -  Write the lexer out as a Python module
 #
 #    lineno           -  Current line number
 #    lexpos           -  Current position in the input string
@@ -101,9 +527,14 @@ class Lexer:
         self.lexstatere = {}          # Dictionary mapping lexer states to master regexs
         self.lexstateretext = {}      # Dictionary mapping lexer states to regex strings
         self.lexstaterenames = {}     # Dictionary mapping lexer states to symbol names
+        self.lexstaterules = {}       # Dictionary mapping lexer states to lists of (name, regex) rules
         self.lexstate = 'INITIAL'     # Current lexer state
         self.lexstatestack = []       # Stack of lexer states
         self.lexstateinfo = None      # State information
+        self.lexdispatch = {}         # First character dispatch table. This maps
+                                      # characters to lists like lexre, holding only
+                                      # the rules that can match at that character
+        self.lexstatedispatch = {}    # Dictionary mapping lexer states to dispatch tables
         self.lexstateignore = {}      # Dictionary of ignored characters for each state
         self.lexstateerrorf = {}      # Dictionary of error functions for each state
         self.lexstateeoff = {}        # Dictionary of eof functions for each state
@@ -111,6 +542,11 @@ class Lexer:
         self.lexdata = None           # Actual input data (as a string)
         self.lexpos = 0               # Current position in input text
         self.lexlen = 0               # Length of the input text
+        self.lexoffset = 0            # Position of lexdata[0] in the input (streams only)
+        self.lexstream = None         # Input stream (if any)
+        self.lexdecoder = None        # Incremental decoder for binary input streams
+        self.lexchunksize = 0         # Number of characters read from the stream at a time
+        self.lexstreameof = False     # Set once the input stream is exhausted
         self.lexerrorf = None         # Error rule (if any)
         self.lexeoff = None           # EOF rule (if any)
         self.lextokens = None         # List of valid tokens
@@ -118,6 +554,9 @@ class Lexer:
         self.lexliterals = ''         # Literal characters that can be passed through
         self.lexmodule = None         # Module
         self.lineno = 1               # Current line number
+        self.lexlineindex = False     # Build a line index for each input?
+        self.lexlines = None          # Positions of all newlines in the input (line index)
+        self.lextokenclass = LexToken # Class used for the tokens produced
 
     def clone(self, object=None):
         c = copy.copy(self)
@@ -127,8 +566,7 @@ class Lexer:
         # the lexstatere and lexstateerrorf tables.
 
         if object:
-            newtab = {}
-            for key, ritem in self.lexstatere.items():
+            def rebind(ritem):
                 newre = []
                 for cre, findex in ritem:
                     newfindex = []
@@ -137,15 +575,33 @@ class Lexer:
                             newfindex.append(f)
                             continue
                         newfindex.append((getattr(object, f[0].__name__), f[1]))
-                newre.append((cre, newfindex))
-                newtab[key] = newre
-            c.lexstatere = newtab
+                    newre.append((cre, newfindex))
+                return newre
+
+            c.lexstatere = { key: rebind(ritem) for key, ritem in self.lexstatere.items() }
+            c.lexstatedispatch = { key: { ch: rebind(ritem) for ch, ritem in dispatch.items() }
+                                   for key, dispatch in self.lexstatedispatch.items() }
+            if c.lexstate in c.lexstatere:
+                c.lexre = c.lexstatere[c.lexstate]
+            c.lexdispatch = c.lexstatedispatch.get(c.lexstate, {})
             c.lexstateerrorf = {}
             for key, ef in self.lexstateerrorf.items():
                 c.lexstateerrorf[key] = getattr(object, ef.__name__)
             c.lexmodule = object
         return c
 
+    # ------------------------------------------------------------
+    # __reduce__() - Pickle support
+    #
+    # The rule functions and the module the lexer was built from
+    # are stored by name and looked up again when the lexer is
+    # loaded (see _callable_ref()).  The compiled regexes are
+    # pickled as their text.  A lexer reading a stream can't be
+    # pickled.
+    # ------------------------------------------------------------
+    def __reduce__(self):
+        return (_load_lexer, (type(self), _map_lexer_functions(self.__dict__, _callable_ref)))
+
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
@@ -153,6 +609,94 @@ class Lexer:
         self.lexdata = s
         self.lexpos = 0
         self.lexlen = len(s)
+        self.lexoffset = 0
+        self.lexstream = None
+        if self.lexlineindex:
+            self.lexlines = array('i', [m.start() for m in re.finditer('\n', s)])
+
+    # ------------------------------------------------------------
+    # find_lineno() - Line number of a position in the input
+    # find_column() - Column number (starting at 1) of a position
+    #
+    # These use the line index if there is one and otherwise count
+    # newlines in the input.
+    # ------------------------------------------------------------
+    def find_lineno(self, lexpos):
+        if self.lexlines is not None:
+            return bisect_left(self.lexlines, lexpos) + 1
+        return self.lexdata.count('\n', 0, lexpos) + 1
+
+    def find_column(self, lexpos):
+        if self.lexlines is not None:
+            return _find_column(self.lexlines, lexpos)
+        return lexpos - self.lexdata.rfind('\n', 0, lexpos)
+
+    # ------------------------------------------------------------
+    # input_stream() - Lex the text read from a file object or mmap
+    #
+    # The input is read chunksize characters at a time, so only a
+    # window of it is ever held in memory.  Binary streams (including
+    # mmap objects) are decoded using the given encoding.
+    #
+    # While lexing a stream, lexdata only holds the current window of
+    # the input and lexpos is relative to it.  lexoffset is the position
+    # of lexdata[0] in the whole input.  The lexpos attribute of the
+    # tokens produced is always the position in the whole input.  At
+    # least chunksize characters past the start of each token are
+    # available when it is matched, and a match is only accepted once
+    # chunksize characters past its end have been read as well (more
+    # of the stream is read and the match is tried again otherwise).
+    # So tokens may be of any length, and rules may look up to
+    # chunksize characters ahead.  A rule that fails to match at all
+    # because the text it needs is further away (such as a quoted
+    # string longer than chunksize) is not retried.
+    # ------------------------------------------------------------
+    def input_stream(self, f, chunksize=1 << 16, encoding='utf-8', errors='strict'):
+        if chunksize < 1:
+            raise ValueError('chunksize must be positive')
+        if self.lexlineindex:
+            raise RuntimeError('input_stream() can not be used with a line index')
+        self.lexstream = f
+        self.lexdecoder = codecs.getincrementaldecoder(encoding)(errors)
+        self.lexchunksize = chunksize
+        self.lexstreameof = False
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lexoffset = 0
+
+    # ------------------------------------------------------------
+    # _fill() - Refill the window when lexing a stream
+    #
+    # Discards the text in front of lexpos and reads from the stream
+    # until there are chunksize characters beyond the new lexlen (and
+    # at least minsize characters in all), or until the stream runs
+    # out.  Returns False if no input remains.
+    # ------------------------------------------------------------
+    def _fill(self, lexpos, minsize=0):
+        chunksize = self.lexchunksize
+        minsize = max(minsize, 2 * chunksize)
+        # A rule may have skipped beyond the end of the window
+        skip = max(lexpos - len(self.lexdata), 0)
+        parts = [self.lexdata[lexpos:]]
+        size = len(parts[0]) - skip
+        while not self.lexstreameof and size < minsize:
+            raw = self.lexstream.read(chunksize)
+            if isinstance(raw, str):
+                chunk = raw
+            else:
+                chunk = self.lexdecoder.decode(raw, not raw)
+            if not raw:
+                self.lexstreameof = True
+            parts.append(chunk)
+            size += len(chunk)
+
+        data = ''.join(parts)[skip:]
+        self.lexoffset += lexpos
+        self.lexdata = data
+        self.lexpos = 0
+        self.lexlen = len(data) if self.lexstreameof else len(data) - chunksize
+        return self.lexlen > 0
 
     # ------------------------------------------------------------
     # begin() - Changes the lexing state
@@ -161,6 +705,7 @@ class Lexer:
         if state not in self.lexstatere:
             raise ValueError(f'Undefined state {state!r}')
         self.lexre = self.lexstatere[state]
+        self.lexdispatch = self.lexstatedispatch.get(state, {})
         self.lexretext = self.lexstateretext[state]
         self.lexignore = self.lexstateignore.get(state, '')
         self.lexerrorf = self.lexstateerrorf.get(state, None)
@@ -195,80 +740,133 @@ class Lexer:
     # ------------------------------------------------------------
     # token() - Return the next token from the Lexer
     #
-    # Note: This function has been carefully implemented to be as fast
-    # as possible.  Don't make changes unless you really know what
-    # you are doing
+    # The method is generated by _token_source() above, which also
+    # writes the token() methods of ProfileLexer and of the modules
+    # written by write_module().  Make changes to the loop there.
     # ------------------------------------------------------------
-    def token(self):
-        # Make local copies of frequently referenced attributes
+    token = _make_token(_token_source(), 'Lexer.token')
+
+    # Iterator interface
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+    # ------------------------------------------------------------
+    # tokenize_all() - Tokenize the rest of the input in bulk
+    #
+    # Returns a TokenArrays object holding all of the remaining tokens
+    # in the input.  Tokens matched by string rules and literals are
+    # recorded directly in the arrays without creating token objects.
+    # Function rules and t_error() are called exactly as token() calls
+    # them.  t_eof() is called once at the end of the input.
+    # ------------------------------------------------------------
+    def tokenize_all(self):
+        if self.lexdata is None:
+            raise RuntimeError('No input string given with input()')
+        if self.lexstream is not None:
+            raise RuntimeError('tokenize_all() requires input given with input()')
+
+        # Type codes are assigned to the known token types up front. Types
+        # invented by function rules get a code the first time they are seen
+        typenames = sorted(self.lextokens_all)
+        typecodes = {name: code for code, name in enumerate(typenames)}
+
+        result    = TokenArrays(self.lexdata, typenames)
+        types     = result.types
+        positions = result.lexpos
+        ends      = result.endpos
+        linenos   = result.lineno
+
+        # Record a token object produced by a function, error or eof rule
+        def add_token(tok, endpos):
+            code = typecodes.get(tok.type)
+            if code is None:
+                code = typecodes[tok.type] = len(typenames)
+                typenames.append(tok.type)
+            result.values[len(types)] = tok.value
+            types.append(code)
+            positions.append(tok.lexpos)
+            ends.append(endpos)
+            linenos.append(tok.lineno)
+
         lexpos    = self.lexpos
         lexlen    = self.lexlen
         lexignore = self.lexignore
         lexdata   = self.lexdata
+        lexlines  = self.lexlines
+        tokclass  = self.lextokenclass
 
         while lexpos < lexlen:
-            # This code provides some short-circuit code for whitespace, tabs, and other ignored characters
-            if lexdata[lexpos] in lexignore:
+            c = lexdata[lexpos]
+            if c in lexignore:
                 lexpos += 1
                 continue
 
-            # Look for a regular expression match
-            for lexre, lexindexfunc in self.lexre:
+            # Look for a regular expression match.  Only the rules that can
+            # start with the current character are tried
+            for lexre, lexindexfunc in self.lexdispatch.get(c, self.lexre):
                 m = lexre.match(lexdata, lexpos)
                 if not m:
                     continue
 
-                # Create a token for return
-                tok = LexToken()
-                tok.value = m.group()
-                tok.lineno = self.lineno
-                tok.lexpos = lexpos
-
-                i = m.lastindex
-                func, tok.type = lexindexfunc[i]
+                func, toktype = lexindexfunc[m.lastindex]
 
                 if not func:
-                    # If no token type was set, it's an ignored token
-                    if tok.type:
-                        self.lexpos = m.end()
-                        return tok
-                    else:
-                        lexpos = m.end()
-                        break
+                    # Simple rule. No token object is needed.  If no token type
+                    # was set, it's an ignored token
+                    if toktype:
+                        types.append(typecodes[toktype])
+                        positions.append(lexpos)
+                        ends.append(m.end())
+                        linenos.append(self.lineno)
+                    lexpos = m.end()
+                    break
 
+                tok = tokclass()
+                tok.value = m.group()
+                if lexlines is None:
+                    tok.lineno = self.lineno
+                else:
+                    tok.lexlines = lexlines
+                tok.lexpos = lexpos
+                tok.type = toktype
                 lexpos = m.end()
 
-                # If token is processed by a function, call it
-
-                tok.lexer = self      # Set additional attributes useful in token rules
+                tok.lexer = self
                 self.lexmatch = m
                 self.lexpos = lexpos
                 newtok = func(tok)
                 del tok.lexer
                 del self.lexmatch
 
-                # Every function must return a token, if nothing, we just move to next token
-                if not newtok:
-                    lexpos    = self.lexpos         # This is here in case user has updated lexpos.
-                    lexignore = self.lexignore      # This is here in case there was a state change
-                    break
-                return newtok
+                if newtok:
+                    add_token(newtok, lexpos)
+                lexpos    = self.lexpos         # This is here in case user has updated lexpos.
+                lexignore = self.lexignore      # This is here in case there was a state change
+                break
             else:
                 # No match, see if in literals
-                if lexdata[lexpos] in self.lexliterals:
-                    tok = LexToken()
-                    tok.value = lexdata[lexpos]
-                    tok.lineno = self.lineno
-                    tok.type = tok.value
-                    tok.lexpos = lexpos
-                    self.lexpos = lexpos + 1
-                    return tok
+                if c in self.lexliterals:
+                    types.append(typecodes[c])
+                    positions.append(lexpos)
+                    ends.append(lexpos + 1)
+                    linenos.append(self.lineno)
+                    lexpos += 1
+                    continue
 
                 # No match. Call t_error() if defined.
                 if self.lexerrorf:
-                    tok = LexToken()
-                    tok.value = self.lexdata[lexpos:]
-                    tok.lineno = self.lineno
+                    tok = tokclass()
+                    tok.value = lexdata[lexpos:]
+                    if lexlines is None:
+                        tok.lineno = self.lineno
+                    else:
+                        tok.lexlines = lexlines
                     tok.type = 'error'
                     tok.lexer = self
                     tok.lexpos = lexpos
@@ -279,39 +877,526 @@ class Lexer:
                         raise LexError(f"Scanning error. Illegal character {lexdata[lexpos]!r}",
                                        lexdata[lexpos:])
                     lexpos = self.lexpos
-                    if not newtok:
-                        continue
-                    return newtok
+                    if newtok:
+                        add_token(newtok, lexpos)
+                    continue
 
                 self.lexpos = lexpos
                 raise LexError(f"Illegal character {lexdata[lexpos]!r} at index {lexpos}",
                                lexdata[lexpos:])
 
+        self.lexpos = lexpos
         if self.lexeoff:
-            tok = LexToken()
+            tok = tokclass()
             tok.type = 'eof'
             tok.value = ''
-            tok.lineno = self.lineno
+            if lexlines is None:
+                tok.lineno = self.lineno
+            else:
+                tok.lexlines = lexlines
             tok.lexpos = lexpos
             tok.lexer = self
-            self.lexpos = lexpos
             newtok = self.lexeoff(tok)
-            return newtok
+            if newtok:
+                add_token(newtok, newtok.lexpos)
 
-        self.lexpos = lexpos + 1
+        # With a line index, look up the line numbers all at once
+        if lexlines is not None:
+            result.lineno = array('i', [bisect_left(lexlines, p) + 1 for p in positions])
+        return result
+
+    # ------------------------------------------------------------
+    # relex() - Re-lex the input after an edit
+    #
+    # tokens is the list (or TokenList) of all tokens previously
+    # produced from the current input.  The edit replaces deleted
+    # characters at offset with the string inserted.  Lexing restarts
+    # at a token boundary just before the edit and stops as soon as a
+    # new token lines up with an old token past the edit.  Returns a
+    # TokenList holding the old tokens before the restart point, the
+    # new tokens, and the old tokens after the point where the lexer
+    # got back in sync, with their lexpos and lineno shifted.  The
+    # old tokens themselves are not changed: the TokenList copies a
+    # shifted token when it is read.  Apart from building the edited
+    # string (and its line index), the work done is proportional to
+    # the number of tokens lexed again.  The lexer is left holding the
+    # edited input.
+    #
+    # This assumes that lexpos and lineno are the only lexer state that
+    # carries from one token to the next.  Lexers with states other
+    # than INITIAL may carry more (the state stack, or anything a rule
+    # stores on the lexer), so for them the whole input is lexed again
+    # from line 1 in the INITIAL state, and nothing is reused.  This
+    # costs as much as lexing the edited input from scratch.
+    # ------------------------------------------------------------
+    def relex(self, tokens, offset, deleted, inserted):
+        if self.lexdata is None or self.lexstream is not None:
+            raise RuntimeError('relex() requires input given with input()')
+        if not isinstance(tokens, TokenList):
+            tokens = TokenList([(tokens, 0, len(tokens), 0, 0, None)])
+
+        olddata = self.lexdata
+        data = olddata[:offset] + inserted + olddata[offset+deleted:]
+        delta = len(inserted) - deleted
+        editend = offset + len(inserted)        # End of the edit in the new input
+        lastlineno = self.lineno
+
+        # Find the tokens that start before the edit.  Back up one more
+        # token, since the edit may change where the one before it ends
+        lo, hi = 0, len(tokens)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tokens[mid].lexpos < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        k = lo - 2
+
+        stateful = self.lexstateinfo is not None and len(self.lexstateinfo) > 1
+        self.input(data)
+        if stateful or k < 0:
+            k = 0
+            self.lineno = 1
+            if stateful:
+                self.lexstatestack = []
+                self.begin('INITIAL')
+        else:
+            self.lexpos = tokens[k].lexpos
+            self.lineno = tokens[k].lineno
+
+        newtokens = []
+        j = k
+        ntokens = len(tokens)
+        while True:
+            tok = self.token()
+            if not tok:
+                return TokenList(tokens.slice_runs(0, k) + [(newtokens, 0, len(newtokens), 0, 0, None)], k)
+            newtokens.append(tok)
+
+            if tok.lexpos < editend or stateful:
+                continue
+
+            # See if an old token starts at the same place in the text
+            oldpos = tok.lexpos - delta
+            while j < ntokens and tokens[j].lexpos < oldpos:
+                j += 1
+            if j == ntokens:
+                continue
+            old = tokens[j]
+            if old.lexpos == oldpos and old.type == tok.type and old.value == tok.value:
+                break
+
+        # Back in sync.  Reuse the rest of the old tokens
+        linedelta = tok.lineno - old.lineno
+        runs = tokens.slice_runs(0, k) + [(newtokens, 0, len(newtokens), 0, 0, None)]
+        runs += tokens.slice_runs(j + 1, ntokens, delta, linedelta, self.lexlines)
+        self.lexpos = self.lexlen
+        self.lineno = lastlineno + linedelta
+        return TokenList(runs, k, ntokens - j - 1)
+
+    # ------------------------------------------------------------
+    # write_module() - Write the lexer out as a Python module
+    #
+    # The module holds the master regular expressions (split up by
+    # first character), the tables mapping regex groups to rules and a
+    # token() method specialized for this lexer.  It defines a class
+    # Lexer (a subclass of PrebuiltLexer) which can be created without
+    # running lex() again.  Rule functions are looked up by name in the
+    # module holding the lexer specification, or in the object passed
+    # to the constructor.
+    # ------------------------------------------------------------
+    def write_module(self, modulename, outputdir=''):
+        if not self.lexstaterules:
+            raise RuntimeError('write_module() requires a lexer built by lex()')
+
+        spec = self.lexmodule
+        reflags = self.lexreflags
+
+        # Map rule names to the (function name, token type) pairs used in the tables
+        ruleinfo = {}
+        for state, lexre in self.lexstatere.items():
+            for (cre, findex), names in zip(lexre, self.lexstaterenames[state]):
+                for f, name in zip(findex, names):
+                    if name:
+                        ruleinfo[name] = (name if f[0] else None, f[1])
+
+        patterns = []
+        patternindex = {}
+
+        # Return the index of the pattern matching the given rules, in order
+        def pattern(rules):
+            if not rules:
+                return -1
+            key = tuple(name for name, text in rules)
+            if key not in patternindex:
+                regex = '|'.join(text for name, text in rules)
+                lexre = re.compile(regex, reflags)
+                findex = [None] * (max(lexre.groupindex.values()) + 1)
+                for name, i in lexre.groupindex.items():
+                    findex[i] = ruleinfo.get(name)
+                patternindex[key] = len(patterns)
+                patterns.append((regex, findex))
+            return patternindex[key]
+
+        statepatterns = {}
+        statedispatch = {}
+        for state, stype in self.lexstateinfo.items():
+            rules = list(self.lexstaterules[state])
+            if state != 'INITIAL' and stype == 'inclusive':
+                names = {name for name, text in rules}
+                rules.extend(rule for rule in self.lexstaterules['INITIAL'] if rule[0] not in names)
+            firsts = [_first_chars(text, reflags) for name, text in rules]
+            full = statepatterns[state] = pattern(rules)
+            dispatch = statedispatch[state] = {}
+            for c in sorted(_ascii_chars):
+                i = pattern([rule for rule, first in zip(rules, firsts) if c in first])
+                if i != full:
+                    dispatch[c] = i
+
+        # Names of the rule functions
+        funcs = [f[0] for lexre in self.lexstatere.values() for cre, findex in lexre for f in findex if f and f[0]]
+        funcs += [f for f in self.lexstateerrorf.values() if f]
+        funcs += [f for f in self.lexstateeoff.values() if f]
+        if isinstance(spec, types.ModuleType):
+            specname = spec.__name__
+        elif spec is None and funcs:
+            specname = funcs[0].__module__
+        else:
+            specname = None
+
+        def funcname(f):
+            if spec is not None:
+                for name in dir(spec):
+                    if getattr(spec, name, None) == f:
+                        return name
+            return f.__name__
+
+        errorf = { state: funcname(f) for state, f in self.lexstateerrorf.items() if f }
+        eoff = { state: funcname(f) for state, f in self.lexstateeoff.items() if f }
+
+        basemodulename = modulename.split('.')[-1]
+        filename = os.path.join(outputdir, basemodulename) + '.py'
+        with open(filename, 'w') as f:
+            f.write(f"""# {basemodulename}.py. This file automatically created by PLY (version {__version__}). Don't edit!
+# Lexer built from {specname or 'an object'}. Use {basemodulename}.Lexer() to create it.
+
+from {__name__} import PrebuiltLexer, LexToken, CompactLexToken, LexError
+
+class Lexer(PrebuiltLexer):
+    _lexmodulename    = {specname!r}
+    _lextokens        = {sorted(self.lextokens)!r}
+    _lexliterals      = {self.lexliterals!r}
+    _lexreflags       = {int(reflags)!r}
+    _lexstateinfo     = {self.lexstateinfo!r}
+    _lexstateignore   = {self.lexstateignore!r}
+    _lexstateerrorf   = {errorf!r}
+    _lexstateeoff     = {eoff!r}
+    _lextokenclass    = {self.lextokenclass.__name__}
+    _lexlineindex     = {self.lexlineindex!r}
+
+    # Master regular expressions and their group to rule tables
+    _lexpatterns = [
+""")
+            for regex, findex in patterns:
+                f.write(f'        ({regex!r}, {findex!r}),\n')
+            f.write(f"""    ]
+    _lexregexes = [None] * {len(patterns)}
+
+    # Pattern to use in each state, by first character
+    _lexstatepatterns = {statepatterns!r}
+    _lexstatedispatch = {statedispatch!r}
+
+""")
+            f.write(textwrap.indent(_token_source(self), '    '))
+
+# -----------------------------------------------------------------------------
+#                        === Lexer Profiling ===
+#
+# A lexer created with lex(profile=True) is a ProfileLexer.  Its token()
+# method is generated from the same source as Lexer.token() (see
+# _token_source()) and also records statistics in a LexProfile object (the
+# lexprofile attribute):
+#
+#    rules         -  Dictionary mapping rule names to LexRuleStats objects
+#                     (matches, characters consumed, time in function rules)
+#    literals      -  Dictionary mapping literal characters to counts
+#    errors        -  Number of calls to t_error()
+#    errorchars    -  Characters skipped by t_error()
+#    errortime     -  Time spent in t_error()
+#    ignored       -  Characters skipped because they are in t_ignore
+#
+# Assign a new LexProfile() to lexprofile to start over.
+# -----------------------------------------------------------------------------
+
+class LexRuleStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.matches = 0
+        self.chars = 0
+        self.time = 0.0
+
+    def __repr__(self):
+        return f'LexRuleStats({self.name},{self.matches},{self.chars},{self.time:.6f})'
+
+class LexProfile(object):
+    def __init__(self):
+        self.rules = {}
+        self.literals = {}
+        self.errors = 0
+        self.errorchars = 0
+        self.errortime = 0.0
+        self.ignored = 0
+
+    # Return the statistics for a rule, creating them if needed
+    def rule(self, name):
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = LexRuleStats(name)
+        return stats
+
+    # Return the report as a dictionary of plain values
+    def as_dict(self):
+        return {
+            'rules': { name: { 'matches': r.matches, 'chars': r.chars, 'time': r.time }
+                       for name, r in self.rules.items() },
+            'literals': dict(self.literals),
+            'errors': self.errors,
+            'errorchars': self.errorchars,
+            'errortime': self.errortime,
+            'ignored': self.ignored,
+        }
+
+    # Return the report as text.  Rules are sorted by the given key
+    # ('matches', 'chars' or 'time'), largest first
+    def format(self, sort='matches'):
+        lines = ['%-24s %10s %12s %12s' % ('rule', 'matches', 'chars', 'time')]
+        for r in sorted(self.rules.values(), key=lambda r: getattr(r, sort), reverse=True):
+            lines.append('%-24s %10d %12d %12.6f' % (r.name, r.matches, r.chars, r.time))
+        for c, n in sorted(self.literals.items(), key=lambda item: item[1], reverse=True):
+            lines.append('%-24s %10d %12d' % ('literal %r' % c, n, n))
+        lines.append('%-24s %10d %12d %12.6f' % ('t_error', self.errors, self.errorchars, self.errortime))
+        lines.append('%-24s %10s %12d' % ('ignored', '', self.ignored))
+        return '\n'.join(lines)
+
+    __str__ = format
+
+class ProfileLexer(Lexer):
+    def __init__(self):
+        Lexer.__init__(self)
+        self.lexprofile = LexProfile()
+
+    token = _make_token(_token_source(profile=True), 'ProfileLexer.token')
+
+    # Tokens are collected through token() so that they are counted as well
+    def tokenize_all(self):
         if self.lexdata is None:
             raise RuntimeError('No input string given with input()')
-        return None
+        if self.lexstream is not None:
+            raise RuntimeError('tokenize_all() requires input given with input()')
+
+        typenames = sorted(self.lextokens_all)
+        result = TokenArrays(self.lexdata, typenames)
+        typecodes = { name: code for code, name in enumerate(typenames) }
+        for tok in self:
+            code = typecodes.get(tok.type)
+            if code is None:
+                code = typecodes[tok.type] = len(typenames)
+                typenames.append(tok.type)
+            result.values[len(result.types)] = tok.value
+            result.types.append(code)
+            result.lexpos.append(tok.lexpos)
+            result.endpos.append(self.lexpos)
+            result.lineno.append(tok.lineno)
+        return result
 
-    # Iterator interface
-    def __iter__(self):
-        return self
+# -----------------------------------------------------------------------------
+# PrebuiltLexer
+#
+# Base class of the lexers written by Lexer.write_module().  The subclass
+# provides the tables as class attributes and a specialized token() method.
+# Regular expressions are compiled the first time they are needed, so
+# creating a lexer this way is cheap.  The base Lexer methods that need the
+# full master regexes (tokenize_all() and input_stream()) compile them first.
+# -----------------------------------------------------------------------------
 
-    def __next__(self):
-        t = self.token()
-        if t is None:
-            raise StopIteration
-        return t
+class PrebuiltLexer(Lexer):
+    def __init__(self, object=None):
+        Lexer.__init__(self)
+        self.lextokens = set(self._lextokens)
+        self.lexliterals = self._lexliterals
+        self.lextokens_all = self.lextokens | set(self.lexliterals)
+        self.lexreflags = self._lexreflags
+        self.lexstateinfo = self._lexstateinfo
+        self.lexstateignore = self._lexstateignore
+        self.lextokenclass = self._lextokenclass
+        self.lexlineindex = self._lexlineindex
+        if object is None and self._lexmodulename:
+            object = importlib.import_module(self._lexmodulename)
+        self._bind(object)
+        self.begin('INITIAL')
+
+    # Look up the rule functions in object
+    def _bind(self, object):
+        self.lexmodule = object
+        self.lexstateerrorf = { state: getattr(object, name) for state, name in self._lexstateerrorf.items() }
+        self.lexstateeoff = { state: getattr(object, name) for state, name in self._lexstateeoff.items() }
+        self.lexstatere = {}
+        self._lexentries = [None] * len(self._lexpatterns)
+        self._lexstatecache = { state: {} for state in self._lexstateinfo }
+
+    # Return the (re, findex) pair for pattern i
+    def _entry(self, i):
+        if i < 0:
+            return None, None
+        entry = self._lexentries[i]
+        if entry is None:
+            regex, findex = self._lexpatterns[i]
+            lexre = self._lexregexes[i]
+            if lexre is None:
+                lexre = self._lexregexes[i] = re.compile(regex, self._lexreflags)
+            findex = [f and ((getattr(self.lexmodule, f[0]) if f[0] else None), f[1]) for f in findex]
+            entry = self._lexentries[i] = (lexre, findex)
+        return entry
+
+    # Return the (re, findex) pair to use at character c in the current state
+    def _load(self, c):
+        state = self.lexstate
+        entry = self._entry(self._lexstatedispatch[state].get(c, self._lexstatepatterns[state]))
+        self._lexdispatch[c] = entry
+        return entry
+
+    # Compile the full master regexes used by the base Lexer methods
+    def _load_all(self):
+        if not self.lexstatere:
+            for state, i in self._lexstatepatterns.items():
+                self.lexstatere[state] = [self._entry(i)] if i >= 0 else []
+            self.lexre = self.lexstatere[self.lexstate]
+
+    def begin(self, state):
+        if state not in self._lexstateinfo:
+            raise ValueError(f'Undefined state {state!r}')
+        self._lexdispatch = self._lexstatecache[state]
+        if self.lexstatere:
+            self.lexre = self.lexstatere[state]
+        self.lexignore = self.lexstateignore.get(state, '')
+        self.lexerrorf = self.lexstateerrorf.get(state, None)
+        self.lexeoff = self.lexstateeoff.get(state, None)
+        self.lexstate = state
+
+    def clone(self, object=None):
+        c = copy.copy(self)
+        if object:
+            c._bind(object)
+            c.begin(c.lexstate)
+        return c
+
+    # The tables are class attributes, so only the module is stored
+    def __reduce__(self):
+        state = { key: value for key, value in self.__dict__.items()
+                  if key not in _prebuilt_bound }
+        return (_load_prebuilt_lexer, (type(self), state, _callable_ref(self.lexmodule)))
+
+    def input_stream(self, f, chunksize=1 << 16, encoding='utf-8', errors='strict'):
+        self._load_all()
+        Lexer.input_stream(self, f, chunksize, encoding, errors)
+
+    def tokenize_all(self):
+        self._load_all()
+        return Lexer.tokenize_all(self)
+
+# -----------------------------------------------------------------------------
+#                        === Pickle Support ===
+#
+# Rule functions (and the grammar rule functions of yacc.py, which uses the
+# same helpers) are pickled by reference.  A function is stored as its module
+# name and qualified name, a bound method as the object and the method name,
+# and a module as its name.  Anything else (a function that can't be found
+# again by its qualified name, for example) is left to pickle itself.
+# -----------------------------------------------------------------------------
+
+def _callable_ref(func):
+    if func is None:
+        return None
+    if isinstance(func, types.ModuleType):
+        return (func.__name__, '')
+    if isinstance(func, types.MethodType):
+        return (func.__self__, func.__name__)
+    module = sys.modules.get(getattr(func, '__module__', None))
+    qualname = getattr(func, '__qualname__', '<locals>')
+    if module is not None and '<locals>' not in qualname:
+        obj = module
+        for name in qualname.split('.'):
+            obj = getattr(obj, name, None)
+        if obj is func:
+            return (module.__name__, qualname)
+    return (None, func)
+
+def _resolve_callable(ref):
+    if ref is None:
+        return None
+    owner, name = ref
+    if owner is None:
+        return name
+    if isinstance(owner, str):
+        owner = importlib.import_module(owner)
+    for attr in filter(None, name.split('.')):
+        owner = getattr(owner, attr)
+    return owner
+
+# Return a copy of the attributes of a lexer with every rule function f replaced
+# by conv(f).  Lists and dictionaries shared by several tables stay shared.
+def _map_lexer_functions(state, conv):
+    state = dict(state)
+    memo = {}
+
+    def rules(ritem):
+        key = id(ritem)
+        if key not in memo:
+            memo[key] = [(cre, findex_map(findex)) for cre, findex in ritem]
+        return memo[key]
+
+    def findex_map(findex):
+        key = id(findex)
+        if key not in memo:
+            memo[key] = [f and (conv(f[0]), f[1]) for f in findex]
+        return memo[key]
+
+    def dispatch(d):
+        key = id(d)
+        if key not in memo:
+            memo[key] = { c: rules(ritem) for c, ritem in d.items() }
+        return memo[key]
+
+    if state.get('lexre') is not None:
+        state['lexre'] = rules(state['lexre'])
+    state['lexstatere'] = { s: rules(ritem) for s, ritem in state['lexstatere'].items() }
+    state['lexdispatch'] = dispatch(state['lexdispatch'])
+    state['lexstatedispatch'] = { s: dispatch(d) for s, d in state['lexstatedispatch'].items() }
+    state['lexstateerrorf'] = { s: conv(f) for s, f in state['lexstateerrorf'].items() }
+    state['lexstateeoff'] = { s: conv(f) for s, f in state['lexstateeoff'].items() }
+    state['lexerrorf'] = conv(state['lexerrorf'])
+    state['lexeoff'] = conv(state['lexeoff'])
+    state['lexmodule'] = conv(state['lexmodule'])
+    return state
+
+# Rebuild a lexer pickled by Lexer.__reduce__()
+def _load_lexer(cls, state):
+    lexobj = cls.__new__(cls)
+    lexobj.__dict__.update(_map_lexer_functions(state, _resolve_callable))
+    return lexobj
+
+# Attributes of a PrebuiltLexer that are set up by _bind() and begin()
+_prebuilt_bound = frozenset(['lexmodule', 'lexstateerrorf', 'lexstateeoff', 'lexstatere', 'lexre',
+                             'lexerrorf', 'lexeoff', '_lexentries', '_lexstatecache', '_lexdispatch'])
+
+# Rebuild a lexer pickled by PrebuiltLexer.__reduce__()
+def _load_prebuilt_lexer(cls, state, module):
+    lexobj = cls.__new__(cls)
+    lexobj.__dict__.update(state)
+    lexobj.lexre = None
+    lexobj._bind(_resolve_callable(module))
+    lexobj.begin(lexobj.lexstate)
+    return lexobj
 
 # -----------------------------------------------------------------------------
 #                           ==== Lex Builder ===
@@ -377,6 +1462,124 @@ def _form_master_re(relist, reflags, ldict, toknames):
         rlist, rre, rnames = _form_master_re(relist[m:], reflags, ldict, toknames)
         return (llist+rlist), (lre+rre), (lnames+rnames)
 
+# -----------------------------------------------------------------------------
+# _first_chars()
+#
+# Returns the set of ASCII characters that a match of the regular expression
+# s can start with.  The set is computed from the parsed form of the regex and
+# errs on the side of including too many characters.  If anything about the
+# regex isn't understood, the set of all ASCII characters is returned.
+# -----------------------------------------------------------------------------
+
+_ascii_chars = frozenset(chr(c) for c in range(128))
+
+_category_escapes = {
+    sre_constants.CATEGORY_DIGIT     : r'\d',
+    sre_constants.CATEGORY_NOT_DIGIT : r'\D',
+    sre_constants.CATEGORY_SPACE     : r'\s',
+    sre_constants.CATEGORY_NOT_SPACE : r'\S',
+    sre_constants.CATEGORY_WORD      : r'\w',
+    sre_constants.CATEGORY_NOT_WORD  : r'\W',
+}
+
+_repeat_ops = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+               getattr(sre_constants, 'POSSESSIVE_REPEAT', None))
+
+class _UnknownRegex(Exception):
+    pass
+
+def _first_chars(s, reflags):
+    try:
+        parsed = sre_parse.parse(s, reflags)
+        state = getattr(parsed, 'state', None) or parsed.pattern
+        if state.flags & (re.IGNORECASE | re.LOCALE):
+            return _ascii_chars
+        first, nullable = _first_of_sequence(parsed, reflags)
+    except Exception:
+        return _ascii_chars
+    return _ascii_chars if nullable else frozenset(first)
+
+# Returns (first, nullable) for a sequence of regex items
+def _first_of_sequence(items, reflags):
+    first = set()
+    for op, av in items:
+        f, nullable = _first_of_item(op, av, reflags)
+        first |= f
+        if not nullable:
+            return first, False
+    return first, True
+
+def _first_of_item(op, av, reflags):
+    if op == sre_constants.LITERAL:
+        return ({chr(av)} if av < 128 else set()), False
+    elif op in (sre_constants.NOT_LITERAL, sre_constants.ANY):
+        return set(_ascii_chars), False
+    elif op == sre_constants.IN:
+        return _first_of_class(av, reflags), False
+    elif op == sre_constants.BRANCH:
+        first = set()
+        nullable = False
+        for items in av[1]:
+            f, n = _first_of_sequence(items, reflags)
+            first |= f
+            nullable = nullable or n
+        return first, nullable
+    elif op == sre_constants.SUBPATTERN:
+        group, add_flags, del_flags, items = av
+        if add_flags or del_flags:
+            raise _UnknownRegex()
+        return _first_of_sequence(items, reflags)
+    elif op in _repeat_ops:
+        lo, hi, items = av
+        first, nullable = _first_of_sequence(items, reflags)
+        return first, nullable or lo == 0
+    elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+        return _first_of_sequence(av, reflags)
+    elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        # Zero width assertions only restrict where a match can start
+        return set(), True
+    raise _UnknownRegex()
+
+def _first_of_class(items, reflags):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            if av < 128:
+                chars.add(chr(av))
+        elif op == sre_constants.RANGE:
+            chars.update(chr(c) for c in range(av[0], min(av[1], 127) + 1))
+        elif op == sre_constants.CATEGORY and av in _category_escapes:
+            cre = re.compile(_category_escapes[av], reflags & re.ASCII)
+            chars.update(c for c in _ascii_chars if cre.match(c))
+        else:
+            raise _UnknownRegex()
+    return set(_ascii_chars - chars) if negate else chars
+
+# -----------------------------------------------------------------------------
+# _form_dispatch()
+#
+# Builds the first character dispatch table for a list of regex components.
+# The table maps each ASCII character to a list of (re, findex) tuples like
+# the one returned by _form_master_re(), but only holding the rules that can
+# match text starting with that character.  Rules keep their original order,
+# so the rule that matches is the same one the full master regex would pick.
+# Characters with no rules map to an empty list.  Characters not in the table
+# must use the full master regex lexre.
+# -----------------------------------------------------------------------------
+def _form_dispatch(relist, lexre, reflags, ldict, toknames):
+    firsts = [_first_chars(r, reflags) for r in relist]
+    formed = { tuple(range(len(relist))): list(lexre) }
+    dispatch = {}
+    for c in sorted(_ascii_chars):
+        key = tuple(i for i, first in enumerate(firsts) if c in first)
+        if key not in formed:
+            formed[key] = _form_master_re([relist[i] for i in key], reflags, ldict, toknames)[0]
+        dispatch[c] = formed[key]
+    return dispatch, len(formed)
+
 # -----------------------------------------------------------------------------
 # def _statetoken(s,names)
 #
@@ -434,6 +1637,22 @@ class LexerReflect(object):
         self.validate_rules()
         return self.error
 
+    # Compute a signature over everything validate_all() looks at
+    def signature(self):
+        parts = [self.tokens, self.literals, sorted(self.stateinfo.items()), self.reflags]
+        for state in sorted(self.stateinfo):
+            for fname, f in self.funcsym.get(state, ()):
+                code = f.__code__
+                parts.append((state, fname, _get_regex(f), code.co_argcount, code.co_filename, code.co_firstlineno))
+            parts.append((state, self.strsym.get(state)))
+            for funcs in (self.errorf, self.eoff):
+                f = funcs.get(state)
+                if f:
+                    code = f.__code__
+                    parts.append((state, f.__name__, code.co_argcount, code.co_filename, code.co_firstlineno))
+            parts.append((state, self.ignore.get(state)))
+        return repr(parts)
+
     # Get the tokens map
     def get_tokens(self):
         tokens = self.ldict.get('tokens', None)
@@ -709,19 +1928,26 @@ class LexerReflect(object):
                     self.error = True
             linen += 1
 
+# Signatures (LexerReflect.signature()) of the specifications that passed validation
+_validated = set()
+
 # -----------------------------------------------------------------------------
 # lex(module)
 #
-# Build all of the regular expression rules from definitions in the supplied module
+# Build all of the regular expression rules from definitions in the supplied module.
+# With optimize, a specification that already passed validation in this process
+# is not validated again, which saves compiling every rule on its own and
+# rescanning the source files for duplicate rules.
 # -----------------------------------------------------------------------------
-def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+def lex(*, module=None, object=None, debug=False,
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None, compact=False,
+        lineindex=False, profile=False, optimize=False):
 
     global lexer
 
     ldict = None
     stateinfo  = {'INITIAL': 'inclusive'}
-    lexobj = Lexer()
+    lexobj = ProfileLexer() if profile else Lexer()
     global token, input
 
     if errorlog is None:
@@ -748,8 +1974,12 @@ def lex(*, module=None, object=None, debug=False,
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
-    if linfo.validate_all():
-        raise SyntaxError("Can't build lexer")
+    signature = linfo.signature() if optimize and not linfo.error else None
+    if signature not in _validated:
+        if linfo.validate_all():
+            raise SyntaxError("Can't build lexer")
+        if signature is not None:
+            _validated.add(signature)
 
     # Dump some basic debugging information
     if debug:
@@ -778,19 +2008,24 @@ def lex(*, module=None, object=None, debug=False,
     for state in stateinfo:
         regex_list = []
 
+        rules = []
+
         # Add rules defined by functions first
         for fname, f in linfo.funcsym[state]:
             regex_list.append('(?P<%s>%s)' % (fname, _get_regex(f)))
+            rules.append((fname, regex_list[-1]))
             if debug:
                 debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", fname, _get_regex(f), state)
 
         # Now add all of the simple rules
         for name, r in linfo.strsym[state]:
             regex_list.append('(?P<%s>%s)' % (name, r))
+            rules.append((name, regex_list[-1]))
             if debug:
                 debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", name, r, state)
 
         regexs[state] = regex_list
+        lexobj.lexstaterules[state] = rules
 
     # Build the master regular expressions
 
@@ -802,19 +2037,30 @@ def lex(*, module=None, object=None, debug=False,
         lexobj.lexstatere[state] = lexre
         lexobj.lexstateretext[state] = re_text
         lexobj.lexstaterenames[state] = re_names
+        dispatch, nformed = _form_dispatch(regexs[state], lexre, reflags, ldict, linfo.toknames)
+        lexobj.lexstatedispatch[state] = dispatch
         if debug:
             for i, text in enumerate(re_text):
                 debuglog.info("lex: state '%s' : regex[%d] = '%s'", state, i, text)
+            debuglog.info("lex: state '%s' : %d first character dispatch regexs", state, nformed)
 
     # For inclusive states, we need to add the regular expressions from the INITIAL state
     for state, stype in stateinfo.items():
         if state != 'INITIAL' and stype == 'inclusive':
+            dispatch = lexobj.lexstatedispatch[state]
+            for c, ritem in lexobj.lexstatedispatch['INITIAL'].items():
+                dispatch[c] = dispatch[c] + ritem
             lexobj.lexstatere[state].extend(lexobj.lexstatere['INITIAL'])
             lexobj.lexstateretext[state].extend(lexobj.lexstateretext['INITIAL'])
             lexobj.lexstaterenames[state].extend(lexobj.lexstaterenames['INITIAL'])
 
     lexobj.lexstateinfo = stateinfo
+    if compact:
+        lexobj.lextokenclass = CompactLexToken
+    lexobj.lexlineindex = lineindex
+    lexobj.lexmodule = module
     lexobj.lexre = lexobj.lexstatere['INITIAL']
+    lexobj.lexdispatch = lexobj.lexstatedispatch['INITIAL']
     lexobj.lexretext = lexobj.lexstateretext['INITIAL']
     lexobj.lexreflags = reflags
 
@@ -859,6 +2105,13 @@ def lex(*, module=None, object=None, debug=False,
 # -----------------------------------------------------------------------------
 
 def runmain(lexer=None, data=None):
+    if not data and lexer and len(sys.argv) > 1:
+        # Stream the file rather than reading all of it into memory
+        with open(sys.argv[1]) as f:
+            lexer.input_stream(f)
+            _runtokens(lexer.token)
+        return
+
     if not data:
         try:
             filename = sys.argv[1]
@@ -877,7 +2130,9 @@ def runmain(lexer=None, data=None):
         _token = lexer.token
     else:
         _token = token
+    _runtokens(_token)
 
+def _runtokens(_token):
     while True:
         tok = _token()
         if not tok:
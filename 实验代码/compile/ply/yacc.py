@@ -63,8 +63,24 @@
 
 import re
 import types
+import contextvars
+import dis
+import functools
+import operator
 import sys
+import os
+import time
 import inspect
+import linecache
+import fnmatch
+import pickle
+from array import array
+from itertools import compress, repeat
+
+from . import __version__
+from .lex import _callable_ref, _resolve_callable
+
+__tabversion__ = '4'
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -81,6 +97,9 @@ resultlimit = 40               # Size limit of results when running in debug mod
 
 MAXINT = sys.maxsize
 
+# Maps the digits of bin() to 0/1 selectors for itertools.compress()
+_bitselect = bytes.maketrans(b'01', b'\x00\x01')
+
 # This object is a stand-in for a logging object created by the
 # logging module.   PLY will use this by default to create things
 # such as the parser.out file.  If a user wants more detailed
@@ -116,6 +135,10 @@ class NullLogger(object):
 class YaccError(Exception):
     pass
 
+# Exception raised when a table cache was written by a different version
+class VersionError(YaccError):
+    pass
+
 # Format the result message that the parser produces when running in debug mode.
 def format_result(r):
     repr_str = repr(r)
@@ -218,6 +241,862 @@ class YaccProduction:
     def error(self):
         raise SyntaxError
 
+# -----------------------------------------------------------------------------
+# positional()
+#
+# Decorator that selects the positional calling convention for a grammar rule
+# function.  Instead of a YaccProduction, the function receives the values of
+# the right hand side symbols as positional arguments and returns the value of
+# the left hand side.  For example:
+#
+#     @positional
+#     def p_expr_plus(left, op, right):
+#         'expr : expr PLUS expr'
+#         return left + right
+#
+# Rules with alternatives of different lengths can take *args.  Raising
+# SyntaxError enters error recovery, just like p.error() does.
+# -----------------------------------------------------------------------------
+
+def positional(func):
+    func.positional = True
+    return func
+
+# Fetches the values passed to a positional rule
+_getvalue = operator.attrgetter('value')
+
+# -----------------------------------------------------------------------------
+# is_passthrough()
+#
+# Returns True if func is a grammar rule function whose only effect is to pass
+# the value of the first symbol through, that is p[0] = p[1] (or return value
+# for a positional rule).  This is decided by comparing the bytecode with the
+# reference functions below, with argument names normalized, so docstrings and
+# argument names don't matter.  The parsing engines reduce unit rules with such
+# an action without calling them.
+# -----------------------------------------------------------------------------
+
+def _passthrough_rule(p):
+    p[0] = p[1]
+
+def _passthrough_positional(value):
+    return value
+
+def _rule_code(func):
+    if isinstance(func, types.MethodType):
+        func, skip = func.__func__, 1
+    else:
+        skip = 0
+    code = getattr(func, '__code__', None)
+    if code is None or code.co_argcount - skip != 1 or code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS):
+        return None
+    arg = code.co_varnames[skip]
+    return [(i.opname, 'ARG' if i.argval == arg and 'FAST' in i.opname else i.argval)
+            for i in dis.get_instructions(code)]
+
+def is_passthrough(func):
+    code = _rule_code(func)
+    if code is None:
+        return False
+    if getattr(func, 'positional', False):
+        return code == _passthrough_codes[1]
+    return code == _passthrough_codes[0]
+
+_passthrough_codes = (_rule_code(_passthrough_rule), _rule_code(_passthrough_positional))
+
+# -----------------------------------------------------------------------------
+#                             == LRDenseTable ==
+#
+# Compiled form of the action and goto tables used by the parsing engine.
+# Terminals and nonterminals are mapped to small integers once and the tables
+# are stored in flat arrays with one fixed-width row per state.  Lookups in the
+# parsing engine are then plain array indexing:
+#
+#       action[state*nterms + termindex[tok.type]]
+#       goto[state*nnonterms + prodnt[prodnumber]]
+#
+# Action entries use the same encoding as LRTable.lr_action (t > 0 is a shift
+# and t < 0 is a reduce) except that 0 marks an error and the accept action is
+# stored as ACCEPT.  The last column of every action row is reserved for token
+# types that are not terminals of the grammar, so looking up an unknown token
+# type with termindex.get(type, nterms - 1) always yields an error.
+# -----------------------------------------------------------------------------
+
+ACCEPT = -0x7fffffff
+
+class LRDenseTable:
+    def __init__(self, action, goto, productions, default=None):
+        # Number the terminals and nonterminals
+        terminals = set()
+        for st_action in action.values():
+            terminals.update(st_action)
+        nonterminals = set()
+        for st_goto in goto.values():
+            nonterminals.update(st_goto)
+        for p in productions[1:]:
+            nonterminals.add(p.name)
+
+        self.termnames = sorted(terminals)
+        self.termindex = {name: i for i, name in enumerate(self.termnames)}
+        self.ntnames = sorted(nonterminals)
+        self.ntindex = {name: i for i, name in enumerate(self.ntnames)}
+
+        self.nstates = nstates = max(action) + 1 if action else 0
+        self.nterms = nterms = len(self.termnames) + 1
+        self.nnonterms = nnonterms = len(self.ntnames)
+
+        # Fill in the action rows.  The row of a state with a default reduction
+        # holds the default for every token without an entry of its own, except
+        # for the error token and for unknown tokens.  Error recovery must not
+        # reduce on the error token where the grammar doesn't, or it can undo its
+        # own pops through empty rules forever.
+        self.action = dense_action = array('i', bytes(4 * nstates * nterms))
+        termindex = self.termindex
+        errindex = termindex.get('error', nterms - 1)
+        default = default or {}
+        for state, st_action in action.items():
+            base = state * nterms
+            if state in default:
+                dense_action[base:base + nterms - 1] = array('i', [default[state]]) * (nterms - 1)
+                dense_action[base + errindex] = 0
+            for name, t in st_action.items():
+                if t is None:
+                    dense_action[base + termindex[name]] = 0
+                    continue
+                dense_action[base + termindex[name]] = ACCEPT if t == 0 else t
+
+        # Fill in the goto rows.  Missing entries are -1.  Goto entries are state
+        # numbers, so half width entries are enough for all but huge grammars
+        typecode = 'h' if nstates < 0x8000 else 'i'
+        self.goto = dense_goto = array(typecode, [-1]) * (nstates * nnonterms)
+        ntindex = self.ntindex
+        for state, st_goto in goto.items():
+            base = state * nnonterms
+            for name, j in st_goto.items():
+                dense_goto[base + ntindex[name]] = j
+
+        # Nonterminal index of the left hand side of each production
+        self.prodnt = array('i', [ntindex.get(p.name, -1) for p in productions])
+
+        # Reduce action of every state whose only action is a single reduction
+        # (0 for every other state).  See LRParser.set_defaulted_states().  The
+        # states that only reduce because of their default reduction must not
+        # reduce on the error token, so errdefaulted, used while the lookahead is
+        # the error token, leaves them out.  Without default reductions, both
+        # arrays are the same
+        self.defaulted = array('i', bytes(4 * nstates))
+        self.errdefaulted = array('i', bytes(4 * nstates))
+        for state, st_action in action.items():
+            rules = list(st_action.values())
+            if state in default:
+                if not rules:
+                    self.defaulted[state] = default[state]
+            elif len(rules) == 1 and rules[0] is not None and rules[0] < 0:
+                self.defaulted[state] = self.errdefaulted[state] = rules[0]
+
+    # Return the action for a state and a token type (None for an error)
+    def get_action(self, state, ltype):
+        t = self.action[state * self.nterms + self.termindex.get(ltype, self.nterms - 1)]
+        if t == 0:
+            return None
+        return 0 if t == ACCEPT else t
+
+    # Return the goto state for a state and a nonterminal (None if undefined)
+    def get_goto(self, state, name):
+        j = self.goto[state * self.nnonterms + self.ntindex[name]]
+        return None if j < 0 else j
+
+# -----------------------------------------------------------------------------
+#                             == ParseContext ==
+#
+# The state of one call to LRParser.parse(): the state and symbol stacks, the
+# token function, the current state and the error recovery flag.  If errors is
+# a list, the token of every syntax error (None for the end of the input) is
+# appended to it, whether or not the grammar defines p_error().  A context is
+# created for every parse and is made the active context of the calling thread
+# or asyncio task (through a context variable) while the parse runs.  Contexts
+# of nested parses are chained through outer.
+#
+# Keeping this state out of the LRParser means one parser instance can be shared
+# by many threads and tasks.  Grammar actions and p_error() keep using
+# parser.errok(), parser.restart(), parser.token() and parser.statestack, which
+# are forwarded to the active context of that parser.  Outside a parse, as when
+# they were attributes of the parser, parser.statestack, parser.symstack and
+# parser.state are left from the last parse that finished (in any thread).
+# -----------------------------------------------------------------------------
+
+_parse_context = contextvars.ContextVar('ply.yacc.parse_context', default=None)
+
+class ParseContext:
+    def __init__(self, parser, outer=None):
+        self.parser = parser
+        self.outer = outer
+        self.statestack = []                # Stack of parsing states
+        self.symstack = []                  # Stack of grammar symbols
+        self.state = 0                      # State in which the current action runs
+        self.token = None                   # Token function of the lexer
+        self.errorok = True
+        self.errors = None                  # List recording the syntax errors (if any)
+
+    def errok(self):
+        self.errorok = True
+
+    def restart(self):
+        del self.statestack[:]
+        del self.symstack[:]
+        sym = YaccSymbol()
+        sym.type = '$end'
+        self.symstack.append(sym)
+        self.statestack.append(0)
+
+# Decorator for the parsing engines.  Runs the engine with a fresh ParseContext as
+# the active context and restores the previous one afterwards.  The errors argument
+# is stored in the context.
+def _with_context(engine):
+    @functools.wraps(engine)
+    def run(self, *args, errors=None, **kwargs):
+        ctx = ParseContext(self, _parse_context.get())
+        ctx.errors = errors
+        reset = _parse_context.set(ctx)
+        try:
+            return engine(self, *args, **kwargs)
+        finally:
+            _parse_context.reset(reset)
+            self._last_context = ctx
+    return run
+
+# Rebuild a parser pickled by LRParser.__reduce__()
+def _load_parser(tabversion, plyversion, action, goto, tables, defaulted, errdefaulted, productions, errorf):
+    if tabversion != __tabversion__ or plyversion != __version__:
+        raise VersionError('pickled parser was written by a different version of PLY')
+
+    parser = LRParser.__new__(LRParser)
+    parser.productions = []
+    for p in productions:
+        mp = MiniProduction(*p[:6])
+        ref, mp.positional, mp.passthrough = p[6:]
+        mp.callable = _resolve_callable(ref)
+        parser.productions.append(mp)
+    parser.action = action
+    parser.goto = goto
+    parser.tables = tables
+    parser.errorfunc = _resolve_callable(errorf)
+    parser.defaulted = defaulted
+    parser.errdefaulted = errdefaulted
+    parser.defaulted_states = {state: t for state, t in enumerate(defaulted) if t}
+    return parser
+
+# -----------------------------------------------------------------------------
+#                           == Parsing Engines ==
+#
+# All of the parsing engines of LRParser share one implementation of the LR
+# parsing loop.  _engine_source() writes the source of an engine and
+# _make_engine() compiles it.  The engines are:
+#
+#    parsedebug()        -  debug=True: every step is written to a logging object
+#    parseopt()          -  tracking=True: positions are always tracked
+#    parseopt_notrack()  -  tracking=False: the plain engine
+#    parseprofile()      -  profile=True: the counters of a ParseProfile are updated
+#    parsepush()         -  push=True: a generator that is sent the tokens
+#    parseincr()         -  incremental=True: reads the tokens from a list and
+#                           reuses the symbols of the last parse
+#
+# With tracking=None, positions are tracked if the tracking argument (or, in
+# parseincr(), the tracking attribute of the IncrementalParser) is set.  The
+# code for what an engine doesn't do is left out, so the common case runs a
+# loop without any debugging or tracking checks in it.
+#
+# Note: The generated loop has been carefully written to be as fast as
+# possible.  Don't make changes unless you really know what you are doing
+# -----------------------------------------------------------------------------
+
+def _engine_source(name, debug=False, tracking=None, profile=False, push=False, incremental=False):
+    pull = not (push or incremental)
+    if push:
+        params = 'self, ctx, lexer=None, tracking=False, statement=None, output=None'
+    elif incremental:
+        params = 'self, inc'
+    else:
+        params = ['self', 'input=None', 'lexer=None']
+        if debug:
+            params.append('debug=None')
+        if tracking is None:
+            params.append('tracking=False')
+        if profile:
+            params.append('profile=None')
+        params = ', '.join(params)
+
+    # The lexer of push() and incremental() may be None
+    lexattr = 'lexer.%s' if pull else "getattr(lexer, '%s', 0)"
+
+    lines = [f'def {name}({params}):']
+
+    def emit(indent, *code):
+        for line in code:
+            lines.append(' ' * indent + line if line else '')
+
+    def debugging(indent, *code):
+        if debug:
+            emit(indent, 'if debug:')
+            emit(indent + 4, *code)
+
+    def tracked(indent, *code):
+        if tracking is None:
+            emit(indent, 'if tracking:')
+            emit(indent + 4, *code)
+        elif tracking:
+            emit(indent, *code)
+
+    # Enter error recovery after a grammar rule raised SyntaxError
+    def rule_error(indent, plen):
+        emit(indent, 'except SyntaxError:')
+        if profile:
+            emit(indent, '    action_time[-t] += clock() - started')
+        emit(indent, '    # If an error was set. Enter error recovery state',
+                     '    lookaheadstack.append(lookahead)    # Save the current lookahead token')
+        if plen:
+            emit(indent, '    symstack.extend(targ[1:-1])         # Put the production slice back on the stack')
+        emit(indent, '    statestack.pop()                    # Pop back one state (before the reduce)')
+        if incremental:
+            emit(indent, '    startstack.pop()')
+        emit(indent, '    state = statestack[-1]',
+                     "    sym.type = 'error'",
+                     "    sym.value = 'error'",
+                     '    lookahead = sym',
+                     "    ltindex = termindex.get('error', unknown)",
+                     '    defaulted_states = self.errdefaulted',
+                     '    errorcount = error_count',
+                     '    ctx.errorok = False')
+        if incremental:
+            emit(indent, '    clean = reuse = None')
+        emit(indent, '    continue')
+
+    # Call the grammar rule of production p with the symbols in targ
+    def call_rule(indent, plen):
+        if profile:
+            emit(indent, 'started = clock()')
+        emit(indent, 'if p.positional:')
+        if plen:
+            emit(indent, '    # Spell out the common lengths, star calls are much slower',
+                         '    if plen == 1:',
+                         '        sym.value = p.callable(targ[1].value)',
+                         '    elif plen == 2:',
+                         '        sym.value = p.callable(targ[1].value, targ[2].value)',
+                         '    elif plen == 3:',
+                         '        sym.value = p.callable(targ[1].value, targ[2].value, targ[3].value)',
+                         '    else:',
+                         '        sym.value = p.callable(*map(_getvalue, targ[1:]))')
+        else:
+            emit(indent, '    sym.value = p.callable()')
+        emit(indent, 'else:',
+                     '    p.callable(pslice)')
+        if profile:
+            emit(indent, 'action_time[-t] += clock() - started')
+
+    # Push the reduced symbol and go to the next state
+    def push_symbol(indent, start):
+        if incremental:
+            emit(indent, 'sym.prestate = statestack[-1]')
+        debugging(indent, "debug.info('Result : %s', format_result(pslice[0]))")
+        emit(indent, 'symstack.append(sym)')
+        if incremental:
+            emit(indent, f'startstack.append({start})')
+        emit(indent, 'state = goto[statestack[-1] * nnonterms + pgoto]',
+                     'statestack.append(state)')
+
+    # Local variables
+    if not push:
+        emit(4, 'ctx = _parse_context.get()               # Per-call parse state')
+    emit(4, 'lookahead = None                         # Current lookahead symbol',
+            'lookaheadstack = []                      # Stack of lookahead symbols',
+            'tables  = self.tables                    # Dense parsing tables',
+            'actions = tables.action                  # Local reference to action table (to avoid lookup on self.)',
+            'goto    = tables.goto                    # Local reference to goto table (to avoid lookup on self.)',
+            'termindex = tables.termindex             # Mapping of token types to action table columns')
+    if incremental:
+        emit(4, 'ntindex = tables.ntindex                 # Mapping of nonterminals to goto table columns')
+    emit(4, 'prodnt  = tables.prodnt                  # Goto table column of each production',
+            'nterms  = tables.nterms                  # Width of an action table row',
+            'nnonterms = tables.nnonterms             # Width of a goto table row',
+            'unknown = nterms - 1                     # Action table column for unknown token types',
+            'prod    = self.productions               # Local reference to production list (to avoid lookup on self.)',
+            'defaulted_states = self.defaulted        # Local reference to defaulted states',
+            'pslice  = YaccProduction(None)           # Production object passed to grammar rules',
+            'errorcount = 0                           # Used during error recovery')
+    if profile:
+        emit(4, 'visits = profile.state_visits',
+                'reductions = profile.reductions',
+                'action_time = profile.action_time',
+                'clock = time.perf_counter')
+    if incremental:
+        emit(4, 'lexer = inc.lexer',
+                'tracking = inc.tracking',
+                'clean = True                             # No syntax error so far',
+                '',
+                '# Tokens are read from the list.  The token function of the context (used by',
+                '# parser.token() in p_error()) reads from the same place',
+                'tokens = inc.tokens',
+                'ntokens = len(tokens)',
+                'cursor = _TokenCursor(tokens)',
+                'ctx.token = cursor.token',
+                'index = 0                                # Index of the next token to read',
+                '',
+                '# Old tree to reuse symbols from.  reuse is a stack of (symbol, index of its',
+                '# first token in the old token list), leftmost symbol on top',
+                'if inc.tree is not None:',
+                '    reuse = [(inc.tree, 0)]',
+                '    prefix = inc.prefix                  # The first prefix tokens are unchanged',
+                '    suffixstart = inc.oldlen - inc.suffix    # Old tokens from here on are unchanged',
+                '    shift = ntokens - inc.oldlen         # Index of an unchanged old token in the new list',
+                '    exclude = inc.exclude',
+                'else:',
+                '    reuse = None',
+                'inc.tree = None',
+                'reused = 0')
+    debugging(4, "debug.info('PLY: PARSE DEBUG START')")
+    if pull:
+        emit(4, '',
+                '# If no lexer was given, we will try to use the lex module',
+                'if not lexer:',
+                '    from . import lex',
+                '    lexer = lex.lexer')
+    emit(4, '',
+            '# Set up the lexer and parser objects on pslice',
+            'pslice.lexer = lexer',
+            'pslice.parser = self')
+    if pull:
+        emit(4, '',
+                '# If input was supplied, pass to lexer',
+                'if input is not None:',
+                '    lexer.input(input)',
+                '',
+                '# Set the token function',
+                'get_token = ctx.token = lexer.token')
+    emit(4, '',
+            '# Set up the state and symbol stacks',
+            'statestack = ctx.statestack         # Stack of parsing states',
+            'symstack = ctx.symstack             # Stack of grammar symbols')
+    if incremental:
+        emit(4, 'startstack = [0]                    # Index of the first token of each symbol')
+    emit(4, 'pslice.stack = symstack             # Put in the production',
+            'errtoken   = None                   # Err token',
+            '',
+            '# The start state is assumed to be (0,$end)',
+            '',
+            'statestack.append(0)',
+            'sym = YaccSymbol()',
+            "sym.type = '$end'",
+            'symstack.append(sym)',
+            'state = 0',
+            'ltindex = unknown                   # Action table column of the lookahead',
+            'while True:',
+            '    # Get the next symbol on the input.  If a lookahead symbol',
+            "    # is already set, we just use that. Otherwise, we'll pull")
+    if push:
+        emit(8, '# the next token off of the lookaheadstack or wait for the',
+                '# caller to send it')
+    elif incremental:
+        emit(8, '# the next token off of the lookaheadstack or the list')
+    else:
+        emit(8, '# the next token off of the lookaheadstack or from the lexer')
+    emit(0, '')
+    debugging(8, "debug.debug('State  : %s', state)")
+    if profile:
+        emit(8, 'visits[state] += 1')
+    if debug or profile:
+        emit(0, '')
+
+    # Read the lookahead and look up the action
+    emit(8, 't = defaulted_states[state]',
+            'if not t:',
+            '    if not lookahead:',
+            '        if not lookaheadstack:')
+    if push:
+        emit(20, 'lookahead = yield           # Get the next token')
+    elif incremental:
+        emit(20, 'lookahead = tokens[index] if index < ntokens else None',
+                 'index += 1')
+    else:
+        emit(20, 'lookahead = get_token()     # Get the next token')
+    emit(8, '        else:',
+            '            lookahead = lookaheadstack.pop()',
+            '        if not lookahead:',
+            '            lookahead = YaccSymbol()',
+            "            lookahead.type = '$end'",
+            '        ltindex = termindex.get(lookahead.type, unknown)',
+            '',
+            '    # Check the action table',
+            '    t = actions[state * nterms + ltindex]')
+    if debug:
+        emit(8, 'else:')
+        debugging(12, "debug.debug('Defaulted state %s: Reduce using %d', state, -t)")
+        emit(0, '')
+        debugging(8, "debug.debug('Stack  : %s',",
+                     "            ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())")
+    emit(0, '')
+
+    # Shift
+    emit(8, 'if t > 0:')
+    if incremental:
+        emit(12, '# Before shifting a token, look for an old symbol to shift instead',
+                 'if reuse:',
+                 '    i = index - 1',
+                 '    if i < prefix:',
+                 '        oi = i',
+                 '    elif i - shift >= suffixstart:',
+                 '        oi = i - shift',
+                 '    else:',
+                 '        oi = -1',
+                 '    node = None',
+                 '    while reuse and oi >= 0:',
+                 '        sym, start = reuse[-1]',
+                 '        if type(sym) is not YaccSymbol:',
+                 '            # A token',
+                 '            if start < oi:',
+                 '                reuse.pop()',
+                 '                continue',
+                 '            break',
+                 '        end = start + sym.ntokens',
+                 '        if end <= oi:',
+                 '            reuse.pop()',
+                 '            continue',
+                 '        if start > oi:',
+                 '            break',
+                 '        if start == oi and sym.prestate == state and sym.type not in exclude and \\',
+                 '               (end < prefix or start >= suffixstart):',
+                 '            node = sym',
+                 '            break',
+                 '        # Break the symbol down into its parts',
+                 '        reuse.pop()',
+                 '        parts = []',
+                 '        for child in sym.children:',
+                 '            parts.append((child, start))',
+                 '            start += child.ntokens if type(child) is YaccSymbol else 1',
+                 '        parts.reverse()',
+                 '        reuse.extend(parts)',
+                 '',
+                 '    if node is not None:',
+                 '        # Shift the old symbol',
+                 '        reuse.pop()',
+                 '        n = node.ntokens',
+                 '        state = goto[state * nnonterms + ntindex[node.type]]',
+                 '        statestack.append(state)',
+                 '        symstack.append(node)',
+                 '        startstack.append(i)')
+        tracked(20, 't1 = tokens[i]',
+                    'node.lineno = t1.lineno',
+                    'node.lexpos = t1.lexpos',
+                    't1 = tokens[i + n - 1]',
+                    "node.endlineno = getattr(t1, 'endlineno', t1.lineno)",
+                    "node.endlexpos = getattr(t1, 'endlexpos', t1.lexpos)")
+        emit(12, '        index = i + n',
+                 '        reused += n',
+                 '        lookahead = None',
+                 '        if errorcount:',
+                 '            errorcount -= 1',
+                 '            defaulted_states = self.defaulted',
+                 '        continue',
+                 '')
+    emit(12, '# shift a symbol on the stack',
+             'statestack.append(t)',
+             'state = t',
+             '')
+    debugging(12, "debug.debug('Action : Shift and goto state %s', t)")
+    if profile:
+        emit(12, 'profile.shifts += 1')
+    if debug or profile:
+        emit(0, '')
+    emit(12, 'symstack.append(lookahead)')
+    if incremental:
+        emit(12, 'startstack.append(index - 1)')
+    emit(12, 'lookahead = None',
+             '',
+             '# Decrease error count on successful shift',
+             'if errorcount:',
+             '    errorcount -= 1',
+             '    defaulted_states = self.defaulted',
+             'continue',
+             '')
+
+    # Reduce
+    emit(8, 'if t < 0 and t != ACCEPT:',
+            '    # reduce a symbol on the stack, emit a production',
+            '    p = prod[-t]',
+            '    pname = p.name',
+            '    plen  = p.len',
+            '    pgoto = prodnt[-t]')
+    if profile:
+        emit(12, 'reductions[-t] += 1')
+    if incremental:
+        emit(12, 'end = index - 1 if lookahead else index')
+    emit(0, '')
+    if debug:
+        debugging(12, 'if plen:',
+                      "    debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str,",
+                      "               '['+','.join([format_stack_entry(_v.value) for _v in symstack[-plen:]])+']',",
+                      '               goto[statestack[-1-plen] * nnonterms + pgoto])',
+                      'else:',
+                      "    debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str, [],",
+                      '               goto[statestack[-1] * nnonterms + pgoto])')
+        emit(0, '')
+    emit(12, 'if p.passthrough:',
+             '    # Unit rule whose action is just p[0] = p[1].  The rule is not',
+             '    # called.  The symbol on top of the stack is replaced by a new',
+             '    # symbol for the left hand side with the same value (and the',
+             '    # same positions), just like the one the rule would return.',
+             '    t1 = symstack[-1]',
+             '    sym = YaccSymbol()',
+             '    sym.type = pname',
+             '    sym.value = t1.value')
+    if incremental:
+        emit(16, 'sym.children = [t1]',
+                 "sym.ntokens = getattr(t1, 'ntokens', 1)     # Tokens and error symbols count as one",
+                 'sym.prestate = statestack[-2]')
+    tracked(16, 'sym.lineno = t1.lineno',
+                'sym.lexpos = t1.lexpos',
+                "sym.endlineno = getattr(t1, 'endlineno', t1.lineno)",
+                "sym.endlexpos = getattr(t1, 'endlexpos', t1.lexpos)")
+    emit(16, 'symstack[-1] = sym')
+    debugging(16, "debug.info('Result : %s', format_result(sym.value))")
+    emit(16, 'state = goto[statestack[-2] * nnonterms + pgoto]',
+             'statestack[-1] = state',
+             '')
+
+    # Production with symbols on the right hand side
+    emit(12, 'elif plen:',
+             '    # Get production function',
+             '    sym = YaccSymbol()',
+             '    sym.type = pname       # Production name',
+             '    sym.value = None',
+             '    targ = symstack[-plen-1:]',
+             '    targ[0] = sym')
+    if incremental:
+        emit(16, 'start = startstack[-plen]',
+                 'sym.children = targ[1:]',
+                 'sym.ntokens = end - start')
+    if tracking is not False:
+        emit(0, '')
+    tracked(16, 't1 = targ[1]',
+                'sym.lineno = t1.lineno',
+                'sym.lexpos = t1.lexpos',
+                't1 = targ[-1]',
+                "sym.endlineno = getattr(t1, 'endlineno', t1.lineno)",
+                "sym.endlexpos = getattr(t1, 'endlexpos', t1.lexpos)")
+    emit(16, '',
+             'pslice.slice = targ',
+             '',
+             'try:',
+             '    # Call the grammar rule with our special slice object',
+             '    del symstack[-plen:]',
+             '    ctx.state = state')
+    call_rule(20, True)
+    emit(20, 'del statestack[-plen:]')
+    if incremental:
+        emit(20, 'del startstack[-plen:]')
+    push_symbol(20, 'start')
+    rule_error(16, True)
+    emit(0, '')
+
+    # Empty production
+    emit(12, 'else:',
+             '    # Get production function',
+             '    sym = YaccSymbol()',
+             '    sym.type = pname       # Production name',
+             '    sym.value = None')
+    if tracking is not False:
+        emit(0, '')
+    tracked(16, 'sym.lineno = %s' % (lexattr % 'lineno'),
+                'sym.lexpos = %s' % (lexattr % 'lexpos'))
+    emit(16, '',
+             'targ = [sym]')
+    if incremental:
+        emit(16, 'sym.children = []',
+                 'sym.ntokens = 0')
+    emit(16, 'pslice.slice = targ',
+             '',
+             'try:',
+             '    # Call the grammar rule with our special slice object',
+             '    ctx.state = state')
+    call_rule(20, False)
+    push_symbol(20, 'end')
+    rule_error(16, False)
+    emit(0, '')
+
+    if push:
+        emit(12, '# A statement is at the top level if there is no token below it',
+                 '# on the stack (a statement nested in another one always follows',
+                 '# some token of the enclosing statement)',
+                 'if pname == statement:',
+                 '    for s in symstack[1:-1]:',
+                 '        if s.type in termindex:',
+                 '            break',
+                 '    else:',
+                 '        output.append(sym.value)',
+                 '')
+    emit(12, 'continue',
+             '')
+
+    # Accept
+    emit(8, 'if t == ACCEPT:',
+            '    n = symstack[-1]',
+            "    result = getattr(n, 'value', None)",
+            '')
+    debugging(12, "debug.info('Done   : Returning %s', format_result(result))",
+                  "debug.info('PLY: PARSE DEBUG END')")
+    if incremental:
+        emit(12, 'if clean:',
+                 '    inc.tree = n',
+                 'inc.reused = reused')
+    if debug or incremental:
+        emit(0, '')
+    emit(12, 'return result',
+             '')
+
+    # Syntax error
+    emit(8, 'if t == 0:',
+            '')
+    debugging(12, "debug.error('Error  : %s',",
+                  "            ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())")
+    if debug:
+        emit(0, '')
+    emit(12, '# We have some kind of parsing error here.  To handle',
+             '# this, we are going to push the current token onto',
+             "# the tokenstack and replace it with an 'error' token.",
+             '# If there are any synchronization rules, they may',
+             '# catch it.',
+             '#',
+             '# In addition to pushing the error token, we call call',
+             '# the user defined p_error() function if this is the',
+             '# first syntax error.  This function is only called if',
+             '# errorcount == 0.')
+    if profile:
+        emit(12, 'profile.state_errors[state] += 1')
+    if incremental:
+        emit(12, '#',
+                 '# Nothing is reused from here on.  The symbols on the stack',
+                 '# at the first error are kept as a partial tree, from which',
+                 '# the next parse can still reuse symbols.',
+                 'if clean:',
+                 '    inc.tree = sym = YaccSymbol()',
+                 "    sym.type = 'error'",
+                 '    sym.children = symstack[1:]',
+                 '    sym.ntokens = index - 1',
+                 '    sym.prestate = -1',
+                 'clean = reuse = None',
+                 'inc.reused = reused')
+    emit(12, 'if errorcount == 0 or ctx.errorok:')
+    emit(16, 'errorcount = error_count',
+             'ctx.errorok = False',
+             'errtoken = lookahead',
+             "if errtoken.type == '$end':",
+             '    errtoken = None               # End of file!',
+             'if ctx.errors is not None:',
+             '    ctx.errors.append(errtoken)',
+             'if self.errorfunc:')
+    if pull:
+        emit(20, "if errtoken and not hasattr(errtoken, 'lexer'):")
+    else:
+        emit(20, "if errtoken and lexer and not hasattr(errtoken, 'lexer'):")
+    emit(20, '    errtoken.lexer = lexer',
+             'ctx.state = state')
+    if incremental:
+        emit(20, 'cursor.index = index')
+    emit(20, 'tok = self.errorfunc(errtoken)')
+    if incremental:
+        emit(20, 'index = cursor.index')
+    emit(20, 'if ctx.errorok:',
+             '    # User must have done some kind of panic',
+             '    # mode recovery on their own.  The',
+             '    # returned token is the next lookahead',
+             '    lookahead = tok',
+             '    if lookahead:',
+             '        ltindex = termindex.get(lookahead.type, unknown)',
+             '    errtoken = None',
+             '    continue')
+    emit(16, 'else:',
+             '    if errtoken:',
+             "        if hasattr(errtoken, 'lineno'):",
+             '            lineno = lookahead.lineno',
+             '        else:',
+             '            lineno = 0',
+             '        if lineno:',
+             "            sys.stderr.write('yacc: Syntax error at line %d, token=%s\\n' % (lineno, errtoken.type))",
+             '        else:',
+             "            sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)",
+             '    else:',
+             "        sys.stderr.write('yacc: Parse error in input. EOF\\n')",
+             '        return',
+             '')
+    emit(12, 'else:',
+             '    errorcount = error_count',
+             '',
+             "# case 1:  the statestack only has 1 entry on it.  If we're in this state, the",
+             "# entire parse has been rolled back and we're completely hosed.   The token is",
+             '# discarded and we just keep going.',
+             '',
+             "if len(statestack) <= 1 and lookahead.type != '$end':",
+             '    lookahead = None',
+             '    errtoken = None',
+             '    state = 0',
+             '    # Nuke the pushback stack',
+             '    del lookaheadstack[:]',
+             '    continue',
+             '',
+             "# case 2: the statestack has a couple of entries on it, but we're",
+             '# at the end of the file. nuke the top entry and generate an error token',
+             '',
+             '# Start nuking entries on the stack',
+             "if lookahead.type == '$end':",
+             "    # Whoa. We're really hosed here. Bail out",
+             '    return',
+             '',
+             "if lookahead.type != 'error':",
+             '    sym = symstack[-1]',
+             "    if sym.type == 'error':",
+             "        # Hmmm. Error is on top of stack, we'll just nuke input",
+             '        # symbol and continue')
+    tracked(20, "sym.endlineno = getattr(lookahead, 'lineno', sym.lineno)",
+                "sym.endlexpos = getattr(lookahead, 'lexpos', sym.lexpos)")
+    emit(12, '        lookahead = None',
+             '        continue',
+             '',
+             '    # Create the error symbol for the first time and make it the new lookahead symbol',
+             '    t = YaccSymbol()',
+             "    t.type = 'error'",
+             '',
+             "    if hasattr(lookahead, 'lineno'):",
+             '        t.lineno = t.endlineno = lookahead.lineno',
+             "    if hasattr(lookahead, 'lexpos'):",
+             '        t.lexpos = t.endlexpos = lookahead.lexpos',
+             '    t.value = lookahead',
+             '    lookaheadstack.append(lookahead)',
+             '    lookahead = t',
+             "    ltindex = termindex.get('error', unknown)",
+             '    defaulted_states = self.errdefaulted',
+             'else:',
+             '    sym = symstack.pop()')
+    if incremental:
+        emit(16, 'startstack.pop()')
+    tracked(16, 'lookahead.lineno = sym.lineno',
+                'lookahead.lexpos = sym.lexpos')
+    emit(12, '    statestack.pop()',
+             '    state = statestack[-1]',
+             '',
+             'continue',
+             '')
+    emit(8, "# If we'r here, something really bad happened",
+            "raise RuntimeError('yacc: internal parser error!!!\\n')")
+    return '\n'.join(lines) + '\n'
+
+def _make_engine(source, qualname):
+    filename = f'<ply.yacc {qualname}>'
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {}
+    exec(compile(source, filename, 'exec'), globals(), namespace)
+    engine = next(iter(namespace.values()))
+    engine.__qualname__ = qualname
+    return engine
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -225,24 +1104,56 @@ class YaccProduction:
 # -----------------------------------------------------------------------------
 
 class LRParser:
+    _last_context = None       # Context of the last parse that finished
+
     def __init__(self, lrtab, errorf):
         self.productions = lrtab.lr_productions
         self.action = lrtab.lr_action
         self.goto = lrtab.lr_goto
+        self.tables = LRDenseTable(self.action, self.goto, self.productions, lrtab.lr_default)
         self.errorfunc = errorf
         self.set_defaulted_states()
-        self.errorok = True
+
+    # Return the context of the innermost parse by this parser that is running in
+    # the current thread or task (None if there is no such parse)
+    def context(self):
+        ctx = _parse_context.get()
+        while ctx is not None and ctx.parser is not self:
+            ctx = ctx.outer
+        return ctx
+
+    # The context of the active parse or, outside a parse, of the last one
+    def _active_context(self):
+        ctx = self.context() or self._last_context
+        if ctx is None:
+            raise AttributeError('parser has not run')
+        return ctx
 
     def errok(self):
-        self.errorok = True
+        ctx = self.context()
+        if ctx is not None:
+            ctx.errok()
 
     def restart(self):
-        del self.statestack[:]
-        del self.symstack[:]
-        sym = YaccSymbol()
-        sym.type = '$end'
-        self.symstack.append(sym)
-        self.statestack.append(0)
+        ctx = self.context()
+        if ctx is not None:
+            ctx.restart()
+
+    # Return the next token from the lexer of the active parse
+    def token(self):
+        return self._active_context().token()
+
+    @property
+    def statestack(self):
+        return self._active_context().statestack
+
+    @property
+    def symstack(self):
+        return self._active_context().symstack
+
+    @property
+    def state(self):
+        return self._active_context().state
 
     # Defaulted state support.
     # This method identifies parser states where there is only one possible reduction action.
@@ -252,333 +1163,453 @@ class LRParser:
     # each other or change states (i.e., manipulation of scope, lexer states, etc.).
     #
     # See:  http://www.gnu.org/software/bison/manual/html_node/Default-Reductions.html#Default-Reductions
+    #
+    # The parsing engine uses the defaulted array, which holds the reduce action for each
+    # defaulted state and 0 for every other state.  During error recovery, while the
+    # lookahead is the error token, it uses errdefaulted instead (see LRDenseTable).
     def set_defaulted_states(self):
-        self.defaulted_states = {}
-        for state, actions in self.action.items():
-            rules = list(actions.values())
-            if len(rules) == 1 and rules[0] < 0:
-                self.defaulted_states[state] = rules[0]
+        self.defaulted = array('i', self.tables.defaulted)
+        self.errdefaulted = array('i', self.tables.errdefaulted)
+        self.defaulted_states = {state: t for state, t in enumerate(self.defaulted) if t}
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
+        self.defaulted = array('i', bytes(4 * self.tables.nstates))
+        self.errdefaulted = self.defaulted
+
+    # freeze().
+    #
+    # Return a copy of this parser that only holds what the parsing engines need: the
+    # dense tables, a MiniProduction (name, length and bound callable) for every rule,
+    # and the error function.  The copy does not reference the grammar's Production
+    # objects with their LR items, nor the action and goto dictionaries, so all of the
+    # table construction state can be reclaimed once the original parser is dropped.
+    # The action and goto attributes of the copy are None.  The module level parse()
+    # is left alone: if this is the parser built last by yacc(), it keeps this parser
+    # alive until the next call of yacc().
+    def freeze(self):
+        productions = []
+        for p in self.productions:
+            mp = MiniProduction(str(p), p.name, p.len, p.func, p.file, p.line)
+            mp.callable = p.callable
+            mp.positional = p.positional
+            mp.passthrough = p.passthrough
+            productions.append(mp)
+
+        parser = LRParser.__new__(LRParser)
+        parser.productions = productions
+        parser.action = None
+        parser.goto = None
+        parser.tables = self.tables
+        parser.errorfunc = self.errorfunc
+        parser.defaulted = array('i', self.defaulted)
+        parser.errdefaulted = array('i', self.errdefaulted)
+        parser.defaulted_states = dict(self.defaulted_states)
+        return parser
+
+    # __reduce__().
+    #
+    # Pickle support, so that a parser built once can be handed to the workers of a
+    # process pool.  Only the tables and, for every rule, the information kept by a
+    # MiniProduction are stored.  The rule functions and the error function are
+    # looked up again by name when the parser is loaded (see _callable_ref()).  Like
+    # a frozen parser, a loaded parser has MiniProductions.
+    def __reduce__(self):
+        productions = [(str(p), p.name, p.len, p.func, p.file, p.line, _callable_ref(p.callable),
+                        p.positional, p.passthrough) for p in self.productions]
+        return (_load_parser, (__tabversion__, __version__, self.action, self.goto, self.tables,
+                               self.defaulted, self.errdefaulted, productions,
+                               _callable_ref(self.errorfunc)))
 
     # parse().
     #
-    # This is the core parsing engine.  To operate, it requires a lexer object.
-    # Two options are provided.  The debug flag turns on debugging so that you can
-    # see the various rule reductions and parsing steps.  tracking turns on position
+    # This is the entry point of the parsing engine.  To operate, it requires a lexer
+    # object.  Two options are provided.  The debug flag turns on debugging so that you
+    # can see the various rule reductions and parsing steps.  tracking turns on position
     # tracking.  In this mode, symbols will record the starting/ending line number and
-    # character index.
-
-    def parse(self, input=None, lexer=None, debug=False, tracking=False):
-        # If debugging has been specified as a flag, turn it into a logging object
-        if isinstance(debug, int) and debug:
-            debug = PlyLogger(sys.stderr)
-
-        lookahead = None                         # Current lookahead symbol
-        lookaheadstack = []                      # Stack of lookahead symbols
-        actions = self.action                    # Local reference to action table (to avoid lookup on self.)
-        goto    = self.goto                      # Local reference to goto table (to avoid lookup on self.)
-        prod    = self.productions               # Local reference to production list (to avoid lookup on self.)
-        defaulted_states = self.defaulted_states # Local reference to defaulted states
-        pslice  = YaccProduction(None)           # Production object passed to grammar rules
-        errorcount = 0                           # Used during error recovery
+    # character index.  Passing a ParseProfile as profile runs the parse under it.
+    # If errors is a list, the token of every syntax error is appended to it (see
+    # ParseContext).
+    #
+    # The actual work is done by one of four specialized engines so that the common
+    # case runs a loop without any debugging or tracking checks in it:
+    #
+    #     parsedebug()        - Debugging (and optionally tracking) engine
+    #     parseopt()          - Position tracking engine
+    #     parseopt_notrack()  - Plain engine
+    #     parseprofile()      - Profiling (and optionally tracking) engine
+    #
+    # All of the engines are generated from one template by _engine_source().
 
+    def parse(self, input=None, lexer=None, debug=False, tracking=False, profile=None, errors=None):
+        if profile is not None:
+            return profile.run(self, input, lexer, debug, tracking, errors)
         if debug:
-            debug.info('PLY: PARSE DEBUG START')
-
-        # If no lexer was given, we will try to use the lex module
-        if not lexer:
-            from . import lex
-            lexer = lex.lexer
-
-        # Set up the lexer and parser objects on pslice
-        pslice.lexer = lexer
-        pslice.parser = self
-
-        # If input was supplied, pass to lexer
-        if input is not None:
-            lexer.input(input)
-
-        # Set the token function
-        get_token = self.token = lexer.token
-
-        # Set up the state and symbol stacks
-        statestack = self.statestack = []   # Stack of parsing states
-        symstack = self.symstack = []       # Stack of grammar symbols
-        pslice.stack = symstack             # Put in the production
-        errtoken   = None                   # Err token
-
-        # The start state is assumed to be (0,$end)
+            # If debugging has been specified as a flag, turn it into a logging object
+            if isinstance(debug, int):
+                debug = PlyLogger(sys.stderr)
+            return self.parsedebug(input, lexer, debug, tracking, errors=errors)
+        elif tracking:
+            return self.parseopt(input, lexer, errors=errors)
+        else:
+            return self.parseopt_notrack(input, lexer, errors=errors)
 
-        statestack.append(0)
-        sym = YaccSymbol()
-        sym.type = '$end'
-        symstack.append(sym)
-        state = 0
-        while True:
-            # Get the next symbol on the input.  If a lookahead symbol
-            # is already set, we just use that. Otherwise, we'll pull
-            # the next token off of the lookaheadstack or from the lexer
+    # push().
+    #
+    # Start a parse that is fed tokens by the caller.  Returns a PushParser.  lexer is
+    # only made available to the grammar rules (p.lexer) and to p_error() (t.lexer).
+    def push(self, lexer=None, tracking=False, statement=None):
+        return PushParser(self, lexer, tracking, statement)
 
-            if debug:
-                debug.debug('State  : %s', state)
+    # iterparse().
+    #
+    # Generator that parses the tokens of an iterable and yields the value of every
+    # top level reduction of the nonterminal statement as soon as it is made (see
+    # PushParser).  The return value of the generator is the result of the parse.
+    def iterparse(self, tokens, statement, lexer=None, tracking=False):
+        push = PushParser(self, lexer, tracking, statement)
+        for tok in tokens:
+            push.feed(tok)
+            if push.statements:
+                yield from push.take()
+        result = push.close()
+        yield from push.take()
+        return result
 
-            if state not in defaulted_states:
-                if not lookahead:
-                    if not lookaheadstack:
-                        lookahead = get_token()     # Get the next token
-                    else:
-                        lookahead = lookaheadstack.pop()
-                    if not lookahead:
-                        lookahead = YaccSymbol()
-                        lookahead.type = '$end'
-
-                # Check the action table
-                ltype = lookahead.type
-                t = actions[state].get(ltype)
-            else:
-                t = defaulted_states[state]
-                if debug:
-                    debug.debug('Defaulted state %s: Reduce using %d', state, -t)
+    # incremental().
+    #
+    # Return an IncrementalParser, which reparses the input after every edit and
+    # reuses the parts of the last parse that the edit did not change.  Values of
+    # nonterminals in exclude are always built again.
+    def incremental(self, lexer=None, tracking=False, exclude=()):
+        return IncrementalParser(self, lexer, tracking, exclude)
 
-            if debug:
-                debug.debug('Stack  : %s',
-                            ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())
+    # parsedebug().
+    #
+    # Parsing engine with debugging output.  Every step of the parse is written to the
+    # debug logging object.
 
-            if t is not None:
-                if t > 0:
-                    # shift a symbol on the stack
-                    statestack.append(t)
-                    state = t
+    parsedebug = _with_context(_make_engine(_engine_source('parsedebug', debug=True), 'LRParser.parsedebug'))
 
-                    if debug:
-                        debug.debug('Action : Shift and goto state %s', t)
+    # parseopt().
+    #
+    # Engine with position tracking and no debugging code.
 
-                    symstack.append(lookahead)
-                    lookahead = None
+    parseopt = _with_context(_make_engine(_engine_source('parseopt', tracking=True), 'LRParser.parseopt'))
 
-                    # Decrease error count on successful shift
-                    if errorcount:
-                        errorcount -= 1
-                    continue
+    # parseopt_notrack().
+    #
+    # Engine without debugging or position tracking code.
 
-                if t < 0:
-                    # reduce a symbol on the stack, emit a production
-                    p = prod[-t]
-                    pname = p.name
-                    plen  = p.len
-
-                    # Get production function
-                    sym = YaccSymbol()
-                    sym.type = pname       # Production name
-                    sym.value = None
-
-                    if debug:
-                        if plen:
-                            debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str,
-                                       '['+','.join([format_stack_entry(_v.value) for _v in symstack[-plen:]])+']',
-                                       goto[statestack[-1-plen]][pname])
-                        else:
-                            debug.info('Action : Reduce rule [%s] with %s and goto state %d', p.str, [],
-                                       goto[statestack[-1]][pname])
+    parseopt_notrack = _with_context(_make_engine(_engine_source('parseopt_notrack', tracking=False),
+                                                  'LRParser.parseopt_notrack'))
 
-                    if plen:
-                        targ = symstack[-plen-1:]
-                        targ[0] = sym
+    # parseprofile().
+    #
+    # Engine without the debugging code that counts into a ParseProfile.
 
-                        if tracking:
-                            t1 = targ[1]
-                            sym.lineno = t1.lineno
-                            sym.lexpos = t1.lexpos
-                            t1 = targ[-1]
-                            sym.endlineno = getattr(t1, 'endlineno', t1.lineno)
-                            sym.endlexpos = getattr(t1, 'endlexpos', t1.lexpos)
+    parseprofile = _with_context(_make_engine(_engine_source('parseprofile', profile=True), 'LRParser.parseprofile'))
 
-                        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-                        # The code enclosed in this section is duplicated
-                        # below as a performance optimization.  Make sure
-                        # changes get made in both locations.
+    # parsepush().
+    #
+    # Push engine used by PushParser.  This is a generator.  It receives the tokens
+    # through send() at every point where the other engines call the token function,
+    # and finishes (StopIteration) with the result of the parse once it has been sent
+    # None for the end of the input.  Position tracking is turned on by the tracking
+    # flag.  Values of top level reductions of the nonterminal statement are appended
+    # to the output list (see PushParser).
+    #
+    # The caller makes ctx the active context around every send().
 
-                        pslice.slice = targ
+    parsepush = _make_engine(_engine_source('parsepush', push=True), 'LRParser.parsepush')
 
-                        try:
-                            # Call the grammar rule with our special slice object
-                            del symstack[-plen:]
-                            self.state = state
-                            p.callable(pslice)
-                            del statestack[-plen:]
-                            if debug:
-                                debug.info('Result : %s', format_result(pslice[0]))
-                            symstack.append(sym)
-                            state = goto[statestack[-1]][pname]
-                            statestack.append(state)
-                        except SyntaxError:
-                            # If an error was set. Enter error recovery state
-                            lookaheadstack.append(lookahead)    # Save the current lookahead token
-                            symstack.extend(targ[1:-1])         # Put the production slice back on the stack
-                            statestack.pop()                    # Pop back one state (before the reduce)
-                            state = statestack[-1]
-                            sym.type = 'error'
-                            sym.value = 'error'
-                            lookahead = sym
-                            errorcount = error_count
-                            self.errorok = False
-
-                        continue
+    # parseincr().
+    #
+    # Incremental engine used by IncrementalParser.  The tokens are taken from the list
+    # inc.tokens.  Every symbol made by a reduction records the parts it was reduced
+    # from (children), the number of tokens it covers (ntokens) and the state below it
+    # on the stack (prestate).  Position tracking is turned on by inc.tracking.
+    #
+    # If inc.tree holds the tree of the previous parse, it is walked left to right in
+    # step with the new tokens.  Right before a token is shifted, the largest old
+    # symbol that starts at that token is shifted instead, in one step, if
+    #
+    #     - its tokens and the token after it are unchanged by the edit (they are in
+    #       the first inc.prefix or the last inc.suffix old tokens), and
+    #     - the current state is the state it was originally shifted on (prestate).
+    #
+    # From the same state and with the same tokens, the parse would make exactly the
+    # same moves as before, so the old symbol (with its value) is the one it would
+    # build again.  An old symbol that can't be reused is broken down into its parts,
+    # which are tried in turn.  inc.tree is set to the new tree and inc.reused to the
+    # number of tokens covered by reused symbols.  After a syntax error, inc.tree only
+    # holds the symbols that were on the stack at the first error.
 
-                    else:
+    parseincr = _with_context(_make_engine(_engine_source('parseincr', incremental=True), 'LRParser.parseincr'))
 
-                        if tracking:
-                            sym.lineno = lexer.lineno
-                            sym.lexpos = lexer.lexpos
+# -----------------------------------------------------------------------------
+#                              == PushParser ==
+#
+# Push interface to an LRParser.  Instead of the parser pulling tokens from a
+# lexer until the input ends, the caller feeds the tokens as they arrive:
+#
+#     push = parser.push()
+#     push.feed(tok)                # One token
+#     push.feed_all(tokens)         # A batch of tokens
+#     result = push.close()         # End of input, returns the result
+#
+# Between calls the state of the parse is kept in a suspended parsepush()
+# engine, so tokens can come from a pipe or a socket without buffering the
+# whole input.  A reduction is made as soon as the token after it has been
+# fed, or right away in a state that reduces without a lookahead.  Tables
+# built with yacc(default_reductions=True) have many more such states.
+#
+# If statement names a nonterminal, the values of its top level reductions
+# are collected as they happen and handed out by take().  A reduction is at
+# the top level if no token is below it on the parser stack, which is the
+# case for the items of a statement list at the start of a grammar but not
+# for statements nested in a block or an if statement.  LRParser.iterparse()
+# wraps this up as a generator.
+#
+# During a feed, parser.token() in p_error() returns the next token of the
+# current batch (None at the end of the batch).
+# -----------------------------------------------------------------------------
 
-                        targ = [sym]
+class PushParser:
+    def __init__(self, parser, lexer=None, tracking=False, statement=None):
+        self.parser = parser
+        self.statements = []              # Completed statements not yet taken
+        self.done = False
+        self.result = None
+        self._pending = iter(())          # Remaining tokens of the current batch
+        self._ctx = ctx = ParseContext(parser)
+        ctx.token = self._next_pending
+        self._engine = parser.parsepush(ctx, lexer, tracking, statement, self.statements)
+        self._run(self._engine.send, [None])
+
+    def _next_pending(self):
+        return next(self._pending, None)
+
+    # Run send() on tokens with the context of this parse active
+    def _run(self, send, tokens):
+        if self.done:
+            raise RuntimeError('parser is closed')
+        ctx = self._ctx
+        ctx.outer = _parse_context.get()
+        reset = _parse_context.set(ctx)
+        self._pending = iter(tokens)
+        try:
+            for tok in self._pending:
+                send(tok)
+        except StopIteration as e:
+            self.done = True
+            self.result = e.value
+            self.parser._last_context = ctx
+        finally:
+            self._pending = iter(())
+            _parse_context.reset(reset)
+
+    # Feed one token.  None is the end of the input, as for close().
+    def feed(self, tok):
+        self._run(self._engine.send, [tok])
+
+    # Feed an iterable of tokens
+    def feed_all(self, tokens):
+        self._run(self._engine.send, tokens)
+
+    # Signal the end of the input.  Returns the result of the parse.
+    def close(self):
+        if not self.done:
+            self._run(self._engine.send, repeat(None))
+        return self.result
+
+    # Return and forget the statements completed so far
+    def take(self):
+        statements = self.statements[:]
+        del self.statements[:]
+        return statements
 
-                        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-                        # The code enclosed in this section is duplicated
-                        # above as a performance optimization.  Make sure
-                        # changes get made in both locations.
+# -----------------------------------------------------------------------------
+#                           == IncrementalParser ==
+#
+# Incremental reparsing for editor-like use.  The parser keeps the tokens and
+# the tree of reduced symbols of the last parse.  After an edit, the tokens are
+# updated by Lexer.relex() and the parse reuses every old symbol whose tokens
+# were not touched by the edit and which is met in the same parser state as
+# before (see LRParser.parseincr()).  Reused symbols are shifted in one step,
+# without calling the grammar rules below them, so the cost of a reparse grows
+# with the size of the edit rather than the size of the input:
+#
+#     inc = parser.incremental(lexer)
+#     result = inc.parse(data)                        # Full parse
+#     result = inc.edit(offset, deleted, inserted)    # Reparse after an edit
+#
+# A reused symbol keeps its old value.  This is only correct if grammar rules
+# never change the value of a symbol after it has been made.  Rules that build
+# lists with p[1].append() do, and the nonterminal they reduce to must be listed
+# in exclude so that it is always built again.  The positions of a reused symbol
+# are updated (with tracking), but not positions stored inside values.
+#
+# After a parse with a syntax error, the next parse can only reuse symbols from
+# before the first error.
+# -----------------------------------------------------------------------------
 
-                        pslice.slice = targ
+# Token function for parseincr(), reading from a list of tokens
+class _TokenCursor:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
 
-                        try:
-                            # Call the grammar rule with our special slice object
-                            self.state = state
-                            p.callable(pslice)
-                            if debug:
-                                debug.info('Result : %s', format_result(pslice[0]))
-                            symstack.append(sym)
-                            state = goto[statestack[-1]][pname]
-                            statestack.append(state)
-                        except SyntaxError:
-                            # If an error was set. Enter error recovery state
-                            lookaheadstack.append(lookahead)    # Save the current lookahead token
-                            statestack.pop()                    # Pop back one state (before the reduce)
-                            state = statestack[-1]
-                            sym.type = 'error'
-                            sym.value = 'error'
-                            lookahead = sym
-                            errorcount = error_count
-                            self.errorok = False
-
-                        continue
-
-                if t == 0:
-                    n = symstack[-1]
-                    result = getattr(n, 'value', None)
-
-                    if debug:
-                        debug.info('Done   : Returning %s', format_result(result))
-                        debug.info('PLY: PARSE DEBUG END')
-
-                    return result
-
-            if t is None:
-
-                if debug:
-                    debug.error('Error  : %s',
-                                ('%s . %s' % (' '.join([xx.type for xx in symstack][1:]), str(lookahead))).lstrip())
-
-                # We have some kind of parsing error here.  To handle
-                # this, we are going to push the current token onto
-                # the tokenstack and replace it with an 'error' token.
-                # If there are any synchronization rules, they may
-                # catch it.
-                #
-                # In addition to pushing the error token, we call call
-                # the user defined p_error() function if this is the
-                # first syntax error.  This function is only called if
-                # errorcount == 0.
-                if errorcount == 0 or self.errorok:
-                    errorcount = error_count
-                    self.errorok = False
-                    errtoken = lookahead
-                    if errtoken.type == '$end':
-                        errtoken = None               # End of file!
-                    if self.errorfunc:
-                        if errtoken and not hasattr(errtoken, 'lexer'):
-                            errtoken.lexer = lexer
-                        self.state = state
-                        tok = self.errorfunc(errtoken)
-                        if self.errorok:
-                            # User must have done some kind of panic
-                            # mode recovery on their own.  The
-                            # returned token is the next lookahead
-                            lookahead = tok
-                            errtoken = None
-                            continue
-                    else:
-                        if errtoken:
-                            if hasattr(errtoken, 'lineno'):
-                                lineno = lookahead.lineno
-                            else:
-                                lineno = 0
-                            if lineno:
-                                sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, errtoken.type))
-                            else:
-                                sys.stderr.write('yacc: Syntax error, token=%s' % errtoken.type)
-                        else:
-                            sys.stderr.write('yacc: Parse error in input. EOF\n')
-                            return
+    def token(self):
+        i = self.index
+        self.index = i + 1
+        return self.tokens[i] if i < len(self.tokens) else None
 
-                else:
-                    errorcount = error_count
-
-                # case 1:  the statestack only has 1 entry on it.  If we're in this state, the
-                # entire parse has been rolled back and we're completely hosed.   The token is
-                # discarded and we just keep going.
-
-                if len(statestack) <= 1 and lookahead.type != '$end':
-                    lookahead = None
-                    errtoken = None
-                    state = 0
-                    # Nuke the pushback stack
-                    del lookaheadstack[:]
-                    continue
+class IncrementalParser:
+    def __init__(self, parser, lexer=None, tracking=False, exclude=()):
+        if lexer is None:
+            from . import lex
+            lexer = lex.lexer
+        self.parser = parser
+        self.lexer = lexer
+        self.tracking = tracking
+        self.exclude = frozenset(exclude)   # Nonterminals that are never reused
+        self.tokens = []                    # Tokens of the input
+        self.tree = None                    # Symbol reduced to the start symbol by the last parse
+        self.result = None
+        self.reused = 0                     # Tokens covered by reused symbols in the last parse
+        self.prefix = 0                     # Tokens at the start and the end of the input
+        self.suffix = 0                     # that are unchanged since the last parse
+        self.oldlen = 0                     # Number of tokens of the last parse
+
+    # Parse data from scratch
+    def parse(self, data):
+        self.lexer.input(data)
+        self.tokens = list(self.lexer)
+        self.tree = None
+        return self._run()
+
+    # Replace deleted characters at offset with the string inserted and reparse
+    def edit(self, offset, deleted, inserted):
+        old = self.tokens
+        new = self.tokens = self.lexer.relex(old, offset, deleted, inserted)
+
+        # relex() tells how many tokens before and after the edit are unchanged
+        self.prefix = new.prefix
+        self.suffix = new.suffix
+        self.oldlen = len(old)
+        return self._run()
+
+    def _run(self):
+        self.reused = 0
+        self.result = self.parser.parseincr(self)
+        return self.result
 
-                # case 2: the statestack has a couple of entries on it, but we're
-                # at the end of the file. nuke the top entry and generate an error token
+# -----------------------------------------------------------------------------
+#                              == ParseProfile ==
+#
+# Counters for profiling an LRParser.  Pass a profile to parse() and the parse is
+# run by parseprofile() (which can't be combined with debug output), recording:
+#
+#       reductions    - Number of reductions of every production
+#       action_time   - Time spent in the grammar rule of every production,
+#                       including rules that raised SyntaxError
+#       state_visits  - Number of steps made in every state
+#       state_errors  - Number of syntax errors found in every state, including
+#                       the ones during error recovery
+#       shifts        - Number of shifted tokens
+#       parses        - Number of parses run
+#       parse_time    - Total time of those parses
+#
+# The lists are indexed by production or state number.  A profile accumulates
+# over any number of parses by the parser it was made for (or its frozen
+# copies).  report() summarizes it and folded() writes it in the folded stack
+# format read by flame graph tools.
+# -----------------------------------------------------------------------------
 
-                # Start nuking entries on the stack
-                if lookahead.type == '$end':
-                    # Whoa. We're really hosed here. Bail out
-                    return
+class ParseProfile:
+    def __init__(self, parser):
+        self.productions = parser.productions
+        self.tables = parser.tables
+        self.reductions = [0] * len(parser.productions)
+        self.action_time = [0.0] * len(parser.productions)
+        self.state_visits = [0] * parser.tables.nstates
+        self.state_errors = [0] * parser.tables.nstates
+        self.shifts = 0
+        self.parses = 0
+        self.parse_time = 0.0
+
+    # Run a parse with profiling.  Called by LRParser.parse().
+    def run(self, parser, input, lexer, debug, tracking, errors=None):
+        if parser.tables is not self.tables:
+            raise ValueError('profile was made for a different parser')
+        if debug:
+            raise ValueError('a profiled parse can not write debugging output')
+        start = time.perf_counter()
+        try:
+            return parser.parseprofile(input, lexer, tracking, self, errors=errors)
+        finally:
+            self.parses += 1
+            self.parse_time += time.perf_counter() - start
+
+    def report(self):
+        return ProfileReport(self)
+
+    # Return the profile in folded stack format, one line per grammar rule with the
+    # time spent in it (in microseconds) under parse;<nonterminal>;<rule>.  The time
+    # of the parsing engine itself is reported as parse;<engine>.
+    def folded(self):
+        lines = []
+        engine = self.parse_time - sum(self.action_time)
+        if engine >= 0.0000005:
+            lines.append('parse;<engine> %d' % round(engine * 1e6))
+        for p, seconds in zip(self.productions, self.action_time):
+            us = round(seconds * 1e6)
+            if us:
+                frames = ['parse', p.name, p.str]
+                lines.append('%s %d' % (';'.join(f.replace(';', ',') for f in frames), us))
+        return '\n'.join(lines) + '\n'
 
-                if lookahead.type != 'error':
-                    sym = symstack[-1]
-                    if sym.type == 'error':
-                        # Hmmm. Error is on top of stack, we'll just nuke input
-                        # symbol and continue
-                        if tracking:
-                            sym.endlineno = getattr(lookahead, 'lineno', sym.lineno)
-                            sym.endlexpos = getattr(lookahead, 'lexpos', sym.lexpos)
-                        lookahead = None
-                        continue
-
-                    # Create the error symbol for the first time and make it the new lookahead symbol
-                    t = YaccSymbol()
-                    t.type = 'error'
-
-                    if hasattr(lookahead, 'lineno'):
-                        t.lineno = t.endlineno = lookahead.lineno
-                    if hasattr(lookahead, 'lexpos'):
-                        t.lexpos = t.endlexpos = lookahead.lexpos
-                    t.value = lookahead
-                    lookaheadstack.append(lookahead)
-                    lookahead = t
-                else:
-                    sym = symstack.pop()
-                    if tracking:
-                        lookahead.lineno = sym.lineno
-                        lookahead.lexpos = sym.lexpos
-                    statestack.pop()
-                    state = statestack[-1]
+# -----------------------------------------------------------------------------
+# ProfileReport
+#
+# Summary of a ParseProfile.  productions holds (rule, reductions, seconds) for
+# every rule that was reduced and states holds (state, visits, errors) for
+# every state that was visited, both with the most expensive first.  str() of
+# a report is a printable table.
+# -----------------------------------------------------------------------------
 
-                continue
+class ProfileReport:
+    def __init__(self, profile):
+        self.parses = profile.parses
+        self.parse_time = profile.parse_time
+        self.action_time = sum(profile.action_time)
+        self.shifts = profile.shifts
+        self.reductions = sum(profile.reductions)
+        self.errors = sum(profile.state_errors)
+
+        self.productions = [(p.str, n, seconds) for p, n, seconds in
+                            zip(profile.productions, profile.reductions, profile.action_time) if n]
+        self.productions.sort(key=lambda r: (-r[2], -r[1]))
+        self.states = [(state, n, errors) for state, (n, errors) in
+                       enumerate(zip(profile.state_visits, profile.state_errors)) if n]
+        self.states.sort(key=lambda r: (-r[1], r[0]))
+
+    def format(self, limit=20):
+        lines = ['parses %d, %.6f seconds (%.6f in grammar rules), %d shifts, %d reductions, %d errors' %
+                 (self.parses, self.parse_time, self.action_time, self.shifts, self.reductions, self.errors),
+                 '',
+                 '%10s %12s  %s' % ('reductions', 'seconds', 'rule')]
+        for rule, n, seconds in self.productions[:limit]:
+            lines.append('%10d %12.6f  %s' % (n, seconds, rule))
+        lines.append('')
+        lines.append('%10s %12s  %s' % ('visits', 'errors', 'state'))
+        for state, n, errors in self.states[:limit]:
+            lines.append('%10d %12d  %d' % (n, errors, state))
+        return '\n'.join(lines)
 
-            # If we'r here, something really bad happened
-            raise RuntimeError('yacc: internal parser error!!!\n')
+    def __str__(self):
+        return self.format()
 
 # -----------------------------------------------------------------------------
 #                          === Grammar Representation ===
@@ -622,6 +1653,8 @@ class Production(object):
         self.number   = number
         self.func     = func
         self.callable = None
+        self.positional = False
+        self.passthrough = False
         self.file     = file
         self.line     = line
         self.prec     = precedence
@@ -681,6 +1714,41 @@ class Production(object):
     def bind(self, pdict):
         if self.func:
             self.callable = pdict[self.func]
+            self.positional = getattr(self.callable, 'positional', False)
+            self.passthrough = self.len == 1 and is_passthrough(self.callable)
+
+# -----------------------------------------------------------------------------
+# class MiniProduction:
+#
+# This class is a stripped down version of Production used to hold the
+# productions read back from a table cache.  It only carries the information
+# needed by the parsing engine (name, length, and the action function).
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.positional = False
+        self.passthrough = False
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+            self.positional = getattr(self.callable, 'positional', False)
+            self.passthrough = self.len == 1 and is_passthrough(self.callable)
 
 # -----------------------------------------------------------------------------
 # class LRItem
@@ -700,6 +1768,7 @@ class Production(object):
 #       lr_next      Next LR item. Example, if we are ' expr -> expr . PLUS term'
 #                    then lr_next refers to 'expr -> expr PLUS . term'
 #       lr_index   - LR item index (location of the ".") in the prod list.
+#       lr_id      - Small integer identifying the item (set by build_lritems)
 #       lookaheads - LALR lookahead symbols for this item
 #       len        - Length of the production (number of symbols on right hand side)
 #       lr_after    - List of all productions that immediately follow
@@ -779,6 +1848,13 @@ class Grammar(object):
 
         self.Follow       = {}      # A dictionary of precomputed FOLLOW(x) symbols
 
+        self._termnames   = []      # Terminal names by bit number, used for FIRST and
+        self._termbits    = {}      # FOLLOW bitsets, and the bit for each terminal
+        self._firstbits   = {}      # FIRST(x) for each symbol as a bitset
+        self._followbits  = {}      # FOLLOW(x) for each nonterminal as a bitset
+
+        self.LRItems      = []      # All LR items of all productions, indexed by lr_id
+
         self.Precedence   = {}      # Precedence rules for each terminal. Contains tuples of the
                                     # form ('right',level) or ('nonassoc', level) or ('left',level)
 
@@ -1073,75 +2149,99 @@ class Grammar(object):
         return unused
 
     # -------------------------------------------------------------------------
-    # _first()
+    # _number_terminals()
     #
-    # Compute the value of FIRST1(beta) where beta is a tuple of symbols.
+    # FIRST and FOLLOW sets are computed as integer bitsets.  This assigns a
+    # bit to every terminal, to '$end' and to '<empty>'.
+    # -------------------------------------------------------------------------
+    def _number_terminals(self):
+        self._termnames = list(self.Terminals) + ['$end', '<empty>']
+        self._termbits = {name: 1 << i for i, name in enumerate(self._termnames)}
+
+    # Convert a bitset into a list of terminal names.  The binary digits are
+    # turned into a 0/1 selector so that the whole scan happens in C, which
+    # matters for wide, dense lookahead sets.
+    def _bits_to_list(self, bits):
+        return list(compress(self._termnames, bin(bits)[:1:-1].encode().translate(_bitselect)))
+
+    # -------------------------------------------------------------------------
+    # _first_bits()
+    #
+    # Compute FIRST1(beta) as a bitset, where beta is a tuple of symbols.
     #
-    # During execution of compute_first1, the result may be incomplete.
+    # During execution of compute_first(), the result may be incomplete.
     # Afterward (e.g., when called from compute_follow()), it will be complete.
     # -------------------------------------------------------------------------
-    def _first(self, beta):
-
-        # We are computing First(x1,x2,x3,...,xn)
-        result = []
+    def _first_bits(self, beta):
+        empty = self._termbits['<empty>']
+        firstbits = self._firstbits
+        result = 0
         for x in beta:
-            x_produces_empty = False
+            f = firstbits[x]
+            result |= f & ~empty
+            if not f & empty:
+                # x doesn't produce empty.  We don't have to consider any
+                # further symbols in beta.
+                return result
 
-            # Add all the non-<empty> symbols of First[x] to the result.
-            for f in self.First[x]:
-                if f == '<empty>':
-                    x_produces_empty = True
-                else:
-                    if f not in result:
-                        result.append(f)
+        # Every x in beta produces empty, so beta produces empty as well.
+        return result | empty
 
-            if x_produces_empty:
-                # We have to consider the next x in beta,
-                # i.e. stay in the loop.
-                pass
-            else:
-                # We don't have to consider any further symbols in beta.
-                break
-        else:
-            # There was no 'break' from the loop,
-            # so x_produces_empty was true for all x in beta,
-            # so beta produces empty as well.
-            result.append('<empty>')
-
-        return result
+    # -------------------------------------------------------------------------
+    # _first()
+    #
+    # Compute the value of FIRST1(beta) where beta is a tuple of symbols.
+    # The result is a list of symbol names.
+    # -------------------------------------------------------------------------
+    def _first(self, beta):
+        return self._bits_to_list(self._first_bits(beta))
 
     # -------------------------------------------------------------------------
     # compute_first()
     #
     # Compute the value of FIRST1(X) for all symbols
+    #
+    # Each production is re-examined only when the FIRST set of a nonterminal
+    # on its right hand side has grown.
     # -------------------------------------------------------------------------
     def compute_first(self):
         if self.First:
             return self.First
 
-        # Terminals:
-        for t in self.Terminals:
-            self.First[t] = [t]
-
-        self.First['$end'] = ['$end']
+        self._number_terminals()
 
-        # Nonterminals:
+        # Terminals:
+        firstbits = self._firstbits = dict(self._termbits)
+        del firstbits['<empty>']
 
-        # Initialize to the empty set:
+        # Nonterminals start out empty
         for n in self.Nonterminals:
-            self.First[n] = []
-
-        # Then propagate symbols until no change:
-        while True:
-            some_change = False
-            for n in self.Nonterminals:
-                for p in self.Prodnames[n]:
-                    for f in self._first(p.prod):
-                        if f not in self.First[n]:
-                            self.First[n].append(f)
-                            some_change = True
-            if not some_change:
-                break
+            firstbits[n] = 0
+
+        # Productions that have each nonterminal on the right hand side
+        users = {n: [] for n in self.Nonterminals}
+        for p in self.Productions[1:]:
+            for x in set(p.prod):
+                if x in users:
+                    users[x].append(p)
+
+        # Then propagate symbols through a worklist of productions
+        work = self.Productions[:0:-1]
+        queued = set(p.number for p in work)
+        while work:
+            p = work.pop()
+            queued.discard(p.number)
+            old = firstbits[p.name]
+            new = old | self._first_bits(p.prod)
+            if new != old:
+                firstbits[p.name] = new
+                for q in users[p.name]:
+                    if q.number not in queued:
+                        queued.add(q.number)
+                        work.append(q)
+
+        for x, bits in firstbits.items():
+            self.First[x] = self._bits_to_list(bits)
 
         return self.First
 
@@ -1151,6 +2251,11 @@ class Grammar(object):
     # Computes all of the follow sets for every non-terminal symbol.  The
     # follow set is the set of all symbols that might follow a given
     # non-terminal.  See the Dragon book, 2nd Ed. p. 189.
+    #
+    # Each occurrence of a nonterminal B in a production A -> alpha B beta
+    # adds FIRST(beta) to FOLLOW(B) once.  If beta can be empty, FOLLOW(A)
+    # is a subset of FOLLOW(B).  Those inclusions are then propagated with
+    # a worklist.
     # ---------------------------------------------------------------------
     def compute_follow(self, start=None):
         # If already computed, return the result
@@ -1161,38 +2266,44 @@ class Grammar(object):
         if not self.First:
             self.compute_first()
 
-        # Add '$end' to the follow list of the start symbol
-        for k in self.Nonterminals:
-            self.Follow[k] = []
+        empty = self._termbits['<empty>']
+        firstbits = self._firstbits
+        followbits = self._followbits = {k: 0 for k in self.Nonterminals}
 
+        # Add '$end' to the follow list of the start symbol
         if not start:
             start = self.Productions[1].name
 
-        self.Follow[start] = ['$end']
-
-        while True:
-            didadd = False
-            for p in self.Productions[1:]:
-                # Here is the production set
-                for i, B in enumerate(p.prod):
-                    if B in self.Nonterminals:
-                        # Okay. We got a non-terminal in a production
-                        fst = self._first(p.prod[i+1:])
-                        hasempty = False
-                        for f in fst:
-                            if f != '<empty>' and f not in self.Follow[B]:
-                                self.Follow[B].append(f)
-                                didadd = True
-                            if f == '<empty>':
-                                hasempty = True
-                        if hasempty or i == (len(p.prod)-1):
-                            # Add elements of follow(a) to follow(b)
-                            for f in self.Follow[p.name]:
-                                if f not in self.Follow[B]:
-                                    self.Follow[B].append(f)
-                                    didadd = True
-            if not didadd:
-                break
+        followbits[start] = self._termbits['$end']
+
+        includes = {k: set() for k in self.Nonterminals}
+        for p in self.Productions[1:]:
+            # Walk the production backwards, keeping FIRST of the symbols
+            # to the right of position i in rest
+            rest = empty
+            for B in reversed(p.prod):
+                if B in followbits:
+                    # Okay. We got a non-terminal in a production
+                    followbits[B] |= rest & ~empty
+                    if rest & empty and B != p.name:
+                        includes[p.name].add(B)
+                f = firstbits[B]
+                if f & empty:
+                    rest |= f & ~empty
+                else:
+                    rest = f
+
+        work = list(self.Nonterminals)
+        while work:
+            A = work.pop()
+            bits = followbits[A]
+            for B in includes[A]:
+                if bits & ~followbits[B]:
+                    followbits[B] |= bits
+                    work.append(B)
+
+        for k, bits in followbits.items():
+            self.Follow[k] = self._bits_to_list(bits)
         return self.Follow
 
 
@@ -1201,7 +2312,7 @@ class Grammar(object):
     #
     # This function walks the list of productions and builds a complete set of the
     # LR items.  The LR items are stored in two ways:  First, they are uniquely
-    # numbered and placed in the list _lritems.  Second, a linked list of LR items
+    # numbered (lr_id) and placed in the list LRItems.  Second, a linked list of LR items
     # is built for each production.  For example:
     #
     #   E -> E PLUS E
@@ -1212,6 +2323,7 @@ class Grammar(object):
     # -----------------------------------------------------------------------------
 
     def build_lritems(self):
+        self.LRItems = []
         for p in self.Productions:
             lastlri = p
             i = 0
@@ -1234,6 +2346,8 @@ class Grammar(object):
                 lastlri.lr_next = lri
                 if not lri:
                     break
+                lri.lr_id = len(self.LRItems)
+                self.LRItems.append(lri)
                 lr_items.append(lri)
                 lastlri = lri
                 i += 1
@@ -1248,9 +2362,8 @@ class Grammar(object):
 
 # -----------------------------------------------------------------------------
 # digraph()
-# traverse()
 #
-# The following two functions are used to compute set valued functions
+# The following function is used to compute set valued functions
 # of the form:
 #
 #     F(x) = F'(x) U U{F(y) | x R y}
@@ -1258,45 +2371,60 @@ class Grammar(object):
 # This is used to compute the values of Read() sets as well as FOLLOW sets
 # in LALR(1) generation.
 #
+# Sets are represented as integer bitsets, so that the union over a relation
+# edge is a single | operation.  The traversal is the strongly connected
+# component algorithm of DeRemer and Pennello, written with an explicit work
+# stack instead of recursion so that long relation chains in large grammars
+# can't overflow the Python stack.  Every member of a component ends up with
+# the same set.
+#
 # Inputs:  X    - An input set
 #          R    - A relation
-#          FP   - Set-valued function
+#          FP   - Bitset-valued function
 # ------------------------------------------------------------------------------
 
 def digraph(X, R, FP):
-    N = {}
-    for x in X:
-        N[x] = 0
+    N = dict.fromkeys(X, 0)
     stack = []
     F = {}
     for x in X:
-        if N[x] == 0:
-            traverse(x, N, stack, F, X, R, FP)
+        if N[x]:
+            continue
+        stack.append(x)
+        N[x] = len(stack)
+        F[x] = FP(x)                   # F(X) <- F'(x)
+        work = [(x, len(stack), iter(R(x)))]
+        while work:
+            x, d, rel = work[-1]
+            for y in rel:
+                if N[y] == 0:
+                    # Descend into y.  Its result is merged into x on return
+                    stack.append(y)
+                    N[y] = len(stack)
+                    F[y] = FP(y)
+                    work.append((y, len(stack), iter(R(y))))
+                    break
+                if N[y] < N[x]:
+                    N[x] = N[y]
+                F[x] |= F[y]
+            else:
+                work.pop()
+                if N[x] == d:
+                    # x is the root of a component.  Pop it off the stack
+                    f = F[x]
+                    while True:
+                        y = stack.pop()
+                        N[y] = MAXINT
+                        F[y] = f
+                        if y == x:
+                            break
+                if work:
+                    p = work[-1][0]
+                    if N[x] < N[p]:
+                        N[p] = N[x]
+                    F[p] |= F[x]
     return F
 
-def traverse(x, N, stack, F, X, R, FP):
-    stack.append(x)
-    d = len(stack)
-    N[x] = d
-    F[x] = FP(x)             # F(X) <- F'(x)
-
-    rel = R(x)               # Get y's related to x
-    for y in rel:
-        if N[y] == 0:
-            traverse(y, N, stack, F, X, R, FP)
-        N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
-    if N[x] == d:
-        N[stack[-1]] = MAXINT
-        F[stack[-1]] = F[x]
-        element = stack.pop()
-        while element != x:
-            N[stack[-1]] = MAXINT
-            F[stack[-1]] = F[x]
-            element = stack.pop()
-
 class LALRError(YaccError):
     pass
 
@@ -1309,8 +2437,10 @@ class LALRError(YaccError):
 # -----------------------------------------------------------------------------
 
 class LRTable:
-    def __init__(self, grammar, log=None):
+    def __init__(self, grammar, log=None, default_reductions=False, stats=None):
         self.grammar = grammar
+        self.stats = stats             # BuildStats to record the phases in (if any)
+        self.default_reductions = default_reductions
 
         # Set up the logger
         if not log:
@@ -1320,11 +2450,11 @@ class LRTable:
         # Internal attributes
         self.lr_action     = {}        # Action table
         self.lr_goto       = {}        # Goto table
+        self.lr_default    = {}        # Default reduction of each state (if any)
         self.lr_productions  = grammar.Productions    # Copy of grammar Production array
-        self.lr_goto_cache = {}        # Cache of computed gotos
-        self.lr0_cidhash   = {}        # Cache of closures
-
-        self._add_count    = 0         # Internal counter used to detect cycles
+        self.lr0_kernels   = {}        # Map of kernel (sorted item ids) to state number
+        self.lr0_gotos     = []        # Goto function of each LR(0) state: {symbol: state}
+        self.lr0_closures  = {}        # Closure items by leading nonterminals
 
         # Diagnostic information filled in by the table generator
         self.sr_conflict   = 0
@@ -1338,82 +2468,72 @@ class LRTable:
         self.grammar.build_lritems()
         self.grammar.compute_first()
         self.grammar.compute_follow()
-        self.lr_parse_table()
+        if stats is not None:
+            stats.mark('first_follow', items=len(self.grammar.LRItems))
+        self.lr_parse_table(default_reductions)
 
     # Bind all production function names to callable objects in pdict
     def bind_callables(self, pdict):
         for p in self.lr_productions:
             p.bind(pdict)
 
+    # -----------------------------------------------------------------------------
+    # lr0_closure()
+    #
     # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
+    #
+    # The items added by the closure only depend on the nonterminals that appear
+    # right after the dot in I.  For a given sequence of such nonterminals, the
+    # added items are computed once (breadth first, in the order the old item by
+    # item closure produced them) and kept in lr0_closures.
+    # -----------------------------------------------------------------------------
 
     def lr0_closure(self, I):
-        self._add_count += 1
-
-        # Add everything in I to J
-        J = I[:]
-        didadd = True
-        while didadd:
-            didadd = False
-            for j in J:
-                for x in j.lr_after:
-                    if getattr(x, 'lr0_added', 0) == self._add_count:
-                        continue
-                    # Add B --> .G to J
-                    J.append(x.lr_next)
-                    x.lr0_added = self._add_count
-                    didadd = True
-
+        Prodnames = self.grammar.Prodnames
+        roots = {}
+        for j in I:
+            if j.lr_after:
+                roots[j.prod[j.lr_index+1]] = None
+        roots = tuple(roots)
+
+        added = self.lr0_closures.get(roots)
+        if added is None:
+            added = []
+            seen = dict.fromkeys(roots)
+            queue = list(roots)
+            for name in queue:
+                # Add B --> .G to J for every production of B
+                for x in Prodnames[name]:
+                    item = x.lr_next
+                    added.append(item)
+                    if item.lr_after:
+                        n = item.prod[1]
+                        if n not in seen:
+                            seen[n] = None
+                            queue.append(n)
+            added = self.lr0_closures[roots] = tuple(added)
+
+        J = list(I)
+        J.extend(added)
         return J
 
-    # Compute the LR(0) goto function goto(I,X) where I is a set
-    # of LR(0) items and X is a grammar symbol.   This function is written
-    # in a way that guarantees uniqueness of the generated goto sets
-    # (i.e. the same goto set will never be returned as two different Python
-    # objects).  With uniqueness, we can later do fast set comparisons using
-    # id(obj) instead of element-wise comparison.
-
-    def lr0_goto(self, I, x):
-        # First we look for a previously cached entry
-        g = self.lr_goto_cache.get((id(I), x))
-        if g:
-            return g
-
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
-        gs = []
-        for p in I:
-            n = p.lr_next
-            if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
-                gs.append(n)
-                s = s1
-        g = s.get('$end')
-        if not g:
-            if gs:
-                g = self.lr0_closure(gs)
-                s['$end'] = g
-            else:
-                s['$end'] = gs
-        self.lr_goto_cache[(id(I), x)] = g
-        return g
+    # -----------------------------------------------------------------------------
+    # lr0_items()
+    #
+    # Compute the LR(0) sets of items.  Returns the list C of item sets and fills
+    # in lr0_gotos, the goto function of each set as a dictionary mapping a
+    # grammar symbol to a state number.
+    #
+    # A goto set is identified by its kernel, the items obtained by moving the
+    # dot over a symbol, represented as a sorted tuple of item ids.  Kernels are
+    # hashed in lr0_kernels so that every item set is only built once.
+    # -----------------------------------------------------------------------------
 
-    # Compute the LR(0) sets of item function
     def lr0_items(self):
-        C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
-        i = 0
-        for I in C:
-            self.lr0_cidhash[id(I)] = i
-            i += 1
+        kernel = [self.grammar.Productions[0].lr_next]
+        C = [self.lr0_closure(kernel)]
+        kernels = self.lr0_kernels = {(kernel[0].lr_id,): 0}
+        gotos = self.lr0_gotos = []
 
         # Loop over the items in C and each grammar symbols
         i = 0
@@ -1421,18 +2541,35 @@ class LRTable:
             I = C[i]
             i += 1
 
-            # Collect all of the symbols that could possibly be in the goto(I,X) sets
+            # Move the dot over the next symbol of every item, grouping the
+            # resulting kernel items by symbol
+            moves = {}
             asyms = {}
             for ii in I:
                 for s in ii.usyms:
                     asyms[s] = None
+                if ii.lr_index < ii.len - 1:
+                    n = ii.lr_next
+                    g = moves.get(n.lr_before)
+                    if g is None:
+                        moves[n.lr_before] = [n]
+                    else:
+                        g.append(n)
 
+            # Visit the symbols in the order they are used so that the states
+            # are numbered the same way on every run
+            st_goto = {}
             for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
+                g = moves.get(x)
+                if g is None:
                     continue
-                self.lr0_cidhash[id(g)] = len(C)
-                C.append(g)
+                key = tuple(sorted([n.lr_id for n in g]))
+                j = kernels.get(key)
+                if j is None:
+                    j = kernels[key] = len(C)
+                    C.append(self.lr0_closure(g))
+                st_goto[x] = j
+            gotos.append(st_goto)
 
         return C
 
@@ -1494,15 +2631,14 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def find_nonterminal_transitions(self, C):
-        trans = []
+        trans = {}
         for stateno, state in enumerate(C):
             for p in state:
                 if p.lr_index < p.len - 1:
                     t = (stateno, p.prod[p.lr_index+1])
                     if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
-                            trans.append(t)
-        return trans
+                        trans[t] = None
+        return list(trans)
 
     # -----------------------------------------------------------------------------
     # dr_relation()
@@ -1510,24 +2646,24 @@ class LRTable:
     # Computes the DR(p,A) relationships for non-terminal transitions.  The input
     # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
     #
-    # Returns a list of terminals.
+    # Returns a bitset of terminals.
     # -----------------------------------------------------------------------------
 
     def dr_relation(self, C, trans, nullable):
         state, N = trans
-        terms = []
+        termbits = self.grammar._termbits
+        terms = 0
 
-        g = self.lr0_goto(C[state], N)
+        g = C[self.lr0_gotos[state][N]]
         for p in g:
             if p.lr_index < p.len - 1:
                 a = p.prod[p.lr_index+1]
                 if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
+                    terms |= termbits[a]
 
         # This extra bit is to handle the start state
         if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append('$end')
+            terms |= termbits['$end']
 
         return terms
 
@@ -1542,8 +2678,8 @@ class LRTable:
         rel = []
         state, N = trans
 
-        g = self.lr0_goto(C[state], N)
-        j = self.lr0_cidhash.get(id(g), -1)
+        j = self.lr0_gotos[state][N]
+        g = C[j]
         for p in g:
             if p.lr_index < p.len - 1:
                 a = p.prod[p.lr_index + 1]
@@ -1585,23 +2721,29 @@ class LRTable:
         includedict = {}       # Dictionary of include relations
 
         # Make a dictionary of non-terminal transitions
-        dtrans = {}
-        for t in trans:
-            dtrans[t] = 1
+        dtrans = dict.fromkeys(trans, 1)
+
+        # Items of each state grouped by production name, built on first use
+        byname = {}
 
         # Loop over all transitions and compute lookbacks and includes
         for state, N in trans:
             lookb = []
             includes = []
-            for p in C[state]:
-                if p.name != N:
-                    continue
+            names = byname.get(state)
+            if names is None:
+                names = byname[state] = {}
+                for p in C[state]:
+                    names.setdefault(p.name, []).append(p)
 
+            for p in names.get(N, ()):
                 # Okay, we have a name match.  We now follow the production all the way
-                # through the state machine until we get the . on the right hand side
+                # through the state machine until we get the . on the right hand side.
+                # r tracks the same production item as the dot moves along
 
                 lr_index = p.lr_index
                 j = state
+                r = p
                 while lr_index < p.len - 1:
                     lr_index = lr_index + 1
                     t = p.prod[lr_index]
@@ -1623,23 +2765,14 @@ class LRTable:
                             # Appears to be a relation between (j,t) and (state,N)
                             includes.append((j, t))
 
-                    g = self.lr0_goto(C[j], t)               # Go to next set
-                    j = self.lr0_cidhash.get(id(g), -1)      # Go to next state
-
-                # When we get here, j is the final state, now we have to locate the production
-                for r in C[j]:
-                    if r.name != p.name:
-                        continue
-                    if r.len != p.len:
-                        continue
-                    i = 0
-                    # This look is comparing a production ". A B C" with "A B C ."
-                    while i < r.lr_index:
-                        if r.prod[i] != p.prod[i+1]:
-                            break
-                        i = i + 1
-                    else:
-                        lookb.append((j, r))
+                    j = self.lr0_gotos[j][t]                 # Go to next state
+                    r = r.lr_next
+
+                # When we get here, j is the final state and r is the completed
+                # item "N : A B C ." found in it.  Only an item that started with
+                # the dot at the front, ". A B C", has a lookback to it
+                if p.lr_index == 0:
+                    lookb.append((j, r))
             for i in includes:
                 if i not in includedict:
                     includedict[i] = []
@@ -1657,7 +2790,7 @@ class LRTable:
     #          ntrans   = Set of nonterminal transitions
     #          nullable = Set of empty transitions
     #
-    # Returns a set containing the read sets
+    # Returns a dictionary mapping each transition to its read set as a bitset
     # -----------------------------------------------------------------------------
 
     def compute_read_sets(self, C, ntrans, nullable):
@@ -1679,7 +2812,7 @@ class LRTable:
     #            readsets   = Readset (previously computed)
     #            inclsets   = Include sets (previously computed)
     #
-    # Returns a set containing the follow sets
+    # Returns a dictionary mapping each transition to its follow set as a bitset
     # -----------------------------------------------------------------------------
 
     def compute_follow_sets(self, ntrans, readsets, inclsets):
@@ -1694,22 +2827,28 @@ class LRTable:
     # Attaches the lookahead symbols to grammar rules.
     #
     # Inputs:    lookbacks         -  Set of lookback relations
-    #            followset         -  Computed follow set
+    #            followset         -  Computed follow set (bitsets)
     #
     # This function directly attaches the lookaheads to productions contained
-    # in the lookbacks set
+    # in the lookbacks set.  The sets are merged as bitsets first and each one
+    # is converted into a list of terminal names at the end.
     # -----------------------------------------------------------------------------
 
     def add_lookaheads(self, lookbacks, followset):
+        merged = {}
         for trans, lb in lookbacks.items():
+            f = followset.get(trans, 0)
             # Loop over productions in lookback
             for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+                key = (state, id(p))
+                if key in merged:
+                    merged[key][2] |= f
+                else:
+                    merged[key] = [state, p, f]
+
+        bits_to_list = self.grammar._bits_to_list
+        for state, p, bits in merged.values():
+            p.lookaheads[state] = bits_to_list(bits)
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
@@ -1719,6 +2858,10 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def add_lalr_lookaheads(self, C):
+        # Lookahead sets use the same terminal numbering as FIRST and FOLLOW
+        if not self.grammar._termbits:
+            self.grammar._number_terminals()
+
         # Determine all of the nullable nonterminals
         nullable = self.compute_nullable_nonterminals()
 
@@ -1742,7 +2885,7 @@ class LRTable:
     #
     # This function constructs the parse tables for SLR or LALR
     # -----------------------------------------------------------------------------
-    def lr_parse_table(self):
+    def lr_parse_table(self, default_reductions=False):
         Productions = self.grammar.Productions
         Precedence  = self.grammar.Precedence
         goto   = self.lr_goto         # Goto array
@@ -1755,7 +2898,16 @@ class LRTable:
         # This determines the number of states
 
         C = self.lr0_items()
+        if self.stats is not None:
+            self.stats.mark('lr0_items', states=len(C), items=sum(len(I) for I in C))
         self.add_lalr_lookaheads(C)
+        if self.stats is not None:
+            self.stats.mark('add_lalr_lookaheads',
+                            lookaheads=sum(len(la) for p in self.grammar.LRItems for la in p.lookaheads.values()))
+
+        if default_reductions:
+            nodefault = self.error_recovery_rules(C)
+            errshifted = {gotos['error'] for gotos in self.lr0_gotos if 'error' in gotos}
 
         # Build the parser table, state by state
         st = 0
@@ -1765,6 +2917,8 @@ class LRTable:
             st_action  = {}
             st_actionp = {}
             st_goto    = {}
+            st_gotos   = self.lr0_gotos[st]
+            st_rr      = len(self.rr_conflicts)
             log.info('')
             log.info('state %d', st)
             log.info('')
@@ -1838,8 +2992,7 @@ class LRTable:
                         i = p.lr_index
                         a = p.prod[i+1]       # Get symbol right after the "."
                         if a in self.grammar.Terminals:
-                            g = self.lr0_goto(I, a)
-                            j = self.lr0_cidhash.get(id(g), -1)
+                            j = st_gotos.get(a, -1)
                             if j >= 0:
                                 # We are in a shift state
                                 actlist.append((a, p, 'shift and go to state %d' % j))
@@ -1883,6 +3036,27 @@ class LRTable:
                                     st_action[a] = j
                                     st_actionp[a] = p
 
+            # Bison style default reductions.  The most common reduction of the
+            # state becomes its default and its entries are dropped.  The parser
+            # performs the default on every lookahead without an entry, so some
+            # errors are only detected after further reductions.  Explicit errors
+            # (nonassoc) stay in the table.  States with a reduce/reduce conflict
+            # keep all their entries: with an ambiguous grammar, reducing without
+            # regard to the lookahead can cycle through empty rules forever.  Rules
+            # that error recovery could see half reduced never become a default
+            # (see error_recovery_rules()).  Neither do the states entered by
+            # shifting the error token: error recovery discards a bad lookahead
+            # only while the error token is on top of the stack, and a default
+            # reduction there would cover it and make recovery start over forever.
+            st_default = 0
+            if default_reductions and len(self.rr_conflicts) == st_rr and st not in errshifted:
+                st_default = self.default_reduction(st_action, nodefault)
+                if st_default:
+                    for a in [a for a, t in st_action.items() if t == st_default]:
+                        del st_action[a]
+                        del st_actionp[a]
+                    self.lr_default[st] = st_default
+
             # Print the actions associated with each terminal
             _actprint = {}
             for a, p, m in actlist:
@@ -1890,6 +3064,8 @@ class LRTable:
                     if p is st_actionp[a]:
                         log.info('    %-15s %s', a, m)
                         _actprint[(a, m)] = 1
+            if st_default:
+                log.info('    %-15s reduce using rule %d (%s)', '$default', -st_default, Productions[-st_default])
             log.info('')
             # Print the actions that were not used. (debugging)
             not_used = 0
@@ -1911,8 +3087,7 @@ class LRTable:
                     if s in self.grammar.Nonterminals:
                         nkeys[s] = None
             for n in nkeys:
-                g = self.lr0_goto(I, n)
-                j = self.lr0_cidhash.get(id(g), -1)
+                j = st_gotos.get(n, -1)
                 if j >= 0:
                     st_goto[n] = j
                     log.info('    %-30s shift and go to state %d', n, j)
@@ -1922,6 +3097,137 @@ class LRTable:
             goto[st] = st_goto
             st += 1
 
+        if self.stats is not None:
+            self.stats.mark('lr_parse_table', actions=sum(len(a) for a in action.values()),
+                            gotos=sum(len(g) for g in goto.values()))
+
+    # -----------------------------------------------------------------------------
+    # error_recovery_rules()
+    #
+    # Return the numbers of the rules that must not be used as default reductions
+    # because error recovery could tell.  A default reduction performs a reduction
+    # on an invalid lookahead, so the error is only detected in a later state, and
+    # error recovery starts from a stack on which the handle of the rule has been
+    # replaced by its left hand side.  Recovery pops states until one of them has
+    # an action for the error token.  The result is the same as with the full
+    # tables as long as none of the states that only one of the two stacks holds
+    # has such an action: the states in the middle of the handle (popped from the
+    # full stack) and the goto states on the left hand side (popped from the
+    # reduced one).  The states with an action for the error token are taken from
+    # the LR(0) shifts and the LALR lookaheads, before conflicts are resolved.
+    # -----------------------------------------------------------------------------
+
+    def error_recovery_rules(self, C):
+        errstates = set()
+        for st, I in enumerate(C):
+            if 'error' in self.lr0_gotos[st] or \
+               any(p.len == p.lr_index + 1 and 'error' in p.lookaheads.get(st, ()) for p in I):
+                errstates.add(st)
+
+        nodefault = set()
+        for st, I in enumerate(C):
+            for p in I:
+                if p.lr_index == 0:
+                    if self.lr0_gotos[st].get(p.name) in errstates:
+                        nodefault.add(p.number)
+                elif p.lr_index < p.len - 1 and st in errstates:
+                    nodefault.add(p.number)
+        return nodefault
+
+    # -----------------------------------------------------------------------------
+    # default_reduction()
+    #
+    # Pick the default reduction for the actions of one state: the reduction that
+    # appears for the most lookaheads (the lowest numbered rule on a tie).  Rules
+    # in nodefault are not considered.  Returns 0 if the state has no such
+    # reductions or if it has an action for the error token, since error recovery
+    # needs to see the error in the state where it occurred.  A state with a
+    # single action gets no default either.  The parser already reduces there
+    # without a lookahead (see LRParser.set_defaulted_states()).
+    # -----------------------------------------------------------------------------
+
+    @staticmethod
+    def default_reduction(st_action, nodefault=()):
+        if 'error' in st_action or len(st_action) < 2:
+            return 0
+        counts = {}
+        for t in st_action.values():
+            if t is not None and t < 0 and -t not in nodefault:
+                counts[t] = counts.get(t, 0) + 1
+        if not counts:
+            return 0
+        return max(counts, key=lambda t: (counts[t], t))
+
+    # -----------------------------------------------------------------------------
+    # write_cache()
+    #
+    # This function writes the finished LR parsing tables to a cache file that can
+    # be read back by CachedLRTable.read_cache().  The file is tagged with the
+    # table format version, the PLY version, the grammar signature and the
+    # default_reductions flag so that stale tables are never reused.  The file is
+    # written to a temporary name first and then renamed so that concurrent
+    # processes never see a partially written cache.
+    # -----------------------------------------------------------------------------
+
+    def write_cache(self, filename, signature=''):
+        productions = []
+        for p in self.lr_productions:
+            if p.func:
+                productions.append((p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line))
+            else:
+                productions.append((str(p), p.name, p.len, None, None, None))
+
+        data = (__tabversion__, __version__, signature, self.default_reductions,
+                self.lr_action, self.lr_goto, self.lr_default, productions)
+
+        tmpname = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            with open(tmpname, 'wb') as outf:
+                pickle.dump(data, outf, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+# -----------------------------------------------------------------------------
+#                             == CachedLRTable ==
+#
+# This class holds LR parsing tables that were read back from a cache file
+# written by LRTable.write_cache().  It provides the same attributes that the
+# LRParser needs from an LRTable, but none of the table construction machinery.
+# -----------------------------------------------------------------------------
+
+class CachedLRTable:
+    def __init__(self):
+        self.default_reductions = None
+        self.lr_action = None
+        self.lr_goto = None
+        self.lr_default = None
+        self.lr_productions = None
+
+    # Read the cache file.  Returns the grammar signature the tables were built for.
+    # Raises VersionError if the cache was written by a different version of PLY.
+    def read_cache(self, filename):
+        with open(filename, 'rb') as inf:
+            data = pickle.load(inf)
+
+        tabversion, plyversion = data[:2]
+        if tabversion != __tabversion__ or plyversion != __version__:
+            raise VersionError('yacc table cache %r was written by a different version of PLY' % filename)
+
+        signature, default_reductions, action, goto, default, productions = data[2:]
+        self.default_reductions = default_reductions
+        self.lr_action = action
+        self.lr_goto = goto
+        self.lr_default = default
+        self.lr_productions = [MiniProduction(*p) for p in productions]
+        return signature
+
+    # Bind all production function names to callable objects in pdict
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
 # -----------------------------------------------------------------------------
 #                            === INTROSPECTION ===
 #
@@ -2013,14 +3319,16 @@ class ParserReflect(object):
         self.get_precedence()
         self.get_pfunctions()
 
-    # Validate all of the information
-    def validate_all(self):
+    # Validate all of the information.  Without diagnostics, only what is needed to
+    # build the grammar is done and the source files are not scanned.
+    def validate_all(self, diagnostics=True):
         self.validate_start()
         self.validate_error_func()
         self.validate_tokens()
         self.validate_precedence()
-        self.validate_pfunctions()
-        self.validate_modules()
+        self.validate_pfunctions(diagnostics)
+        if diagnostics:
+            self.validate_modules()
         return self.error
 
     # Compute a signature over the grammar
@@ -2202,7 +3510,7 @@ class ParserReflect(object):
         self.pfuncs = p_functions
 
     # Validate all of the p_functions
-    def validate_pfunctions(self):
+    def validate_pfunctions(self, diagnostics=True):
         grammar = []
         # Check for non-empty symbols
         if len(self.pfuncs) == 0:
@@ -2210,17 +3518,22 @@ class ParserReflect(object):
             self.error = True
             return
 
+        files = {}
         for line, module, name, doc in self.pfuncs:
-            file = inspect.getsourcefile(module)
+            if module not in files:
+                files[module] = inspect.getsourcefile(module)
+            file = files[module]
             func = self.pdict[name]
             if isinstance(func, types.MethodType):
                 reqargs = 2
             else:
                 reqargs = 1
-            if func.__code__.co_argcount > reqargs:
+            # Positional rules take one argument per symbol, so any count is fine
+            positional = getattr(func, 'positional', False)
+            if func.__code__.co_argcount > reqargs and not positional:
                 self.log.error('%s:%d: Rule %r has too many arguments', file, line, func.__name__)
                 self.error = True
-            elif func.__code__.co_argcount < reqargs:
+            elif func.__code__.co_argcount < reqargs and not positional:
                 self.log.error('%s:%d: Rule %r requires an argument', file, line, func.__name__)
                 self.error = True
             elif not func.__doc__:
@@ -2242,26 +3555,69 @@ class ParserReflect(object):
         # Secondary validation step that looks for p_ definitions that are not functions
         # or functions that look like they might be grammar rules.
 
-        for n, v in self.pdict.items():
-            if n.startswith('p_') and isinstance(v, (types.FunctionType, types.MethodType)):
-                continue
-            if n.startswith('t_'):
-                continue
-            if n.startswith('p_') and n != 'p_error':
-                self.log.warning('%r not defined as a function', n)
-            if ((isinstance(v, types.FunctionType) and v.__code__.co_argcount == 1) or
-                   (isinstance(v, types.MethodType) and v.__func__.__code__.co_argcount == 2)):
-                if v.__doc__:
-                    try:
-                        doc = v.__doc__.split(' ')
-                        if doc[1] == ':':
-                            self.log.warning('%s:%d: Possible grammar rule %r defined without p_ prefix',
-                                             v.__code__.co_filename, v.__code__.co_firstlineno, n)
-                    except IndexError:
-                        pass
+        if diagnostics:
+            for n, v in self.pdict.items():
+                if n.startswith('p_') and isinstance(v, (types.FunctionType, types.MethodType)):
+                    continue
+                if n.startswith('t_'):
+                    continue
+                if n.startswith('p_') and n != 'p_error':
+                    self.log.warning('%r not defined as a function', n)
+                if ((isinstance(v, types.FunctionType) and v.__code__.co_argcount == 1) or
+                       (isinstance(v, types.MethodType) and v.__func__.__code__.co_argcount == 2)):
+                    if v.__doc__:
+                        try:
+                            doc = v.__doc__.split(' ')
+                            if doc[1] == ':':
+                                self.log.warning('%s:%d: Possible grammar rule %r defined without p_ prefix',
+                                                 v.__code__.co_filename, v.__code__.co_firstlineno, n)
+                        except IndexError:
+                            pass
 
         self.grammar = grammar
 
+# -----------------------------------------------------------------------------
+#                              == BuildStats ==
+#
+# Time taken by each phase of yacc(), with counts of the objects the phase
+# produced.  Pass an instance as yacc(stats=...) and print it afterwards.
+# Phases are timed back to back: every mark() ends the phase that started at
+# the previous one.  phases holds (name, seconds, counts) tuples where counts
+# is a dict such as {'states': 71}.
+# -----------------------------------------------------------------------------
+
+class BuildStats:
+    def __init__(self):
+        self.phases = []
+        self.start()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def mark(self, name, **counts):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last, counts))
+        self.last = now
+
+    @property
+    def total(self):
+        return sum(seconds for name, seconds, counts in self.phases)
+
+    def format(self):
+        lines = ['%-20s %10s  %s' % ('phase', 'seconds', 'counts')]
+        for name, seconds, counts in self.phases:
+            lines.append('%-20s %10.4f  %s' % (name, seconds,
+                                               ' '.join('%s=%s' % item for item in counts.items())))
+        lines.append('%-20s %10.4f' % ('total', self.total))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.format()
+
+# Signatures (ParserReflect.signature()) of the grammars that passed all checks,
+# including the ones skipped with check_recursion=False
+_validated = set()
+
 # -----------------------------------------------------------------------------
 # yacc(module)
 #
@@ -2270,11 +3626,15 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, cachefile=None, default_reductions=False,
+         stats=None):
 
     # Reference to the parsing method of the last built parser
     global parse
 
+    if stats is not None:
+        stats.start()
+
     if errorlog is None:
         errorlog = PlyLogger(sys.stderr)
 
@@ -2299,10 +3659,43 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     # Collect parser information from the dictionary
     pinfo = ParserReflect(pdict, log=errorlog)
     pinfo.get_all()
+    if stats is not None:
+        stats.mark('get_all', rules=len(pinfo.pfuncs), tokens=len(pinfo.tokens or ()))
 
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # Check the signature against the table cache (if any)
+    signature = pinfo.signature()
+    cached = None
+    if stats is not None:
+        stats.mark('signature')
+
+    if cachefile:
+        try:
+            lr = CachedLRTable()
+            try:
+                cached = lr.read_cache(cachefile)
+            finally:
+                if stats is not None:
+                    stats.mark('read_cache')
+            if cached == signature and lr.default_reductions == default_reductions:
+                try:
+                    lr.bind_callables(pinfo.pdict)
+                    parser = LRParser(lr, pinfo.error_func)
+                    if stats is not None:
+                        stats.mark('LRParser', states=parser.tables.nstates)
+                    parse = parser.parse
+                    return parser
+                except Exception as e:
+                    errorlog.warning('There was a problem loading the table cache: %r', e)
+        except VersionError as e:
+            errorlog.warning(str(e))
+        except Exception:
+            # A missing, truncated or otherwise unreadable cache (unpickling can fail
+            # in many ways) is ignored.  The tables are rebuilt and the cache rewritten.
+            cached = None
+
     if debuglog is None:
         if debug:
             try:
@@ -2317,9 +3710,17 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
 
     errors = False
 
+    # With optimize, a grammar that was checked before (by an earlier call in this
+    # process, or when the table cache was written) is not checked again.  Only the
+    # rules themselves are read, the source files are not scanned and none of the
+    # grammar diagnostics are run.
+    validated = optimize and not debug and (signature in _validated or signature == cached)
+
     # Validate the parser information
-    if pinfo.validate_all():
+    if pinfo.validate_all(diagnostics=not validated):
         raise YaccError('Unable to build parser')
+    if stats is not None:
+        stats.mark('validate_all')
 
     if not pinfo.error_func:
         errorlog.warning('no p_error() function is defined')
@@ -2356,82 +3757,96 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if errors:
         raise YaccError('Unable to build parser')
 
-    # Verify the grammar structure
-    undefined_symbols = grammar.undefined_symbols()
-    for sym, prod in undefined_symbols:
-        errorlog.error('%s:%d: Symbol %r used, but not defined as a token or a rule', prod.file, prod.line, sym)
-        errors = True
-
-    unused_terminals = grammar.unused_terminals()
-    if unused_terminals:
-        debuglog.info('')
-        debuglog.info('Unused terminals:')
-        debuglog.info('')
-        for term in unused_terminals:
-            errorlog.warning('Token %r defined, but not used', term)
-            debuglog.info('    %s', term)
+    if stats is not None:
+        stats.mark('grammar', productions=len(grammar.Productions), terminals=len(grammar.Terminals),
+                   nonterminals=len(grammar.Nonterminals))
 
-    # Print out all productions to the debug log
-    if debug:
-        debuglog.info('')
-        debuglog.info('Grammar')
-        debuglog.info('')
-        for n, p in enumerate(grammar.Productions):
-            debuglog.info('Rule %-5d %s', n, p)
-
-    # Find unused non-terminals
-    unused_rules = grammar.unused_rules()
-    for prod in unused_rules:
-        errorlog.warning('%s:%d: Rule %r defined, but not used', prod.file, prod.line, prod.name)
-
-    if len(unused_terminals) == 1:
-        errorlog.warning('There is 1 unused token')
-    if len(unused_terminals) > 1:
-        errorlog.warning('There are %d unused tokens', len(unused_terminals))
-
-    if len(unused_rules) == 1:
-        errorlog.warning('There is 1 unused rule')
-    if len(unused_rules) > 1:
-        errorlog.warning('There are %d unused rules', len(unused_rules))
+    # Check the grammar.  Skipped for a grammar that was checked before
+    if not validated:
+        # Verify the grammar structure
+        undefined_symbols = grammar.undefined_symbols()
+        for sym, prod in undefined_symbols:
+            errorlog.error('%s:%d: Symbol %r used, but not defined as a token or a rule', prod.file, prod.line, sym)
+            errors = True
 
-    if debug:
-        debuglog.info('')
-        debuglog.info('Terminals, with rules where they appear')
-        debuglog.info('')
-        terms = list(grammar.Terminals)
-        terms.sort()
-        for term in terms:
-            debuglog.info('%-20s : %s', term, ' '.join([str(s) for s in grammar.Terminals[term]]))
-
-        debuglog.info('')
-        debuglog.info('Nonterminals, with rules where they appear')
-        debuglog.info('')
-        nonterms = list(grammar.Nonterminals)
-        nonterms.sort()
-        for nonterm in nonterms:
-            debuglog.info('%-20s : %s', nonterm, ' '.join([str(s) for s in grammar.Nonterminals[nonterm]]))
-        debuglog.info('')
+        unused_terminals = grammar.unused_terminals()
+        if unused_terminals:
+            debuglog.info('')
+            debuglog.info('Unused terminals:')
+            debuglog.info('')
+            for term in unused_terminals:
+                errorlog.warning('Token %r defined, but not used', term)
+                debuglog.info('    %s', term)
 
-    if check_recursion:
-        unreachable = grammar.find_unreachable()
-        for u in unreachable:
-            errorlog.warning('Symbol %r is unreachable', u)
+        # Print out all productions to the debug log
+        if debug:
+            debuglog.info('')
+            debuglog.info('Grammar')
+            debuglog.info('')
+            for n, p in enumerate(grammar.Productions):
+                debuglog.info('Rule %-5d %s', n, p)
+
+        # Find unused non-terminals
+        unused_rules = grammar.unused_rules()
+        for prod in unused_rules:
+            errorlog.warning('%s:%d: Rule %r defined, but not used', prod.file, prod.line, prod.name)
+
+        if len(unused_terminals) == 1:
+            errorlog.warning('There is 1 unused token')
+        if len(unused_terminals) > 1:
+            errorlog.warning('There are %d unused tokens', len(unused_terminals))
+
+        if len(unused_rules) == 1:
+            errorlog.warning('There is 1 unused rule')
+        if len(unused_rules) > 1:
+            errorlog.warning('There are %d unused rules', len(unused_rules))
 
-        infinite = grammar.infinite_cycles()
-        for inf in infinite:
-            errorlog.error('Infinite recursion detected for symbol %r', inf)
+        if debug:
+            debuglog.info('')
+            debuglog.info('Terminals, with rules where they appear')
+            debuglog.info('')
+            terms = list(grammar.Terminals)
+            terms.sort()
+            for term in terms:
+                debuglog.info('%-20s : %s', term, ' '.join([str(s) for s in grammar.Terminals[term]]))
+
+            debuglog.info('')
+            debuglog.info('Nonterminals, with rules where they appear')
+            debuglog.info('')
+            nonterms = list(grammar.Nonterminals)
+            nonterms.sort()
+            for nonterm in nonterms:
+                debuglog.info('%-20s : %s', nonterm, ' '.join([str(s) for s in grammar.Nonterminals[nonterm]]))
+            debuglog.info('')
+
+        if stats is not None:
+            stats.mark('diagnostics')
+
+        if check_recursion:
+            unreachable = grammar.find_unreachable()
+            for u in unreachable:
+                errorlog.warning('Symbol %r is unreachable', u)
+
+            infinite = grammar.infinite_cycles()
+            for inf in infinite:
+                errorlog.error('Infinite recursion detected for symbol %r', inf)
+                errors = True
+
+            if stats is not None:
+                stats.mark('infinite_cycles')
+
+        unused_prec = grammar.unused_precedence()
+        for term, assoc in unused_prec:
+            errorlog.error('Precedence rule %r defined for unknown symbol %r', assoc, term)
             errors = True
 
-    unused_prec = grammar.unused_precedence()
-    for term, assoc in unused_prec:
-        errorlog.error('Precedence rule %r defined for unknown symbol %r', assoc, term)
-        errors = True
-
     if errors:
         raise YaccError('Unable to build parser')
+    if check_recursion:
+        _validated.add(signature)
 
     # Run the LRTable on the grammar
-    lr = LRTable(grammar, debuglog)
+    lr = LRTable(grammar, debuglog, default_reductions, stats)
 
     if debug:
         num_sr = len(lr.sr_conflicts)
@@ -2474,9 +3889,200 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Write the table cache
+    if cachefile:
+        try:
+            lr.write_cache(cachefile, signature)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s" % (cachefile, e))
+        if stats is not None:
+            stats.mark('write_cache')
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
+    if stats is not None:
+        stats.mark('LRParser', states=parser.tables.nstates)
 
     parse = parser.parse
     return parser
+
+# -----------------------------------------------------------------------------
+#                        === Parsing Many Files ===
+#
+# parse_files() parses a list of files, spreading them over a process pool.
+# Every worker loads a pickled copy of the parser and the lexer once (see
+# LRParser.__reduce__()).  The results come back in the order of the files,
+# each one as soon as it and all of the files before it are done.
+#
+# A FileResult records the following:
+#
+#    filename      -  Name of the file
+#    size          -  Number of characters in the file
+#    seconds       -  Time taken by lexing and parsing
+#    errors        -  (lineno, type, value) of the token of every syntax error
+#                     (None for an error at the end of the input)
+#    exception     -  Type and message of the exception that ended the parse (if any)
+#    result        -  Value returned by the parse (only kept on request)
+# -----------------------------------------------------------------------------
+
+class FileResult(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.size = 0
+        self.seconds = 0.0
+        self.errors = []
+        self.exception = None
+        self.result = None
+
+    @property
+    def ok(self):
+        return not self.errors and self.exception is None
+
+    def __repr__(self):
+        return 'FileResult(%r, errors=%d, exception=%r)' % (self.filename, len(self.errors), self.exception)
+
+# Return the files in paths.  Directories are searched recursively for files whose
+# name matches pattern, in sorted order, leaving out hidden directories and
+# __pycache__.  Other paths are taken as they are.
+def find_files(paths, pattern='*'):
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(name for name in dirnames
+                                 if not name.startswith('.') and name != '__pycache__')
+            files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                         if fnmatch.fnmatch(name, pattern))
+    return files
+
+# Parse one file with parser and a fresh clone of lexer.  The syntax errors are
+# collected by the ParseContext of the parse, so the parser itself is not changed
+def _parse_file(parser, lexer, filename, tracking, results, encoding):
+    fr = FileResult(filename)
+    errors = []
+    try:
+        with open(filename, encoding=encoding) as f:
+            data = f.read()
+        fr.size = len(data)
+        lexobj = lexer.clone()
+        lexobj.lineno = 1
+        start = time.perf_counter()
+        try:
+            result = parser.parse(data, lexer=lexobj, tracking=tracking, errors=errors)
+        finally:
+            fr.seconds = time.perf_counter() - start
+        if results:
+            fr.result = result
+    except Exception as e:
+        message = str(e).strip().split('\n')[0]
+        fr.exception = '%s: %s' % (type(e).__name__, message) if message else type(e).__name__
+    fr.errors = [tok and (getattr(tok, 'lineno', 0), tok.type, tok.value) for tok in errors]
+    return fr
+
+# Parser and lexer of a pool worker (set by _init_worker())
+_worker = None
+
+def _init_worker(parser, lexer, tracking, results, encoding):
+    global _worker
+    _worker = (parser, lexer, tracking, results, encoding)
+
+def _parse_worker(filename):
+    parser, lexer, tracking, results, encoding = _worker
+    return _parse_file(parser, lexer, filename, tracking, results, encoding)
+
+# -----------------------------------------------------------------------------
+# parse_files()
+#
+# Generator that parses every file in filenames and yields a FileResult for
+# each one, in order.  workers is the number of worker processes (by default,
+# the number of CPUs).  With workers=1, the files are parsed in this process.
+# The lexer defaults to the last one built by lex().  Set results to send the
+# values returned by the parses back as well.
+# -----------------------------------------------------------------------------
+
+def parse_files(parser, filenames, lexer=None, workers=None, tracking=False, results=False,
+                encoding='utf-8', chunksize=1):
+    if lexer is None:
+        from . import lex
+        lexer = lex.lexer
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for filename in filenames:
+            yield _parse_file(parser, lexer, filename, tracking, results, encoding)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(parser, lexer, tracking, results, encoding)) as executor:
+        yield from executor.map(_parse_worker, filenames, chunksize=chunksize)
+
+# -----------------------------------------------------------------------------
+# runmain()
+#
+# Command line driver for parse_files().  Call it from the module that defines
+# the grammar with the parser and lexer to use (by default, the last parser built
+# by yacc() and the last lexer built by lex()):
+#
+#     python calc.py [-j workers] [--pattern glob] [--quiet] path ...
+#
+# Every path is a file or a directory to search.  A line with the time taken
+# and the errors is written for every file, followed by a summary.  Returns the
+# number of files that had errors.
+# -----------------------------------------------------------------------------
+
+def runmain(parser=None, lexer=None, argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description='Parse every file given or found in the directories given.')
+    ap.add_argument('paths', nargs='+', help='files and directories to parse')
+    ap.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    ap.add_argument('--pattern', default='*', help='names of the files to parse in directories')
+    ap.add_argument('--tracking', action='store_true', help='parse with position tracking')
+    ap.add_argument('-q', '--quiet', action='store_true', help='only report files with errors')
+    args = ap.parse_args(argv)
+
+    if parser is None:
+        try:
+            parser = parse.__self__
+        except NameError:
+            raise YaccError('runmain() needs a parser. Call yacc() first or pass one') from None
+    filenames = find_files(args.paths, args.pattern)
+    width = max([len(name) for name in filenames] + [8])
+
+    start = time.perf_counter()
+    nfailed = nerrors = size = 0
+    seconds = 0.0
+    slowest = None
+    for fr in parse_files(parser, filenames, lexer, args.workers, args.tracking):
+        seconds += fr.seconds
+        size += fr.size
+        if slowest is None or fr.seconds > slowest.seconds:
+            slowest = fr
+        if fr.ok:
+            if not args.quiet:
+                sys.stdout.write('%-*s %10.2f ms  ok\n' % (width, fr.filename, fr.seconds * 1000))
+            continue
+        nfailed += 1
+        nerrors += len(fr.errors)
+        if fr.exception:
+            status = 'exception %s' % fr.exception
+        else:
+            status = '%d syntax error%s' % (len(fr.errors), '' if len(fr.errors) == 1 else 's')
+        sys.stdout.write('%-*s %10.2f ms  %s\n' % (width, fr.filename, fr.seconds * 1000, status))
+        for err in fr.errors:
+            if err is None:
+                sys.stdout.write('    unexpected end of input\n')
+            else:
+                sys.stdout.write('    line %d: unexpected %s %r\n' % err)
+    elapsed = time.perf_counter() - start
+
+    sys.stdout.write('%d files, %d ok, %d with errors (%d syntax errors)\n' %
+                     (len(filenames), len(filenames) - nfailed, nfailed, nerrors))
+    sys.stdout.write('%d characters, %.3f s parsing, %.3f s elapsed\n' % (size, seconds, elapsed))
+    if slowest is not None:
+        sys.stdout.write('slowest: %s (%.2f ms)\n' % (slowest.filename, slowest.seconds * 1000))
+    return nfailed
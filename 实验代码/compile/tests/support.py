@@ -0,0 +1,24 @@
+# -----------------------------------------------------------------------------
+# support.py
+#
+# Shared setup of the tests.  Importing this module puts the package and the
+# benchmarks directory (for toylang) on sys.path, so it must be imported before
+# ply or toylang.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [os.path.dirname(here), os.path.join(os.path.dirname(here), 'benchmarks')]
+
+# Inputs of the toy language in this directory
+INPUTS = ['assign', 'begin_end', 'if_else', 'if_then', 'while']
+
+def read_input(name):
+    with open(os.path.join(here, name)) as f:
+        return f.read()
+
+# The tokens of a lexer (or any iterable of tokens) as comparable tuples
+def tokens(lexer):
+    return [(t.type, t.value, t.lineno, t.lexpos) for t in lexer]
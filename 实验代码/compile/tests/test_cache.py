@@ -0,0 +1,84 @@
+# -----------------------------------------------------------------------------
+# test_cache.py
+#
+# Tests of the on-disk table cache of yacc()
+# -----------------------------------------------------------------------------
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from support import read_input
+import toylang
+from ply import yacc
+
+class YaccCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachefile = os.path.join(self.tmpdir, 'toylang.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assertSameParser(self, parser, expected):
+        self.assertEqual(parser.action, expected.action)
+        self.assertEqual(parser.goto, expected.goto)
+        for name in ['begin_end', 'if_else', 'while']:
+            data = read_input(name)
+            self.assertEqual(parser.parse(data, lexer=toylang.lex.lex(module=toylang)),
+                             expected.parse(data, lexer=toylang.lex.lex(module=toylang)))
+
+    def test_read_cache(self):
+        lexer, expected = toylang.build()
+        toylang.build(cachefile=self.cachefile)
+        self.assertTrue(os.path.exists(self.cachefile))
+        lexer, parser = toylang.build(cachefile=self.cachefile)
+        self.assertIsInstance(parser.productions[1], yacc.MiniProduction)
+        self.assertSameParser(parser, expected)
+
+    def test_default_reductions(self):
+        # Tables cached with the other setting of default_reductions are rebuilt
+        for flag in [True, False, True]:
+            lexer, expected = toylang.build(default_reductions=flag)
+            lexer, parser = toylang.build(cachefile=self.cachefile, default_reductions=flag)
+            self.assertSameParser(parser, expected)
+            lr = yacc.CachedLRTable()
+            lr.read_cache(self.cachefile)
+            self.assertEqual(lr.default_reductions, flag)
+            lexer, parser = toylang.build(cachefile=self.cachefile, default_reductions=flag)
+            self.assertIsInstance(parser.productions[1], yacc.MiniProduction)
+
+    def test_stats(self):
+        # A miss builds the tables and writes them, a hit only reads them
+        names = {}
+        for case in ['miss', 'hit']:
+            stats = yacc.BuildStats()
+            toylang.build(cachefile=self.cachefile, stats=stats)
+            names[case] = [name for name, seconds, counts in stats.phases]
+            self.assertEqual(stats.phases[-1][2], {'states': 71})
+        self.assertEqual(names['hit'], ['get_all', 'signature', 'read_cache', 'LRParser'])
+        self.assertEqual(names['miss'][:3], ['get_all', 'signature', 'read_cache'])
+        self.assertEqual(names['miss'][-4:], ['add_lalr_lookaheads', 'lr_parse_table', 'write_cache', 'LRParser'])
+        self.assertEqual(len(set(names['miss'])), len(names['miss']))
+
+    def test_bad_cache_is_rebuilt(self):
+        lexer, expected = toylang.build(cachefile=self.cachefile)
+        with open(self.cachefile, 'rb') as f:
+            good = f.read()
+        bad = [good[:len(good) // 2],                                   # Truncated
+               b'',                                                     # Empty
+               pickle.dumps(42),                                        # Not a tuple
+               pickle.dumps((yacc.__tabversion__, yacc.__version__)),   # Too short
+               b'cno_such_module_for_ply\nTables\n.']                   # Unimportable
+        for data in bad:
+            with open(self.cachefile, 'wb') as f:
+                f.write(data)
+            lexer, parser = toylang.build(cachefile=self.cachefile)
+            self.assertSameParser(parser, expected)
+            with open(self.cachefile, 'rb') as f:
+                self.assertEqual(f.read(), good)
+
+if __name__ == '__main__':
+    unittest.main()
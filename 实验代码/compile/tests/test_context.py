@@ -0,0 +1,118 @@
+# -----------------------------------------------------------------------------
+# test_context.py
+#
+# Tests of the ParseContext of a parse.  Parses of one parser that run at the
+# same time in different threads, or nested in a grammar rule, must each see
+# their own stacks through parser.symstack and parser.statestack.
+# -----------------------------------------------------------------------------
+
+import threading
+import unittest
+
+import support
+from ply import lex, yacc
+
+# Called by p_stmt() with p (set by the tests)
+hook = None
+
+class StmtGrammar:
+    tokens = ['NUMBER', 'SEMI']
+
+    t_SEMI   = r';'
+    t_ignore = ' '
+
+    def t_NUMBER(t):
+        r'\d+'
+        t.value = int(t.value)
+        return t
+
+    def t_error(t):
+        t.lexer.skip(1)
+
+    def p_stmts(p):
+        '''stmts : stmts stmt
+                 | stmt'''
+        p[0] = p[1] + [p[2]] if len(p) == 3 else [p[1]]
+
+    def p_stmt(p):
+        'stmt : NUMBER SEMI'
+        p[0] = p[1]
+        if hook:
+            hook(p)
+
+    def p_error(t):
+        pass
+
+class ParseContextTests(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=StmtGrammar)
+        self.parser = yacc.yacc(module=StmtGrammar, debug=False, errorlog=yacc.NullLogger())
+
+    def tearDown(self):
+        global hook
+        hook = None
+
+    # The values below the statement being reduced
+    def stack(self):
+        return [sym.value for sym in self.parser.symstack[1:]]
+
+    def test_threads(self):
+        global hook
+        inputs = {'a': '1; 2; 3; 4;', 'b': '10; 20; 30; 40;'}
+        seen = {name: [] for name in inputs}
+        results = {}
+
+        # Every statement waits for the one of the other thread, so that the
+        # two parses run at the same time
+        barrier = threading.Barrier(2, timeout=10)
+
+        def record(p):
+            barrier.wait()
+            seen[threading.current_thread().name].append((p[1], self.stack()))
+            barrier.wait()
+
+        def run(name):
+            results[name] = self.parser.parse(inputs[name], lexer=self.lexer.clone())
+
+        hook = record
+        threads = [threading.Thread(target=run, args=(name,), name=name) for name in inputs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {'a': [1, 2, 3, 4], 'b': [10, 20, 30, 40]})
+        self.assertEqual(seen['a'], [(1, []), (2, [[1]]), (3, [[1, 2]]), (4, [[1, 2, 3]])])
+        self.assertEqual(seen['b'], [(10, []), (20, [[10]]), (30, [[10, 20]]), (40, [[10, 20, 30]])])
+
+    def test_nested(self):
+        global hook
+        seen = []
+
+        def record(p):
+            seen.append((p[1], self.stack()))
+            if p[1] == 2:
+                self.assertEqual(self.parser.parse('7; 8;', lexer=self.lexer.clone()), [7, 8])
+                seen.append((p[1], self.stack()))
+
+        hook = record
+        self.assertEqual(self.parser.parse('1; 2; 3;', lexer=self.lexer.clone()), [1, 2, 3])
+        self.assertEqual(seen, [(1, []), (2, [[1]]), (7, []), (8, [[7]]), (2, [[1]]), (3, [[1, 2]])])
+
+    def test_after_parse(self):
+        # The stacks of the last parse stay, like they did as attributes of the parser
+        self.assertRaises(AttributeError, getattr, self.parser, 'statestack')
+        self.parser.parse('1; 2;', lexer=self.lexer.clone())
+        self.assertEqual([sym.type for sym in self.parser.symstack], ['$end', 'stmts'])
+        self.assertEqual(self.stack(), [[1, 2]])
+        self.assertEqual(len(self.parser.statestack), 2)
+        push = self.parser.push(lexer=self.lexer.clone())
+        tokens = self.lexer.clone()
+        tokens.input('3;')
+        push.feed_all(tokens)
+        self.assertEqual(self.stack(), [[1, 2]])
+        push.close()
+        self.assertEqual(self.stack(), [[3]])
+
+if __name__ == '__main__':
+    unittest.main()
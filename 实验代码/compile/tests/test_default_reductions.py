@@ -0,0 +1,136 @@
+# -----------------------------------------------------------------------------
+# test_default_reductions.py
+#
+# Tests of yacc(default_reductions=True).  Every input, valid or not, must parse
+# to the same result with and without default reductions.
+# -----------------------------------------------------------------------------
+
+import unittest
+
+from support import INPUTS, read_input
+import toylang
+from ply import lex, yacc
+
+# Statements with an error production next to empty rules
+class ErrorGrammar:
+    tokens = ['LPAREN', 'RPAREN', 'SEMI', 'ID']
+
+    t_LPAREN = r'\('
+    t_RPAREN = r'\)'
+    t_SEMI   = r';'
+    t_ID     = r'[a-z]+'
+    t_ignore = ' '
+
+    def t_error(t):
+        t.lexer.skip(1)
+
+    def p_prog(p):
+        'prog : stmts'
+        p[0] = ('prog', p[1])
+
+    def p_stmts(p):
+        '''stmts : stmts stmt
+                 | '''
+        p[0] = p[1] + (p[2],) if len(p) == 3 else ()
+
+    def p_stmt(p):
+        'stmt : atom SEMI'
+        p[0] = p[1]
+
+    def p_stmt_error(p):
+        'stmt : error SEMI'
+        p[0] = ('err',)
+
+    def p_atom(p):
+        '''atom : LPAREN opt RPAREN
+                | ID'''
+        p[0] = ('atom',) + tuple(p[1:])
+
+    def p_opt(p):
+        '''opt :
+               | ID'''
+        p[0] = p[1] if len(p) == 2 else None
+
+    def p_error(t):
+        pass
+
+# A grammar on which a default reduction in the state entered by shifting the
+# error token used to make error recovery start over forever
+class RecoveryLoopGrammar:
+    tokens = ['T0', 'T1', 'T2', 'T3', 'T4']
+
+    t_T0 = '0'
+    t_T1 = '1'
+    t_T2 = '2'
+    t_T3 = '3'
+    t_T4 = '4'
+
+    precedence = (
+        ('left', 'T0', 'T1'),
+        ('right', 'T2'),
+        ('nonassoc', 'T3'),
+    )
+
+    def p_n0(p):
+        '''n0 :
+              | n2 n1 T4
+              | n1 error n1'''
+
+    def p_n1(p):
+        '''n1 : n0 T0 T1
+              | T1 n2 n3 T0'''
+
+    def p_n2(p):
+        'n2 : n1'
+
+    def p_n3(p):
+        '''n3 : T2 T1 T4
+              | T1
+              | T4 n2
+              | T0'''
+
+    p_error = ErrorGrammar.p_error
+
+def build(module, **kwargs):
+    return yacc.yacc(module=module, debug=False, errorlog=yacc.NullLogger(), **kwargs)
+
+class DefaultReductionTests(unittest.TestCase):
+    def assertSameParse(self, lexer, expected, parser, data):
+        for kwargs in [{}, {'tracking': True}, {'debug': yacc.NullLogger()}]:
+            self.assertEqual(parser.parse(data, lexer=lexer.clone(), **kwargs),
+                             expected.parse(data, lexer=lexer.clone(), **kwargs), (data, kwargs))
+
+    def test_error_recovery(self):
+        lexer = lex.lex(module=ErrorGrammar)
+        expected = build(ErrorGrammar)
+        parser = build(ErrorGrammar, default_reductions=True)
+        self.assertEqual(parser.parse('( ;', lexer=lexer.clone()), ('prog', (('err',),)))
+        self.assertEqual(parser.parse(')', lexer=lexer.clone()), ('prog', ()))
+        for data in ['', 'x ;', '( ) ;', '( x ) ;', '( ;', ')', '( ( ;', ') ; x ;', 'x ( ;',
+                     '( x ; y ;', '; ;', 'x x ;', '( ) ) ;', 'x ; ( x', '(']:
+            self.assertSameParse(lexer, expected, parser, data)
+
+    def test_recovery_loop(self):
+        lexer = lex.lex(module=RecoveryLoopGrammar, errorlog=yacc.NullLogger())
+        expected = build(RecoveryLoopGrammar)
+        parser = build(RecoveryLoopGrammar, default_reductions=True)
+        for data in ['01110100002', '011002', '101224', '01011130']:
+            self.assertSameParse(lexer, expected, parser, data)
+            push = parser.push(lexer=lexer.clone())
+            tokens = lexer.clone()
+            tokens.input(data)
+            push.feed_all(tokens)
+            self.assertEqual(push.close(), expected.parse(data, lexer=lexer.clone()))
+
+    def test_toylang(self):
+        lexer, expected = toylang.build()
+        lexer, parser = toylang.build(default_reductions=True)
+        self.assertTrue(any(parser.tables.defaulted))
+        self.assertLess(sum(map(len, parser.action.values())), sum(map(len, expected.action.values())))
+        for name in INPUTS:
+            self.assertSameParse(lexer, expected, parser, read_input(name))
+        for data in ['x = ;', 'begin x = 1', 'if then x = 1', 'x = (1 + ;', ')', 'end end']:
+            self.assertSameParse(lexer, expected, parser, data)
+
+if __name__ == '__main__':
+    unittest.main()
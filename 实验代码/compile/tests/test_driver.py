@@ -0,0 +1,93 @@
+# -----------------------------------------------------------------------------
+# test_driver.py
+#
+# Tests of yacc.parse_files().  Every file must give the same result and the
+# same syntax errors as a plain parse() of it.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import here, INPUTS
+import toylang
+from ply import yacc
+
+class ParseFilesTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filenames = [os.path.join(here, name) for name in INPUTS]
+        for i, data in enumerate(['x = ;\ny = 1;\n', 'begin x = 1', ')']):
+            filename = os.path.join(self.tmpdir, 'bad%d' % i)
+            with open(filename, 'w') as f:
+                f.write(data)
+            self.filenames.insert(2 * i, filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    # Parse a file with parse(), recording the tokens passed to p_error()
+    def expected(self, lexer, parser, filename):
+        errors = []
+        errorfunc = parser.errorfunc
+
+        def record_error(tok):
+            errors.append(tok and (tok.lineno, tok.type, tok.value))
+            return errorfunc(tok)
+
+        with open(filename) as f:
+            data = f.read()
+        parser.errorfunc = record_error
+        try:
+            result = parser.parse(data, lexer=lexer.clone())
+        finally:
+            parser.errorfunc = errorfunc
+        return result, errors
+
+    def test_parse_files(self):
+        lexer, parser = toylang.build()
+        errorfunc = parser.errorfunc
+        for workers in [1, 2]:
+            results = list(yacc.parse_files(parser, self.filenames, lexer=lexer, workers=workers,
+                                            results=True))
+            self.assertIs(parser.errorfunc, errorfunc)
+            self.assertEqual([fr.filename for fr in results], self.filenames)
+            for fr in results:
+                self.assertIsNone(fr.exception)
+                self.assertEqual((fr.result, fr.errors), self.expected(lexer, parser, fr.filename))
+            self.assertEqual([fr.ok for fr in results].count(False), 3)
+
+    def test_exception(self):
+        lexer, parser = toylang.build()
+        missing = os.path.join(self.tmpdir, 'missing')
+        fr, = yacc.parse_files(parser, [missing], lexer=lexer, workers=1)
+        self.assertFalse(fr.ok)
+        self.assertTrue(fr.exception.startswith('FileNotFoundError: '), fr.exception)
+
+    def test_find_files(self):
+        os.mkdir(os.path.join(self.tmpdir, '__pycache__'))
+        os.mkdir(os.path.join(self.tmpdir, 'sub'))
+        for name in [('__pycache__', 'bad0.pyc'), ('sub', 'good'), ('sub', 'test.py')]:
+            open(os.path.join(self.tmpdir, *name), 'w').close()
+        self.assertEqual(yacc.find_files([self.tmpdir], '*[!y]'),
+                         [os.path.join(self.tmpdir, *name) for name in [('bad0',), ('bad1',), ('bad2',), ('sub', 'good')]])
+
+    def test_runmain_without_parser(self):
+        parse = yacc.__dict__.pop('parse', None)
+        try:
+            self.assertRaises(yacc.YaccError, yacc.runmain, argv=[self.tmpdir])
+        finally:
+            if parse is not None:
+                yacc.parse = parse
+
+    def test_errors_argument(self):
+        lexer, parser = toylang.build()
+        for kwargs in [{}, {'tracking': True}, {'debug': yacc.NullLogger()},
+                       {'profile': yacc.ParseProfile(parser)}]:
+            errors = []
+            parser.parse('x = ; y = 1; y = (', lexer=lexer.clone(), errors=errors, **kwargs)
+            self.assertEqual([tok and (tok.type, tok.lexpos) for tok in errors], [('SEMI', 4), None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -----------------------------------------------------------------------------
+# test_freeze.py
+#
+# Tests of LRParser.freeze().  A frozen parser must give the same results as
+# the parser it was made from, and must not keep that parser alive.
+# -----------------------------------------------------------------------------
+
+import gc
+import unittest
+import weakref
+
+from support import INPUTS, read_input
+import toylang
+from ply import yacc
+
+class FreezeTests(unittest.TestCase):
+    def setUp(self):
+        self.cases = [read_input(name) for name in INPUTS] + [toylang.generate(20)]
+        self.cases += ['x = ;', 'begin x = 1', ')', 'x = 1; ) y = 2;']
+
+    def test_same_result(self):
+        for build in [{}, {'default_reductions': True}]:
+            lexer, parser = toylang.build(**build)
+            frozen = parser.freeze()
+            for data in self.cases:
+                for kwargs in [{}, {'tracking': True}, {'debug': yacc.NullLogger()}]:
+                    errors, expected = [], []
+                    self.assertEqual(frozen.parse(data, lexer=lexer.clone(), errors=errors, **kwargs),
+                                     parser.parse(data, lexer=lexer.clone(), errors=expected, **kwargs))
+                    self.assertEqual([tok and tok.lexpos for tok in errors],
+                                     [tok and tok.lexpos for tok in expected])
+
+                # Push and incremental parsing work with the frozen tables too
+                push = frozen.push(lexer=lexer.clone())
+                tokens = lexer.clone()
+                tokens.input(data)
+                push.feed_all(tokens)
+                inc = frozen.incremental(lexer.clone(), exclude=['stmts'])
+                expected = parser.parse(data, lexer=lexer.clone())
+                self.assertEqual(push.close(), expected)
+                self.assertEqual(inc.parse(data), expected)
+
+    def test_releases_parser(self):
+        lexer, parser = toylang.build()
+        refs = [weakref.ref(parser), weakref.ref(parser.productions[1])]
+        frozen = parser.freeze()
+        self.assertIsInstance(frozen.productions[1], yacc.MiniProduction)
+        self.assertIsNone(frozen.action)
+
+        # The module level parse() still refers to the last parser built by yacc()
+        self.assertEqual(yacc.parse, parser.parse)
+        toylang.build()
+        del parser
+        gc.collect()
+        self.assertEqual([ref() for ref in refs], [None, None])
+        self.assertEqual(frozen.parse('x = 1;', lexer=lexer.clone()), ('program', [('assign', 'x', 1)]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# -----------------------------------------------------------------------------
+# test_incremental.py
+#
+# Tests of incremental().  After every edit, the result must be the same as a
+# plain parse() of the edited text.
+# -----------------------------------------------------------------------------
+
+import random
+import unittest
+
+import support
+import toylang
+
+# Pieces of text inserted by the random edits.  Some of them make the input invalid
+PIECES = ['x', '1', '.5', '0x', ' ', '\n', '=', '+ 2', ';', 'y = 3;\n', 'begin ', 'end;\n',
+          'if x then ', 'else ', '(', ')', '$']
+
+class IncrementalTests(unittest.TestCase):
+    def setUp(self):
+        self.lexer, self.parser = toylang.build()
+
+    def expected(self, data, tracking):
+        return self.parser.parse(data, lexer=self.lexer.clone(), tracking=tracking)
+
+    def check_edits(self, data, edits, tracking):
+        inc = self.parser.incremental(self.lexer.clone(), tracking=tracking, exclude=['stmts'])
+        self.assertEqual(inc.parse(data), self.expected(data, tracking))
+        for offset, deleted, inserted in edits:
+            data = data[:offset] + inserted + data[offset+deleted:]
+            self.assertEqual(inc.edit(offset, deleted, inserted), self.expected(data, tracking),
+                             (offset, deleted, inserted))
+        return inc
+
+    def test_edits(self):
+        data = toylang.generate(10)
+        middle = data.index('= ', len(data) // 2) + 2
+        edits = [(middle, 0, '7 + '), (data.index('= ') + 2, 0, '(1) * '), (len(data), 0, 'x = 1;\n'),
+                 (middle - 4, 0, 'begin y = 2; end\n'), (0, 0, ')'), (0, 1, '')]
+        for tracking in [False, True]:
+            self.check_edits(data, edits, tracking)
+
+            # Most of the program is reused after a small edit
+            inc = self.check_edits(data, edits[:1], tracking)
+            self.assertGreater(inc.reused, len(inc.tokens) // 2)
+
+    def test_random_edits(self):
+        # Every edit is undone again, so that errors come and go
+        rnd = random.Random(1)
+        data = toylang.generate(8)
+        edits = []
+        for _ in range(60):
+            offset = rnd.randint(0, len(data))
+            deleted = min(rnd.choice([0, 0, 1, 3]), len(data) - offset)
+            inserted = ''.join(rnd.choice(PIECES) for _ in range(rnd.choice([0, 1, 2])))
+            edits += [(offset, deleted, inserted), (offset, len(inserted), data[offset:offset+deleted])]
+        for tracking in [False, True]:
+            self.check_edits(data, edits, tracking)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+# -----------------------------------------------------------------------------
+# test_lexer.py
+#
+# Tests of the lexer variants.  Every variant must produce the same tokens as
+# Lexer.token() on a string.
+# -----------------------------------------------------------------------------
+
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+
+from support import read_input, tokens
+import toylang
+from ply import lex
+
+# Lexer with states, literals, ignored rules, t_error() and t_eof()
+class StateLexer:
+    tokens = ['ID', 'NUMBER', 'STRING']
+    literals = '+-;='
+    states = (('comment', 'exclusive'), ('str', 'inclusive'))
+
+    t_ignore = ' \t'
+    t_comment_ignore = ''
+    t_ignore_HASH = r'\#[^\n]*'
+    t_ID = r'[a-z]+'
+
+    def t_NUMBER(t):
+        r'\d+'
+        t.value = int(t.value)
+        return t
+
+    def t_newline(t):
+        r'\n+'
+        t.lexer.lineno += len(t.value)
+
+    def t_begincomment(t):
+        r'/\*'
+        t.lexer.push_state('comment')
+
+    def t_comment_end(t):
+        r'\*/'
+        t.lexer.pop_state()
+
+    def t_comment_body(t):
+        r'[^*]+|\*'
+        t.lexer.lineno += t.value.count('\n')
+
+    def t_comment_error(t):
+        t.lexer.skip(1)
+
+    def t_quote(t):
+        r'"'
+        t.lexer.begin('str')
+
+    def t_str_STRING(t):
+        r'[^"]+'
+        return t
+
+    def t_str_end(t):
+        r'"'
+        t.lexer.begin('INITIAL')
+
+    def t_error(t):
+        t.type = 'BAD'
+        t.value = t.value[0]
+        t.lexer.skip(1)
+        return t
+
+    def t_eof(t):
+        t.lexer.eof_calls = getattr(t.lexer, 'eof_calls', 0) + 1
+        if not getattr(t.lexer, 'at_eof', False):
+            t.lexer.at_eof = True
+            t.type = 'EOF'
+            return t
+
+STATE_DATA = 'abc = 12 + 3;\n# comment\n/* multi\nline */ x "str 9" - 4 @ y;\n\n zz\n'
+
+class LexerVariantTests(unittest.TestCase):
+    def setUp(self):
+        self.cases = [(StateLexer, STATE_DATA),
+                      (toylang, read_input('begin_end') + read_input('test_lex') + '\n x = 1 @ 2 $ y;\n')]
+
+    def expected(self, module, data):
+        lexer = lex.lex(module=module)
+        lexer.input(data)
+        return tokens(lexer)
+
+    def test_profile(self):
+        for module, data in self.cases:
+            lexer = lex.lex(module=module, profile=True)
+            lexer.input(data)
+            self.assertEqual(tokens(lexer), self.expected(module, data))
+            profile = lexer.lexprofile
+            self.assertGreater(profile.rule('t_NUMBER').matches, 0)
+            self.assertGreater(profile.errors, 0)
+
+    def test_write_module(self):
+        tmpdir = tempfile.mkdtemp()
+        sys.path.insert(0, tmpdir)
+        try:
+            for i, (module, data) in enumerate(self.cases):
+                for kwargs in [{}, {'lineindex': True, 'compact': True}]:
+                    name = 'lextab_%d_%d' % (i, len(kwargs))
+                    lex.lex(module=module, **kwargs).write_module(name, outputdir=tmpdir)
+                    lexer = __import__(name).Lexer(module)
+                    lexer.input(data)
+                    self.assertEqual(tokens(lexer), self.expected(module, data))
+        finally:
+            sys.path.remove(tmpdir)
+            shutil.rmtree(tmpdir)
+
+    def test_stream(self):
+        lexer = lex.lex(module=toylang)
+        lexer.input_stream(io.StringIO('x = 12345;'), chunksize=2)
+        self.assertEqual([(t.type, t.value) for t in lexer],
+                         [('ID', 'x'), ('ASSIGN', '='), ('NUMBER', 12345), ('SEMI', ';')])
+
+        # Rules look at most one character past the end of a token
+        for module, data in self.cases:
+            for chunksize in [2, 3, 7, 1 << 16]:
+                for kwargs in [{}, {'profile': True}]:
+                    lexer = lex.lex(module=module, **kwargs)
+                    lexer.input_stream(io.BytesIO(data.encode('utf-8')), chunksize=chunksize)
+                    self.assertEqual(tokens(lexer), self.expected(module, data), (module, chunksize))
+
+    def test_tokenize_all(self):
+        for module, data in self.cases:
+            expected = lex.lex(module=module)
+            expected.input(data)
+            toks = tokens(expected)
+            for kwargs in [{}, {'profile': True}, {'lineindex': True, 'compact': True}]:
+                lexer = lex.lex(module=module, **kwargs)
+                lexer.input(data)
+                self.assertEqual(tokens(lexer.tokenize_all()), toks, (module, kwargs))
+                self.assertEqual(lexer.lineno, expected.lineno)
+
+        # t_eof() is called once, where token() calls it again after it returned a token
+        lexer, expected = lex.lex(module=StateLexer), lex.lex(module=StateLexer)
+        lexer.input(STATE_DATA)
+        lexer.tokenize_all()
+        expected.input(STATE_DATA)
+        list(expected)
+        self.assertEqual((lexer.eof_calls, expected.eof_calls), (1, 2))
+
+    def test_find_position(self):
+        data = 'ab\ncd\n\ne'
+        expected = [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (2, 3), (3, 1), (4, 1), (4, 2)]
+        for lineindex in [False, True]:
+            lexer = lex.lex(module=toylang, lineindex=lineindex)
+            lexer.input(data)
+            self.assertEqual([(lexer.find_lineno(pos), lexer.find_column(pos)) for pos in range(len(data) + 1)],
+                             expected)
+
+        # The line numbers of the tokens agree with find_lineno()
+        data = read_input('begin_end') + read_input('while')
+        for lineindex in [False, True]:
+            lexer = lex.lex(module=toylang, lineindex=lineindex)
+            lexer.input(data)
+            toks = list(lexer)
+            self.assertEqual([t.lineno for t in toks], [lexer.find_lineno(t.lexpos) for t in toks])
+            self.assertEqual([lexer.find_column(t.lexpos) for t in toks],
+                             [t.lexpos - data.rfind('\n', 0, t.lexpos) for t in toks])
+
+    def test_tokenize_all_rejects_streams(self):
+        for kwargs in [{}, {'profile': True}]:
+            lexer = lex.lex(module=toylang, **kwargs)
+            lexer.input_stream(io.StringIO('x = 1;'))
+            self.assertRaises(RuntimeError, lexer.tokenize_all)
+
+class RelexTests(unittest.TestCase):
+    # Apply every edit in turn and compare the tokens with lexing from scratch
+    def check_edits(self, module, data, edits, **kwargs):
+        lexer = lex.lex(module=module, **kwargs)
+        lexer.input(data)
+        toks = list(lexer)
+        for offset, deleted, inserted in edits:
+            before = tokens(toks)
+            lexer.__dict__.pop('at_eof', None)
+            new = lexer.relex(toks, offset, deleted, inserted)
+            self.assertEqual(tokens(toks), before)
+            data = data[:offset] + inserted + data[offset+deleted:]
+            expected = lex.lex(module=module, **kwargs)
+            expected.input(data)
+            self.assertEqual(tokens(new), tokens(expected), (offset, deleted, inserted))
+            self.assertEqual(lexer.lineno, expected.lineno)
+            self.assertLessEqual(new.prefix + new.suffix, min(len(new), len(toks)))
+            toks = new
+        return toks
+
+    def test_relex(self):
+        data = read_input('begin_end') + read_input('while')
+        edits = [(data.index('='), 1, '=='), (0, 0, 'x = 1;\n'), (len(data) // 2, 3, ''),
+                 (20, 0, '\n\n/* */ y'), (len(data) - 5, 0, '0x1f\n'), (5, 0, 'begin ')]
+        for kwargs in [{}, {'lineindex': True, 'compact': True}]:
+            self.check_edits(toylang, data, edits, **kwargs)
+
+        # Tokens after the edit are reused, and the old ones are left alone
+        lexer = lex.lex(module=toylang)
+        data = 'x = 1;\n' * 100
+        lexer.input(data)
+        toks = list(lexer)
+        new = lexer.relex(toks, 0, 0, 'y = 2;\n')
+        self.assertEqual((new.prefix, new.suffix), (0, 399))
+        self.assertEqual((toks[-1].lexpos, toks[-1].lineno), (698, 100))
+        self.assertEqual((new[-1].lexpos, new[-1].lineno), (705, 101))
+
+    def test_relex_states(self):
+        # A lexer with states is lexed again from the start
+        toks = self.check_edits(StateLexer, STATE_DATA, [(3, 0, ' "q'), (10, 0, '*/'), (0, 0, '/* ')])
+        self.assertEqual((toks.prefix, toks.suffix), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
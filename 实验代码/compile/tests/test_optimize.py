@@ -0,0 +1,62 @@
+# -----------------------------------------------------------------------------
+# test_optimize.py
+#
+# Tests of yacc(optimize=True).  The checks of a grammar are skipped only once
+# all of them have passed for it.
+# -----------------------------------------------------------------------------
+
+import unittest
+
+import support
+from ply import yacc
+
+# A grammar with an unused token (a diagnostic) and an unreachable rule (found
+# by the recursion checks)
+class WarningGrammar:
+    tokens = ['NUMBER', 'PLUS', 'MINUS']
+
+    def p_expr(p):
+        '''expr : expr PLUS NUMBER
+                | NUMBER'''
+
+    def p_other(p):
+        'other : NUMBER'
+
+    def p_error(t):
+        pass
+
+# Logger that keeps the messages
+class MessageLog:
+    def __init__(self):
+        self.messages = []
+
+    def warning(self, msg, *args):
+        self.messages.append(msg % args)
+
+    error = info = debug = critical = warning
+
+class OptimizeTests(unittest.TestCase):
+    def setUp(self):
+        yacc._validated.clear()
+
+    def build(self, **kwargs):
+        log = MessageLog()
+        yacc.yacc(module=WarningGrammar, debug=False, errorlog=log, **kwargs)
+        unused = any('MINUS' in msg for msg in log.messages)
+        unreachable = any('unreachable' in msg for msg in log.messages)
+        return unused, unreachable
+
+    def test_skips_checked_grammar(self):
+        self.assertEqual(self.build(optimize=True), (True, True))
+        self.assertEqual(self.build(optimize=True), (False, False))
+        self.assertEqual(self.build(), (True, True))
+
+    def test_check_recursion(self):
+        # Checks that did not all run don't make a grammar checked
+        self.assertEqual(self.build(optimize=True, check_recursion=False), (True, False))
+        self.assertEqual(self.build(optimize=True, check_recursion=False), (True, False))
+        self.assertEqual(self.build(optimize=True), (True, True))
+        self.assertEqual(self.build(optimize=True, check_recursion=False), (False, False))
+
+if __name__ == '__main__':
+    unittest.main()
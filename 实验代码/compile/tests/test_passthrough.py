@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# test_passthrough.py
+#
+# Tests of the reduction of pass-through unit rules (p[0] = p[1]) without
+# calling them.  Rule code must see the same symbols as when the rules are
+# called.
+# -----------------------------------------------------------------------------
+
+import unittest
+
+import support
+from ply import lex, yacc
+
+class UnitGrammar:
+    tokens = ['NUMBER', 'PLUS', 'SEMI']
+
+    t_PLUS   = r'\+'
+    t_SEMI   = r';'
+    t_ignore = ' \n'
+
+    def t_NUMBER(t):
+        r'\d+'
+        t.value = int(t.value)
+        return t
+
+    def t_error(t):
+        t.lexer.skip(1)
+
+    def p_stmts(p):
+        '''stmts : stmts stmt
+                 | stmt'''
+        p[0] = p[1] + [p[2]] if len(p) == 3 else [p[1]]
+
+    def p_stmt(p):
+        'stmt : expr SEMI'
+        sym = p.slice[1]
+        p[0] = (p[1], sym.type, getattr(sym, 'tag', None), p.linespan(1), p.lexspan(1))
+
+    def p_expr_plus(p):
+        'expr : expr PLUS term'
+        p[0] = p[1] + p[3]
+
+    def p_expr_term(p):
+        'expr : term'
+        p[0] = p[1]
+
+    def p_term_factor(p):
+        'term : factor'
+        p[0] = p[1]
+
+    def p_factor(p):
+        'factor : NUMBER'
+        p[0] = p[1]
+        p.slice[0].tag = 'factor'
+
+    def p_error(t):
+        pass
+
+class PassthroughTests(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=UnitGrammar)
+        self.parser = yacc.yacc(module=UnitGrammar, debug=False, errorlog=yacc.NullLogger())
+        self.called = yacc.yacc(module=UnitGrammar, debug=False, errorlog=yacc.NullLogger())
+        for p in self.called.productions:
+            p.passthrough = False
+
+    def test_rules_detected(self):
+        names = [str(p) for p in self.parser.productions if p.passthrough]
+        self.assertEqual(names, ['expr -> term', 'term -> factor'])
+
+    def test_same_symbols(self):
+        data = '1;\n2 + 3;\n 4 + 5 + 6 ; 7;'
+        for kwargs in [{}, {'tracking': True}, {'debug': yacc.NullLogger()},
+                       {'debug': yacc.NullLogger(), 'tracking': True}]:
+            expected = self.called.parse(data, lexer=self.lexer.clone(), **kwargs)
+            self.assertEqual(expected[0][1:3], ('expr', None))
+            self.assertEqual(self.parser.parse(data, lexer=self.lexer.clone(), **kwargs), expected)
+
+        for tracking in [False, True]:
+            expected = self.called.parse(data, lexer=self.lexer.clone(), tracking=tracking)
+            lexer = self.lexer.clone()
+            lexer.input(data)
+            push = self.parser.push(lexer=lexer, tracking=tracking)
+            push.feed_all(list(lexer))
+            self.assertEqual(push.close(), expected)
+
+            inc = self.parser.incremental(self.lexer.clone(), tracking=tracking)
+            self.assertEqual(inc.parse(data), expected)
+
+if __name__ == '__main__':
+    unittest.main()
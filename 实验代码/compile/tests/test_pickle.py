@@ -0,0 +1,46 @@
+# -----------------------------------------------------------------------------
+# test_pickle.py
+#
+# Tests of pickled lexers and parsers.  A loaded lexer and parser must give the
+# same results as the originals.
+# -----------------------------------------------------------------------------
+
+import pickle
+import unittest
+
+from support import INPUTS, read_input, tokens
+import toylang
+from ply import lex, yacc
+
+class PickleTests(unittest.TestCase):
+    def test_lexer(self):
+        for kwargs in [{}, {'lineindex': True, 'compact': True}, {'optimize': True}]:
+            lexer = lex.lex(module=toylang, **kwargs)
+            loaded = pickle.loads(pickle.dumps(lexer))
+            self.assertIs(loaded.lexerrorf, toylang.t_error)
+            for name in INPUTS:
+                data = read_input(name)
+                lexer.input(data)
+                loaded.input(data)
+                self.assertEqual(tokens(loaded), tokens(lexer))
+
+        # A lexer keeps its position
+        lexer = lex.lex(module=toylang)
+        lexer.input('x = 1; y = 2')
+        lexer.token()
+        loaded = pickle.loads(pickle.dumps(lexer))
+        self.assertEqual(tokens(loaded), tokens(lexer))
+
+    def test_parser(self):
+        lexer, parser = toylang.build()
+        loaded = pickle.loads(pickle.dumps(parser))
+        self.assertIsInstance(loaded.productions[1], yacc.MiniProduction)
+        self.assertIs(loaded.errorfunc, toylang.p_error)
+        for name in INPUTS:
+            data = read_input(name)
+            for kwargs in [{}, {'tracking': True}]:
+                self.assertEqual(loaded.parse(data, lexer=lexer.clone(), **kwargs),
+                                 parser.parse(data, lexer=lexer.clone(), **kwargs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# -----------------------------------------------------------------------------
+# test_positional.py
+#
+# Tests of grammar rules decorated with yacc.positional.  They must get the
+# values of the right hand side in every parsing engine, also from cached and
+# frozen tables.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+from ply import lex, yacc
+from ply.yacc import positional
+
+# Statements of sums and pairs, with rules of every length.  A zero operand is
+# rejected by raising SyntaxError
+class PairGrammar:
+    tokens = ['NUMBER', 'PLUS', 'LPAREN', 'RPAREN', 'COMMA', 'SEMI']
+
+    t_PLUS   = r'\+'
+    t_LPAREN = r'\('
+    t_RPAREN = r'\)'
+    t_COMMA  = r','
+    t_SEMI   = r';'
+    t_ignore = ' \n'
+
+    def t_NUMBER(t):
+        r'\d+'
+        t.value = int(t.value)
+        return t
+
+    def t_error(t):
+        t.lexer.skip(1)
+
+    @positional
+    def p_stmts(*args):
+        '''stmts : stmts stmt
+                 | stmt'''
+        return args[0] + [args[1]] if len(args) == 2 else [args[0]]
+
+    @positional
+    def p_stmt(expr, semi):
+        'stmt : expr SEMI'
+        return expr
+
+    def p_stmt_error(p):
+        'stmt : error SEMI'
+        p[0] = 'error'
+
+    @positional
+    def p_expr_plus(left, plus, right):
+        'expr : expr PLUS term'
+        return left + right
+
+    @positional
+    def p_expr_term(term):
+        'expr : term'
+        return term
+
+    @positional
+    def p_term_number(number):
+        'term : NUMBER'
+        if number == 0:
+            raise SyntaxError
+        return number
+
+    @positional
+    def p_term_pair(lparen, first, comma, second, rparen):
+        'term : LPAREN expr COMMA expr RPAREN'
+        return first * second
+
+    @positional
+    def p_term_empty(lparen, empty, rparen):
+        'term : LPAREN empty RPAREN'
+        return empty
+
+    @positional
+    def p_empty():
+        'empty :'
+        return 100
+
+    def p_error(t):
+        pass
+
+DATA = '1 + 2; (); (3, 4) + 5;\n0 + 1; 6 + (7 + 0, 1); 8;'
+RESULT = [3, 100, 17, 'error', 'error', 8]
+
+class PositionalTests(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=PairGrammar)
+        self.parser = yacc.yacc(module=PairGrammar, debug=False, errorlog=yacc.NullLogger())
+
+    def check(self, parser):
+        for kwargs in [{}, {'tracking': True}, {'debug': yacc.NullLogger()},
+                       {'profile': yacc.ParseProfile(parser)}]:
+            self.assertEqual(parser.parse(DATA, lexer=self.lexer.clone(), **kwargs), RESULT, kwargs)
+
+        lexer = self.lexer.clone()
+        lexer.input(DATA)
+        push = parser.push(lexer=lexer)
+        push.feed_all(list(lexer))
+        self.assertEqual(push.close(), RESULT)
+        self.assertEqual(parser.incremental(self.lexer.clone()).parse(DATA), RESULT)
+
+    def test_positional(self):
+        self.assertEqual([p.name for p in self.parser.productions if p.positional],
+                         ['stmts', 'stmts', 'stmt', 'expr', 'expr', 'term', 'term', 'term', 'empty'])
+        self.check(self.parser)
+        self.check(self.parser.freeze())
+
+    def test_cached(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cachefile = os.path.join(tmpdir, 'pairs.cache')
+            for _ in range(2):
+                parser = yacc.yacc(module=PairGrammar, debug=False, errorlog=yacc.NullLogger(),
+                                   cachefile=cachefile)
+            self.assertIsInstance(parser.productions[1], yacc.MiniProduction)
+            self.assertTrue(parser.productions[1].positional)
+            self.check(parser)
+        finally:
+            shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# -----------------------------------------------------------------------------
+# test_profile.py
+#
+# Tests of parse(profile=...).  A profiled parse must give the same result as
+# a plain one, and count every shift, reduction and syntax error.
+# -----------------------------------------------------------------------------
+
+import time
+import unittest
+
+from support import INPUTS, read_input
+import toylang
+from ply import lex, yacc
+
+# Statements, of which 'bad ;' is rejected by its grammar rule
+class StmtGrammar:
+    tokens = ['ID', 'SEMI']
+
+    t_ID     = r'[a-z]+'
+    t_SEMI   = r';'
+    t_ignore = ' '
+
+    def t_error(t):
+        t.lexer.skip(1)
+
+    def p_stmts(p):
+        '''stmts : stmts stmt
+                 | stmt'''
+
+    def p_stmt(p):
+        'stmt : ID SEMI'
+        if p[1] == 'bad':
+            time.sleep(0.01)
+            raise SyntaxError
+
+    def p_stmt_error(p):
+        'stmt : error SEMI'
+
+    def p_error(t):
+        pass
+
+class ParseProfileTests(unittest.TestCase):
+    def test_same_result(self):
+        lexer, parser = toylang.build()
+        profile = yacc.ParseProfile(parser)
+        for data in [read_input(name) for name in INPUTS] + ['x = ;', 'begin x = 1', ')']:
+            for tracking in [False, True]:
+                expected, errors = [], []
+                self.assertEqual(parser.parse(data, lexer=lexer.clone(), tracking=tracking,
+                                              profile=profile, errors=errors),
+                                 parser.parse(data, lexer=lexer.clone(), tracking=tracking,
+                                              errors=expected))
+                self.assertEqual([tok and tok.lexpos for tok in errors],
+                                 [tok and tok.lexpos for tok in expected])
+        self.assertEqual(profile.parses, 16)
+        self.assertEqual(sum(profile.state_errors), 16)
+
+    def test_counts(self):
+        lexer, parser = toylang.build()
+        data = read_input('while')
+        lexer.input(data)
+        ntokens = len(list(lexer))
+        profile = yacc.ParseProfile(parser)
+        parser.parse(data, lexer=lexer.clone(), profile=profile)
+        self.assertEqual(profile.shifts, ntokens)
+        self.assertEqual(profile.reductions[0], 0)
+        self.assertGreater(sum(profile.reductions), 0)
+        self.assertEqual(sum(profile.state_visits), profile.shifts + sum(profile.reductions) + 1)
+
+    def test_no_debug(self):
+        lexer, parser = toylang.build()
+        profile = yacc.ParseProfile(parser)
+        self.assertRaises(ValueError, parser.parse, 'x = 1;', lexer=lexer.clone(),
+                          profile=profile, debug=yacc.NullLogger())
+
+    def test_errors(self):
+        lexer = lex.lex(module=StmtGrammar)
+        parser = yacc.yacc(module=StmtGrammar, debug=False, errorlog=yacc.NullLogger())
+        stmt = [p.str for p in parser.productions].index('stmt -> ID SEMI')
+
+        # The time of a rule that raised SyntaxError is recorded
+        profile = yacc.ParseProfile(parser)
+        parser.parse('x ; bad ;', lexer=lexer.clone(), profile=profile)
+        self.assertEqual(profile.reductions[stmt], 2)
+        self.assertGreaterEqual(profile.action_time[stmt], 0.01)
+
+        # Only the first error is reported, but the errors found during the
+        # recovery are counted as well
+        profile = yacc.ParseProfile(parser)
+        errors = []
+        parser.parse('x x x x ;', lexer=lexer.clone(), profile=profile, errors=errors)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(sum(profile.state_errors), 5)
+
+if __name__ == '__main__':
+    unittest.main()
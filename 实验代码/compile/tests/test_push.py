@@ -0,0 +1,77 @@
+# -----------------------------------------------------------------------------
+# test_push.py
+#
+# Tests of push() and iterparse().  Feeding the tokens in any batches must give
+# the same result as a plain parse() that pulls them from the lexer.
+# -----------------------------------------------------------------------------
+
+import unittest
+
+from support import INPUTS, read_input
+import toylang
+
+class PushTests(unittest.TestCase):
+    def setUp(self):
+        self.lexer, self.parser = toylang.build()
+        self.cases = [read_input(name) for name in INPUTS] + [toylang.generate(20)]
+        self.bad = ['x = ;', 'begin x = 1', ')', 'x = 1; ) y = 2;', '']
+
+    def tokens(self, data):
+        lexer = self.lexer.clone()
+        lexer.input(data)
+        return lexer, list(lexer)
+
+    def test_same_result(self):
+        for data in self.cases + self.bad:
+            for tracking in [False, True]:
+                expected = self.parser.parse(data, lexer=self.lexer.clone(), tracking=tracking)
+                for size in [1, 2, 7, 1000]:
+                    lexer, toks = self.tokens(data)
+                    push = self.parser.push(lexer=lexer, tracking=tracking)
+                    for i in range(0, len(toks), size):
+                        push.feed_all(toks[i:i+size])
+                    self.assertEqual(push.close(), expected, (data, tracking, size))
+
+                # One token at a time, with None for the end of the input
+                lexer, toks = self.tokens(data)
+                push = self.parser.push(lexer=lexer, tracking=tracking)
+                for tok in toks + [None]:
+                    push.feed(tok)
+                self.assertTrue(push.done)
+                self.assertEqual(push.result, expected)
+
+    def test_closed(self):
+        push = self.parser.push(lexer=self.lexer.clone())
+        push.close()
+        self.assertRaises(RuntimeError, push.feed, None)
+
+    def test_iterparse(self):
+        for data in self.cases:
+            expected = self.parser.parse(data, lexer=self.lexer.clone())
+            lexer, toks = self.tokens(data)
+            gen = self.parser.iterparse(toks, 'stmt', lexer=lexer)
+            statements = []
+            try:
+                while True:
+                    statements.append(next(gen))
+            except StopIteration as e:
+                result = e.value
+            self.assertEqual(result, expected)
+            self.assertEqual(statements, expected[1])
+
+    def test_iterparse_early(self):
+        # A statement is yielded before the tokens after it are read
+        lexer, toks = self.tokens('x = 1; y = 2; z = 3;')
+        consumed = []
+
+        def source():
+            for tok in toks:
+                consumed.append(tok)
+                yield tok
+
+        gen = self.parser.iterparse(source(), 'stmt', lexer=lexer)
+        self.assertEqual(next(gen), ('assign', 'x', 1))
+        self.assertLess(len(consumed), len(toks))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# -----------------------------------------------------------------------------
+# test_tables.py
+#
+# Tests of the table construction of yacc on small grammars whose sets and
+# states are known: FIRST and FOLLOW, the LALR lookaheads and the LR(0)
+# states.
+# -----------------------------------------------------------------------------
+
+import sys
+import unittest
+
+import support
+from ply import yacc
+
+# Build a Grammar from rules like 'expr : expr PLUS term | term'
+def grammar(terminals, rules, start=None):
+    g = yacc.Grammar(terminals)
+    for rule in rules:
+        name, rhs = rule.split(':')
+        for alt in rhs.split('|'):
+            g.add_production(name.strip(), alt.split())
+    g.set_start(start)
+    return g
+
+# Expression grammar without left recursion (Dragon book, 2nd Ed. p. 193)
+EXPR_LL = ['e : t e1',
+           'e1 : PLUS t e1 | ',
+           't : f t1',
+           't1 : TIMES f t1 | ',
+           'f : LPAREN e RPAREN | ID']
+
+# The same with left recursion (Dragon book, 2nd Ed. p. 193)
+EXPR_LR = ['e : e PLUS t | t',
+           't : t TIMES f | f',
+           'f : LPAREN e RPAREN | ID']
+
+EXPR_TOKENS = ['PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID']
+
+class FirstFollowTests(unittest.TestCase):
+    def assertSets(self, sets, expected):
+        self.assertEqual({name: set(sets[name]) for name in expected}, expected)
+
+    def test_expression(self):
+        g = grammar(EXPR_TOKENS, EXPR_LL)
+        self.assertSets(g.compute_first(), {
+            'e':  {'LPAREN', 'ID'},
+            'e1': {'PLUS', '<empty>'},
+            't':  {'LPAREN', 'ID'},
+            't1': {'TIMES', '<empty>'},
+            'f':  {'LPAREN', 'ID'},
+            'ID': {'ID'},
+        })
+        self.assertSets(g.compute_follow(), {
+            'e':  {'RPAREN', '$end'},
+            'e1': {'RPAREN', '$end'},
+            't':  {'PLUS', 'RPAREN', '$end'},
+            't1': {'PLUS', 'RPAREN', '$end'},
+            'f':  {'PLUS', 'TIMES', 'RPAREN', '$end'},
+        })
+        self.assertEqual(set(g._first(('t1', 'e1'))), {'TIMES', 'PLUS', '<empty>'})
+        self.assertEqual(set(g._first(('t1', 'e1', 'RPAREN'))), {'TIMES', 'PLUS', 'RPAREN'})
+
+    def test_nullable_chain(self):
+        # FIRST and FOLLOW flow through a chain of nullable symbols, in both
+        # directions of the rule order
+        rules = ['s : a X'] + ['a%s : a%d | ' % (i or '', i + 1) for i in range(20)] + ['a20 : Y']
+        g = grammar(['X', 'Y'], rules)
+        first = g.compute_first()
+        follow = g.compute_follow()
+        for i in range(1, 21):
+            self.assertEqual(set(first['a%d' % i]), {'Y', '<empty>'} if i < 20 else {'Y'})
+            self.assertEqual(set(follow['a%d' % i]), {'X'})
+        self.assertEqual(set(first['s']), {'X', 'Y'})
+        self.assertEqual(set(follow['s']), {'$end'})
+
+class LookaheadTests(unittest.TestCase):
+    # Lookaheads of an item as {state: set of terminals}
+    def lookaheads(self, g, item):
+        for p in g.LRItems:
+            if str(p) == item:
+                return {state: set(la) for state, la in p.lookaheads.items()}
+
+    def test_lalr_not_slr(self):
+        # FOLLOW(r) holds EQ, but in the state after s -> l, the reduction of
+        # r -> l is only done at the end of the input (Dragon book, 2nd Ed. p. 254)
+        g = grammar(['EQ', 'STAR', 'ID'], ['s : l EQ r | r', 'l : STAR r | ID', 'r : l'])
+        lr = yacc.LRTable(g)
+        self.assertEqual((lr.sr_conflicts, lr.rr_conflicts), ([], []))
+        self.assertEqual(set(g.compute_follow()['r']), {'EQ', '$end'})
+        goto = lr.lr0_gotos
+        after_l = goto[0]['l']
+        after_star_l = goto[goto[0]['STAR']]['l']
+        self.assertEqual(self.lookaheads(g, 'r -> l .'), {after_l: {'$end'}, after_star_l: {'EQ', '$end'}})
+        self.assertEqual(self.lookaheads(g, 'l -> ID .'), {goto[0]['ID']: {'EQ', '$end'}})
+        self.assertGreater(lr.lr_action[after_l]['EQ'], 0)
+        self.assertLess(lr.lr_action[after_l]['$end'], 0)
+
+    def test_long_includes_chain(self):
+        # Every ai includes the one before it and the lookaheads are looked up
+        # starting at the far end of the chain, which is longer than the
+        # recursion limit
+        n = 2 * sys.getrecursionlimit()
+        rules = ['s : a%d Q | a0' % n] + ['a%d : a%d' % (i, i + 1) for i in range(n)] + ['a%d : X' % n]
+        g = grammar(['X', 'Q'], rules)
+        lr = yacc.LRTable(g)
+        self.assertEqual((lr.sr_conflicts, lr.rr_conflicts), ([], []))
+        state = lr.lr0_gotos[0]['a%d' % n]
+        self.assertEqual(self.lookaheads(g, 'a%d -> a%d .' % (n - 1, n)), {state: {'$end'}})
+        self.assertEqual(self.lookaheads(g, 'a%d -> X .' % n), {lr.lr0_gotos[0]['X']: {'Q', '$end'}})
+
+    def test_merged_state(self):
+        # Canonical LR(1) has a state for C after A and another one for C after
+        # B.  LALR merges them along with their lookaheads, which gives a
+        # reduce/reduce conflict (Dragon book, 2nd Ed. p. 267)
+        g = grammar(['A', 'B', 'C', 'D', 'E'], ['s : A x D | B y D | A y E | B x E', 'x : C', 'y : C'])
+        lr = yacc.LRTable(g)
+        goto = lr.lr0_gotos
+        state = goto[goto[0]['A']]['C']
+        self.assertEqual(goto[goto[0]['B']]['C'], state)
+        self.assertEqual(self.lookaheads(g, 'x -> C .'), {state: {'D', 'E'}})
+        self.assertEqual(self.lookaheads(g, 'y -> C .'), {state: {'D', 'E'}})
+        self.assertEqual({(st, str(rule), str(rejected)) for st, rule, rejected in lr.rr_conflicts},
+                         {(state, 'x -> C', 'y -> C')})
+        number = [p.number for p in g.Productions if str(p) == 'x -> C'][0]
+        self.assertEqual(lr.lr_action[state], {'D': -number, 'E': -number})
+
+class StateTests(unittest.TestCase):
+    def test_expression(self):
+        # The canonical collection of LR(0) items has 12 states (Dragon book,
+        # 2nd Ed. p. 244).  A kernel reached along different paths is one state
+        g = grammar(EXPR_TOKENS, EXPR_LR)
+        lr = yacc.LRTable(g)
+        goto = lr.lr0_gotos
+        self.assertEqual(len(goto), 12)
+        self.assertEqual(len(lr.lr_action), 12)
+        lparen = goto[0]['LPAREN']
+        plus = goto[goto[0]['e']]['PLUS']
+        times = goto[goto[0]['t']]['TIMES']
+        self.assertEqual(goto[lparen]['LPAREN'], lparen)
+        for state in [lparen, plus, times]:
+            self.assertEqual(goto[state]['ID'], goto[0]['ID'])
+        self.assertEqual(goto[lparen]['t'], goto[0]['t'])
+        self.assertEqual(goto[plus]['f'], goto[0]['f'])
+        self.assertEqual(goto[goto[plus]['t']]['TIMES'], times)
+        self.assertNotEqual(goto[plus]['t'], goto[0]['t'])
+        self.assertEqual((lr.sr_conflicts, lr.rr_conflicts), ([], []))
+
+    def test_chain(self):
+        # One state for each symbol of a chain of unit rules, shared between the
+        # start state and the state after LPAREN.  Besides those, there are the
+        # start state and the states after X, LPAREN, LPAREN a0 and LPAREN a0 RPAREN
+        rules = ['a%d : a%d' % (i, i + 1) for i in range(50)] + ['a50 : X | LPAREN a0 RPAREN']
+        g = grammar(['X', 'LPAREN', 'RPAREN'], rules)
+        lr = yacc.LRTable(g)
+        goto = lr.lr0_gotos
+        lparen = goto[0]['LPAREN']
+        self.assertEqual(goto[lparen]['LPAREN'], lparen)
+        for i in range(51):
+            self.assertEqual(goto[lparen].get('a%d' % i) == goto[0].get('a%d' % i), i > 0)
+        self.assertEqual(len(goto), 51 + 5)
+
+if __name__ == '__main__':
+    unittest.main()